@@ -0,0 +1,275 @@
+#Benchmark of every dcr_chart_suite chart method against a fixed base frame
+#   python3 bench_charts.py --fixture base.parquet --replay-http fixtures/ --output bench.json
+#   python3 bench_charts.py --fixture base.parquet --baseline bench.json --threshold 0.1
+#   python3 bench_charts.py --fixture base.parquet --scale 1 --scale 10 --scale 100 --tag homepage
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time as clock
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from dcr_cache import frame_fingerprint
+from dcr_dtypes import DEFAULT_TOLERANCE, compact_frame, compare_figures, memory_report
+from dcr_fetch import source_store, sources_for
+from dcr_jobs import job_label
+from dcr_manifest import load_manifest, select_entries
+from dcr_memo import metric_registry
+from dcr_replay import install_fixtures
+from dcr_synthetic import synthetic_base_frame
+
+#Chart methods left out of the manifest, benchmarked all the same
+extra_cases = [
+    ('miner_hardware_estimate',('_cnt',),'light'),
+]
+
+
+def bench_cases(tags=None,names=None):
+    """(method,args,theme) for every selected manifest chart and extra_cases, without duplicates"""
+    cases = []
+    for entry in select_entries(load_manifest(),tags,names):
+        case = (entry['method'],tuple(entry['args']),entry['theme'])
+        if case not in cases:
+            cases.append(case)
+    if not tags and not names:
+        cases = cases + [case for case in extra_cases if case not in cases]
+    return cases
+
+
+def positive_int(value):
+    """argparse type of a count that must be at least 1"""
+    count = int(value)
+    if count < 1:
+        raise argparse.ArgumentTypeError('must be at least 1, got ' + value)
+    return count
+
+
+def figure_bytes(fig):
+    return len(fig.to_json().encode('utf-8'))
+
+
+def bench_case(suite,method,args,warmup,repeat):
+    """
+    Times one chart method, each call starts from an empty metric registry so the
+    metric transforms the chart needs are part of its time
+    RETURNS: dict with runs_s, median_s, min_s, mean_s, peak_mb, output_bytes, error
+    """
+    def call():
+        suite.metrics = metric_registry(suite.base_df,df_key)
+        #Denominated flows are cached on the suite, built from metric_issued_cap
+        suite.denominations = None
+        return getattr(suite,method)(*args)
+
+    df_key = frame_fingerprint(suite.base_df)
+    result = {'runs_s':[],'error':None}
+    try:
+        for i in range(warmup):
+            call()
+        for i in range(repeat):
+            start = clock.perf_counter()
+            fig = call()
+            result['runs_s'].append(clock.perf_counter() - start)
+        #Separate traced call, tracemalloc slows the timed ones down
+        tracemalloc.start()
+        call()
+        result['peak_mb'] = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+        result['output_bytes'] = figure_bytes(fig)
+    except Exception as e:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        result['error'] = type(e).__name__ + ': ' + str(e)
+    if result['runs_s']:
+        result['median_s'] = statistics.median(result['runs_s'])
+        result['min_s'] = min(result['runs_s'])
+        result['mean_s'] = statistics.mean(result['runs_s'])
+    return result
+
+
+def run_benchmark(base_df,cases,warmup=1,repeat=3,sources=None,suffix=''):
+    """
+    Benchmarks chart methods on base_df
+    INPUTS:
+        base_df = DataFrame, fixed dcr_ticket_models() frame
+        cases   = [(method,args,theme),...]
+        warmup  = int, untimed calls before the timed ones
+        repeat  = int, timed calls per method
+        sources = dcr_fetch.source_store, prefetched before timing so no fetch is timed
+        suffix  = str, appended to each result label (e.g. '@10x' for a scaled frame)
+    RETURNS: report dict, see write_report
+    """
+    from generate_charts import dcr_chart_suite
+    if sources is None:
+        sources = source_store()
+    sources.prefetch(sources_for(method for method, args, theme in cases))
+
+    suites = {}
+    results = {}
+    for method, args, theme in cases:
+        if theme not in suites:
+            suites[theme] = dcr_chart_suite(theme,df=base_df,sources=sources)
+        label = job_label(method,args) + ('' if theme == 'light' else '[' + theme + ']') + suffix
+        result = bench_case(suites[theme],method,args,warmup,repeat)
+        result['rows'] = len(base_df)
+        if result['error'] is None:
+            print(
+                '...' + label + ' median ' + '{:.3f}'.format(result['median_s']) + 's, peak '
+                + '{:.1f}'.format(result['peak_mb']) + 'MB, ' + '{:.0f}'.format(result['output_bytes']/1024) + 'kB'
+            )
+        else:
+            print('...FAILED ' + label + ' ' + result['error'])
+        results[label] = result
+    return {
+        'meta':{
+            'date':datetime.utcnow().isoformat(timespec='seconds'),
+            'python':platform.python_version(),
+            'pandas':pd.__version__,
+            'numpy':np.__version__,
+            'rows':len(base_df),
+            'warmup':warmup,
+            'repeat':repeat,
+        },
+        'results':results,
+    }
+
+
+def check_dtypes(base_df,cases,tolerance=DEFAULT_TOLERANCE,sources=None):
+    """
+    Builds every chart from the full precision and the compact dtype frame and compares
+    the trace values
+    RETURNS: list of (label,message) for charts outside tolerance or failing only when compact
+    """
+    from generate_charts import dcr_chart_suite
+    compact = compact_frame(base_df)
+    memory_report(base_df,compact)
+    if sources is None:
+        sources = source_store()
+    sources.prefetch(sources_for(method for method, args, theme in cases))
+
+    failures = []
+    for method, args, theme in cases:
+        label = job_label(method,args) + ('' if theme == 'light' else '[' + theme + ']')
+        try:
+            reference = getattr(dcr_chart_suite(theme,df=base_df,sources=sources),method)(*args)
+        except Exception as e:
+            print('...SKIPPED ' + label + ', fails at full precision: ' + type(e).__name__)
+            continue
+        try:
+            candidate = getattr(dcr_chart_suite(theme,df=compact,sources=sources),method)(*args)
+        except Exception as e:
+            failures.append((label,'fails with compact dtypes: ' + type(e).__name__ + ': ' + str(e)))
+            continue
+        deviation, trace = compare_figures(reference,candidate)
+        print('...' + label + ' max deviation ' + '{:.2e}'.format(deviation) + ' (' + str(trace) + ')')
+        if deviation > tolerance:
+            failures.append((label,'{:.2e}'.format(deviation) + ' in ' + str(trace) + ' exceeds ' + str(tolerance)))
+    return failures
+
+
+def compare_reports(report,baseline,threshold):
+    """
+    Lists charts slower than baseline by more than threshold (fraction of the baseline median),
+    charts that fail now but succeeded in the baseline and baseline charts missing from report
+    (when both runs selected the same tags, charts and scales)
+    RETURNS: list of (label,message)
+    """
+    regressions = []
+    selection = ('tags','charts','scales')
+    if all(report['meta'].get(key) == baseline['meta'].get(key) for key in selection):
+        for label in baseline['results']:
+            if label not in report['results']:
+                regressions.append((label,'missing, benchmarked in the baseline'))
+    else:
+        print('...Baseline selected other charts, charts missing from this run are not compared')
+    for label, result in report['results'].items():
+        base = baseline['results'].get(label)
+        if base is None or base.get('error') is not None:
+            continue
+        if result.get('error') is not None:
+            regressions.append((label,'fails: ' + result['error']))
+            continue
+        ratio = result['median_s'] / max(base['median_s'],1e-9)
+        print(
+            '...' + label + ' ' + '{:.3f}'.format(base['median_s']) + 's -> '
+            + '{:.3f}'.format(result['median_s']) + 's (' + '{:+.0%}'.format(ratio-1) + ')'
+        )
+        if ratio > 1 + threshold:
+            regressions.append((label,'{:+.0%}'.format(ratio-1) + ' slower'))
+    return regressions
+
+
+def write_report(report,path):
+    with open(path,'w') as f:
+        json.dump(report,f,indent=2,sort_keys=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark dcr_chart_suite chart methods')
+    parser.add_argument('--fixture',default=None,help='parquet file holding the dcr_ticket_models() base frame')
+    parser.add_argument('--scale',type=int,action='append',help='benchmark on a synthetic frame of SCALE x the history, the fixture is its template (repeatable)')
+    parser.add_argument('--replay-http',metavar='DIR',default=None,help='serve upstream datasets from recorded HTTP fixtures')
+    parser.add_argument('--tag',action='append',help='benchmark manifest charts with this tag (repeatable)')
+    parser.add_argument('--chart',action='append',help='benchmark this manifest chart (repeatable)')
+    parser.add_argument('--warmup',type=int,default=1,help='untimed calls per method')
+    parser.add_argument('--repeat',type=positive_int,default=3,help='timed calls per method')
+    parser.add_argument('--compact-dtypes',action='store_true',help='benchmark on the compact dtype profile of the frame')
+    parser.add_argument('--check-dtypes',action='store_true',help='compare chart values from the compact dtype profile against full precision instead of timing')
+    parser.add_argument('--tolerance',type=float,default=DEFAULT_TOLERANCE,help='allowed relative deviation for --check-dtypes')
+    parser.add_argument('--output',default=None,help='write the JSON report here')
+    parser.add_argument('--baseline',default=None,help='JSON report to compare against')
+    parser.add_argument('--threshold',type=float,default=0.10,help='allowed slowdown vs baseline median (0.10 = 10%%)')
+    args = parser.parse_args(argv)
+
+    if args.fixture is None and not args.scale:
+        parser.error('--fixture or --scale is required')
+    install_fixtures(replay=args.replay_http)
+    template = pd.read_parquet(args.fixture) if args.fixture else None
+    cases = bench_cases(args.tag,args.chart)
+    if args.check_dtypes:
+        base_df = template if not args.scale else synthetic_base_frame(args.scale[0],template=template)
+        failures = check_dtypes(base_df,cases,args.tolerance)
+        for label, message in failures:
+            print('...OUT OF TOLERANCE ' + label + ' ' + message)
+        return 1 if failures else 0
+    if not args.scale:
+        report = run_benchmark(compact_frame(template) if args.compact_dtypes else template,cases,args.warmup,args.repeat)
+    else:
+        #Scaling run, one result per chart and scale so the growth with history length shows
+        report = None
+        sources = source_store()
+        for scale in args.scale:
+            print('...Benchmarking on synthetic history x' + str(scale))
+            base_df = synthetic_base_frame(scale,template=template)
+            if args.compact_dtypes:
+                base_df = compact_frame(base_df)
+            scaled = run_benchmark(base_df,cases,args.warmup,args.repeat,sources,'@' + str(scale) + 'x')
+            if report is None:
+                report = scaled
+            else:
+                report['results'].update(scaled['results'])
+        report['meta']['scales'] = args.scale
+    report['meta']['fixture'] = args.fixture
+    report['meta']['tags'] = args.tag
+    report['meta']['charts'] = args.chart
+    report['meta']['compact_dtypes'] = args.compact_dtypes
+    if args.output:
+        write_report(report,args.output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_reports(report,baseline,args.threshold)
+        for label, message in regressions:
+            print('...REGRESSION ' + label + ' ' + message)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
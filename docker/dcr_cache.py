@@ -0,0 +1,177 @@
+#Local on-disk cache for the Decred base DataFrame shared by the chart and insight scripts
+import hashlib
+import json
+import os
+import time as clock
+from datetime import date
+
+import pandas as pd
+
+from dcr_trace import add_span
+
+#Bump whenever the shape of the cached frame changes so stale entries are ignored
+SCHEMA_VERSION = 1
+GENESIS = '2016-02-08'
+#Projected supply curve of the S2F charts: blocks projected, target block time, genesis block time
+SUPPLY_BLOCKS = 2000000
+BLOCK_MINUTES = 5
+GENESIS_TIME = '2016-02-08 20:32:25+00:00'
+
+#Projected supply curves loaded in this process, keyed like the cache files
+_supply_curves = {}
+
+
+class dcr_base_cache():
+
+    def __init__(self,cache_dir=None,ttl_hours=None):
+        """
+        Content-addressed Parquet cache for dcr_add_metrics().dcr_ticket_models()
+        Entries are keyed on source + date range + schema version, so the first
+        script of a run populates the cache and every later script loads it.
+        INPUTS:
+            cache_dir = str, cache directory
+                        default = $DCR_CACHE_DIR or '.dcr_cache'
+            ttl_hours = float, maximum age of a cache entry before it is rebuilt
+                        default = $DCR_CACHE_TTL or 12 hours
+        """
+        self.cache_dir = cache_dir or os.environ.get('DCR_CACHE_DIR','.dcr_cache')
+        if ttl_hours is None:
+            ttl_hours = os.environ.get('DCR_CACHE_TTL',12)
+        self.ttl_hours = float(ttl_hours)
+        self.source = 'checkonchain.dcr_add_metrics.dcr_ticket_models'
+
+    def identity(self,end=None):
+        """Describes the content of a cache entry, hashed into its key"""
+        return {
+            'source':self.source,
+            'start':GENESIS,
+            'end':end or date.today().isoformat(),
+            'schema':SCHEMA_VERSION,
+        }
+
+    def key(self,end=None):
+        ident = json.dumps(self.identity(end),sort_keys=True)
+        return hashlib.sha256(ident.encode('utf-8')).hexdigest()[:16]
+
+    def paths(self,key):
+        data_path = os.path.join(self.cache_dir,'dcr_base_' + key + '.parquet')
+        meta_path = os.path.join(self.cache_dir,'dcr_base_' + key + '.json')
+        return data_path, meta_path
+
+    def is_fresh(self,key):
+        """True when the entry exists and is younger than the TTL"""
+        data_path, meta_path = self.paths(key)
+        if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+            return False
+        with open(meta_path) as f:
+            meta = json.load(f)
+        age_hours = (clock.time() - meta['created'])/3600
+        return age_hours <= self.ttl_hours
+
+    def load(self,key,columns=None):
+        """Reads an entry, only the stored columns named in columns when given"""
+        data_path = self.paths(key)[0]
+        if columns is not None:
+            import pyarrow.parquet as pq
+            columns = [column for column in pq.read_schema(data_path).names if column in columns]
+        return pd.read_parquet(data_path,columns=columns)
+
+    def save(self,key,df):
+        """Writes entry atomically so a concurrent reader never sees half a file"""
+        os.makedirs(self.cache_dir,exist_ok=True)
+        data_path, meta_path = self.paths(key)
+        try:
+            df.to_parquet(data_path + '.tmp')
+        except Exception as e:
+            #An unserialisable column must not stop the render, only the caching
+            print('...Unable to cache Decred base data: ' + str(e))
+            if os.path.exists(data_path + '.tmp'):
+                os.remove(data_path + '.tmp')
+            return
+        meta = dict(self.identity(),created=clock.time(),rows=len(df))
+        with open(meta_path + '.tmp','w') as f:
+            json.dump(meta,f)
+        os.replace(data_path + '.tmp',data_path)
+        os.replace(meta_path + '.tmp',meta_path)
+
+    def base_frame(self,refresh=False,columns=None):
+        """
+        Returns dcr_ticket_models() DataFrame, from cache when possible
+        INPUTS:
+            refresh = bool, ignore any cached entry and rebuild from upstream
+            columns = set of str, read only these columns (see dcr_columns), None reads every column
+        """
+        key = self.key()
+        if not refresh and self.is_fresh(key):
+            print(
+                '...Loading cached Decred base data (' + key + ')'
+                + (', ' + str(len(columns)) + ' candidate columns' if columns is not None else '')
+            )
+            add_span('base_cache',hit=True)
+            return self.load(key,columns)
+        add_span('base_cache',hit=False)
+        from checkonchain.dcronchain.dcr_add_metrics import dcr_add_metrics
+        print('...Building Decred base data from upstream')
+        df = dcr_add_metrics().dcr_ticket_models()
+        self.save(key,df)
+        if columns is not None:
+            df = df[[column for column in df.columns if column in columns]]
+        return df
+
+
+def frame_fingerprint(df):
+    """Content hash of a DataFrame (values, index and column names)"""
+    digest = hashlib.sha256()
+    digest.update(json.dumps([str(column) for column in df.columns]).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(df,index=True).values.tobytes())
+    return digest.hexdigest()[:16]
+
+
+def supply_curve_key(blocks):
+    """Hash of the emission parameters and the upstream function that builds the curve"""
+    import inspect
+    from checkonchain.dcronchain.dcr_add_metrics import dcr_add_metrics
+    try:
+        source = inspect.getsource(dcr_add_metrics.dcr_sply_curtailed)
+    except (OSError,TypeError):
+        source = ''
+    ident = json.dumps({
+        'blocks':blocks,'block_minutes':BLOCK_MINUTES,'genesis':GENESIS_TIME,
+        'resolution':'daily','source':source,
+    },sort_keys=True)
+    return hashlib.sha256(ident.encode('utf-8')).hexdigest()[:16]
+
+
+def projected_supply(blocks=SUPPLY_BLOCKS,cache_dir=None):
+    """
+    dcr_add_metrics().dcr_sply_curtailed(blocks) at daily resolution, with block dates
+    The projection depends only on the emission schedule, so it is built once and kept in
+    the cache directory keyed on the emission parameters
+    INPUTS:
+        blocks    = int, block heights projected
+        cache_dir = str, cache directory (default dcr_base_cache().cache_dir)
+    RETURNS: DataFrame, last block of each day with 'age_day' and 'date' (UTC) added
+    """
+    key = supply_curve_key(blocks)
+    if key not in _supply_curves:
+        path = os.path.join(cache_dir or dcr_base_cache().cache_dir,'dcr_supply_' + key + '.parquet')
+        if os.path.exists(path):
+            add_span('supply_cache',hit=True)
+            _supply_curves[key] = pd.read_parquet(path)
+        else:
+            add_span('supply_cache',hit=False)
+            from checkonchain.dcronchain.dcr_add_metrics import dcr_add_metrics
+            print('...Building projected Decred supply curve (' + str(blocks) + ' blocks)')
+            df = dcr_add_metrics().dcr_sply_curtailed(blocks)
+            #Block time assumes the 5 minute target, one vectorised conversion for every block
+            df['age_day'] = df['blk']*BLOCK_MINUTES/(60*24)
+            df['date'] = pd.Timestamp(GENESIS_TIME) + pd.to_timedelta(df['blk']*BLOCK_MINUTES,unit='m')
+            df = df.groupby(df['date'].dt.floor('D'),sort=False).tail(1).reset_index(drop=True)
+            os.makedirs(os.path.dirname(path),exist_ok=True)
+            #s2f_model workers may build the curve at once on a cold cache, each writes its own tmp
+            tmp = path + '.' + str(os.getpid()) + '.tmp'
+            df.to_parquet(tmp)
+            os.replace(tmp,path)
+            _supply_curves[key] = df
+    return _supply_curves[key].copy()
+
@@ -0,0 +1,431 @@
+#Column projection contract of the chart suite
+#   chart methods: base columns named by string literals in generate_charts.py, read with ast so
+#                  a new chart is covered without maintaining a list
+#   metrics:       base columns each dcr_add_metrics transform reads, declared in column_registry.yaml
+#                  and learned with `python3 -m dcronchain_data columns --learn`
+#A chart is projectable when every metric it computes from the base frame is declared. The loader
+#reads the union of the selected charts' columns, a KeyError from a chart or a metric falls back
+#to the full frame.
+#The same parse resolves the self.metric calls of each chart (shared_metric_calls), so metrics
+#several charts read are computed once before the chart workers fork.
+import ast
+import os
+from contextlib import contextmanager
+
+import pandas as pd
+import yaml
+
+CHARTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),'generate_charts.py')
+REGISTRY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),'column_registry.yaml')
+SUITE_CLASS = 'dcr_chart_suite'
+#Columns kept by every projection
+ALWAYS = ['date']
+#String literal nodes (ast.Str before Python 3.8)
+STRING_NODES = tuple(getattr(ast,name) for name in ('Constant','Str') if hasattr(ast,name))
+#Metric call whose name is not a literal, it can never be declared
+UNKNOWN_METRIC = '?'
+
+_suite_reads = None
+_suite_methods = None
+_metric_inputs = None
+
+
+def literal_str(node):
+    if not isinstance(node,STRING_NODES):
+        return None
+    value = getattr(node,'value',getattr(node,'s',None))
+    return value if isinstance(value,str) else None
+
+
+def metric_root(call):
+    """
+    Metric of a self.metric(...) call that receives the base frame
+    RETURNS: metric name, None when the call passes explicit columns (already literal strings)
+    """
+    keywords = dict((keyword.arg,keyword.value) for keyword in call.keywords)
+    if 'columns' in keywords:
+        return None
+    if 'after' in keywords:
+        #Chained metrics read the result of their root, only the root reads the base frame
+        elements = getattr(keywords['after'],'elts',None)
+        return (literal_str(elements[0]) if elements else None) or UNKNOWN_METRIC
+    return (literal_str(call.args[0]) if call.args else None) or UNKNOWN_METRIC
+
+
+def suite_reads(path=CHARTS_PATH):
+    """
+    Literal reads of every dcr_chart_suite method
+    RETURNS: {method: (strings, metrics, calls)}, strings = string literals of the method,
+             metrics = metrics computed from the base frame, calls = suite methods it calls
+    """
+    with open(path) as f:
+        tree = ast.parse(f.read())
+    suite = [node for node in tree.body if isinstance(node,ast.ClassDef) and node.name == SUITE_CLASS][0]
+    methods = [node for node in suite.body if isinstance(node,ast.FunctionDef)]
+    names = set(method.name for method in methods)
+    reads = {}
+    for method in methods:
+        strings, metrics, calls = set(), set(), set()
+        for node in ast.walk(method):
+            if literal_str(node) is not None:
+                strings.add(literal_str(node))
+            elif (
+                isinstance(node,ast.Call) and isinstance(node.func,ast.Attribute)
+                and isinstance(node.func.value,ast.Name) and node.func.value.id == 'self'
+            ):
+                if node.func.attr == 'metric':
+                    metrics.add(metric_root(node))
+                elif node.func.attr in names:
+                    calls.add(node.func.attr)
+        metrics.discard(None)
+        reads[method.name] = (strings,metrics,calls)
+    return reads
+
+
+def metric_inputs(path=REGISTRY_PATH):
+    """Declared base columns per metric, {name: [column,...]}"""
+    global _metric_inputs
+    if _metric_inputs is None:
+        _metric_inputs = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                _metric_inputs = (yaml.safe_load(f) or {}).get('metrics') or {}
+    return _metric_inputs
+
+
+def chart_reads(method):
+    """
+    String literals and base frame metrics of a chart method, its helper methods and __init__
+    (which reads the base frame for the event table of every chart)
+    """
+    global _suite_reads
+    if _suite_reads is None:
+        _suite_reads = suite_reads()
+    strings, metrics = set(), set()
+    seen = set()
+    stack = ['__init__',method]
+    while stack:
+        name = stack.pop()
+        if name in seen or name not in _suite_reads:
+            continue
+        seen.add(name)
+        method_strings, method_metrics, calls = _suite_reads[name]
+        strings |= method_strings
+        metrics |= method_metrics
+        stack.extend(calls)
+    return strings, metrics
+
+
+def undeclared_metrics(method):
+    """Metrics that keep a chart method on the full frame"""
+    return sorted(metric for metric in chart_reads(method)[1] if metric not in metric_inputs())
+
+
+def chart_projection(method):
+    """
+    Base columns a chart method may read, None when it computes an undeclared metric
+    The set holds every string literal of the method, project() keeps those that are columns
+    """
+    strings, metrics = chart_reads(method)
+    declared = metric_inputs()
+    if any(metric not in declared for metric in metrics):
+        return None
+    columns = set(ALWAYS) | strings
+    for metric in metrics:
+        columns |= set(declared[metric])
+    return columns
+
+
+def projection_for(methods):
+    """Union of the projections of chart methods, None when any of them needs the full frame"""
+    columns = set()
+    for method in methods:
+        projection = chart_projection(method)
+        if projection is None:
+            return None
+        columns |= projection
+    return columns
+
+
+def suite_methods(path=CHARTS_PATH):
+    """dcr_chart_suite method nodes, {name: ast.FunctionDef}"""
+    global _suite_methods
+    if _suite_methods is None:
+        with open(path) as f:
+            tree = ast.parse(f.read())
+        suite = [node for node in tree.body if isinstance(node,ast.ClassDef) and node.name == SUITE_CLASS][0]
+        _suite_methods = dict((node.name,node) for node in suite.body if isinstance(node,ast.FunctionDef))
+    return _suite_methods
+
+
+def bind_args(method,args):
+    """Parameters of a method node bound to positional args and literal defaults, {name: value}"""
+    params = [arg.arg for arg in method.args.args][1:]
+    bound = {}
+    for param, default in zip(params[len(params)-len(method.args.defaults):],method.args.defaults):
+        try:
+            bound[param] = ast.literal_eval(default)
+        except ValueError:
+            pass
+    bound.update(zip(params,args))
+    return bound
+
+
+def call_value(node,bound):
+    """Value of a literal or bound parameter argument, ValueError for anything else"""
+    if isinstance(node,ast.Name):
+        if node.id not in bound:
+            raise ValueError(node.id)
+        return bound[node.id]
+    return ast.literal_eval(node)
+
+
+def chart_metric_calls(method,args=()):
+    """
+    Registry lookups of a chart method and the helper methods it calls
+    INPUTS:
+        method = str, dcr_chart_suite method
+        args   = manifest args of the chart, bound to the method parameters
+    RETURNS: [(name,args,kwargs),...], self.metric calls whose arguments are literals or
+             parameters of the chart method (helpers only resolve literals), others are skipped
+    """
+    methods = suite_methods()
+    calls = []
+    seen = set()
+    stack = [(method,tuple(args))]
+    while stack:
+        name, values = stack.pop()
+        if name in seen or name not in methods:
+            continue
+        seen.add(name)
+        bound = bind_args(methods[name],values)
+        for node in ast.walk(methods[name]):
+            if not (
+                isinstance(node,ast.Call) and isinstance(node.func,ast.Attribute)
+                and isinstance(node.func.value,ast.Name) and node.func.value.id == 'self'
+            ):
+                continue
+            if node.func.attr == 'metric':
+                try:
+                    call = (
+                        call_value(node.args[0],bound),
+                        tuple(call_value(arg,bound) for arg in node.args[1:]),
+                        dict((keyword.arg,call_value(keyword.value,bound)) for keyword in node.keywords),
+                    )
+                except (ValueError,IndexError):
+                    continue
+                if call not in calls:
+                    calls.append(call)
+            elif node.func.attr in methods:
+                stack.append((node.func.attr,()))
+    return calls
+
+
+def shared_metric_calls(jobs):
+    """
+    Registry lookups made by more than one chart job
+    INPUTS:
+        jobs = [(method,args),...]
+    RETURNS: [(name,args,kwargs),...], see chart_metric_calls
+    """
+    calls = []
+    counts = {}
+    for method, args in jobs:
+        for call in chart_metric_calls(method,args):
+            key = repr(call)
+            if key not in counts:
+                counts[key] = 0
+                calls.append(call)
+            counts[key] += 1
+    return [call for call in calls if counts[repr(call)] > 1]
+
+
+def project(df,columns):
+    """Columns of df named in columns, in frame order (df itself when nothing is dropped)"""
+    keep = [column for column in df.columns if column in columns]
+    return df if len(keep) == len(df.columns) else df[keep]
+
+
+@contextmanager
+def recording_reads():
+    """Records every label read from any DataFrame through [] or attribute access"""
+    seen = set()
+    getitem = pd.DataFrame.__getitem__
+    getattribute = pd.DataFrame.__getattr__
+
+    def record(key):
+        keys = key if isinstance(key,(list,tuple,pd.Index)) else [key]
+        for label in keys:
+            if isinstance(label,str):
+                seen.add(label)
+
+    def tracked_getitem(df,key):
+        record(key)
+        return getitem(df,key)
+
+    def tracked_getattr(df,name):
+        #Only reached when normal lookup fails, i.e. df.column access
+        seen.add(name)
+        return getattribute(df,name)
+
+    pd.DataFrame.__getitem__ = tracked_getitem
+    pd.DataFrame.__getattr__ = tracked_getattr
+    try:
+        yield seen
+    finally:
+        pd.DataFrame.__getitem__ = getitem
+        pd.DataFrame.__getattr__ = getattribute
+
+
+def same_result(full,projected,dropped):
+    """
+    True when a metric computed from a projection matches the full frame result
+    INPUTS:
+        full      = result from the full base frame
+        projected = result from the projection
+        dropped   = set, base columns left out of the projection (they only pass through)
+    """
+    if isinstance(full,pd.DataFrame):
+        if not isinstance(projected,pd.DataFrame) or not full.index.equals(projected.index):
+            return False
+        missing = [column for column in full.columns if column not in projected.columns]
+        if any(column not in dropped for column in missing):
+            return False
+        return full[list(projected.columns)].equals(projected)
+    if isinstance(full,pd.Series):
+        return isinstance(projected,pd.Series) and full.equals(projected)
+    if isinstance(full,(list,tuple)):
+        return (
+            isinstance(projected,(list,tuple)) and len(full) == len(projected)
+            and all(same_result(a,b,dropped) for a, b in zip(full,projected))
+        )
+    try:
+        return bool(full == projected)
+    except Exception:
+        return False
+
+
+class column_learner():
+
+    def __init__(self,base_columns):
+        """
+        Base columns read by each metric, collected while charts render from the full frame
+        A metric declares the columns it reads plus the base columns its charts read back
+        from its result (columns it passes through)
+        INPUTS:
+            base_columns = [str,...], columns of the full base frame
+        """
+        self.base_columns = set(base_columns)
+        #Columns read by the metric itself, checked to reproduce its result
+        self.reads = {}
+        #Base columns read from the metric result by the charts using it
+        self.passed = {}
+        self.rejected = set()
+        self.touched = set()
+
+    def touch(self,name):
+        """Marks a metric as used by the chart being rendered"""
+        self.touched.add(name)
+
+    @contextmanager
+    def chart(self):
+        """Attributes every base column read while a chart renders to the metrics it uses"""
+        self.touched = set()
+        with recording_reads() as seen:
+            yield
+        for name in self.touched:
+            self.passed[name] = self.passed.get(name,set()) | (self.base_columns & seen)
+
+    def compute(self,name,frame,function):
+        """
+        Runs function(frame) recording the columns it reads, then checks the metric gives the
+        same result from only those columns. A metric failing the check stays on the full frame
+        """
+        with recording_reads() as seen:
+            result = function(frame)
+        columns = [column for column in frame.columns if column in seen or column in ALWAYS]
+        try:
+            same = same_result(
+                result,function(frame[columns].copy()),set(frame.columns) - set(columns)
+            )
+        except Exception:
+            same = False
+        if same:
+            self.reads[name] = self.reads.get(name,set()) | set(columns)
+        else:
+            self.rejected.add(name)
+        return result
+
+    def declared(self):
+        return dict(
+            (name,sorted(columns | self.passed.get(name,set())))
+            for name, columns in self.reads.items() if name not in self.rejected
+        )
+
+    def write(self,path=REGISTRY_PATH):
+        """Merges the learned columns into the registry file, rejected metrics are removed"""
+        global _metric_inputs
+        with open(path) as f:
+            header = [line for line in f.read().splitlines() if line.startswith('#')]
+        metrics = dict(metric_inputs(path))
+        metrics.update(self.declared())
+        for name in self.rejected:
+            metrics.pop(name,None)
+        with open(path + '.tmp','w') as f:
+            f.write('\n'.join(header) + '\n\n')
+            yaml.safe_dump({'metrics':dict(sorted(metrics.items()))},f,default_flow_style=None,width=100)
+        os.replace(path + '.tmp',path)
+        _metric_inputs = None
+        print(
+            '...Column registry written to ' + path + ', ' + str(len(self.declared())) + ' metrics learned, '
+            + str(len(self.rejected)) + ' left on the full frame'
+        )
+
+
+def learn_columns(base_df,entries,sources,path=REGISTRY_PATH):
+    """
+    Renders manifest entries once from the full base frame and writes the columns each
+    metric reads to the registry
+    INPUTS:
+        base_df = DataFrame, full dcr_ticket_models() frame
+        entries = manifest entries to render (dcr_manifest.select_entries)
+        sources = dcr_fetch.source_store for the upstream datasets
+    """
+    from dcr_memo import metric_registry
+    from generate_charts import dcr_chart_suite
+    learner = column_learner(base_df.columns)
+    metrics = metric_registry(base_df,learner=learner)
+    suite = dcr_chart_suite('light',df=base_df.copy(),metrics=metrics,sources=sources)
+    for entry in entries:
+        print('...Learning columns of ' + entry['name'])
+        try:
+            with learner.chart():
+                getattr(suite,entry['method'])(*entry['args'])
+        except Exception as e:
+            #The metrics keep the columns read so far, the chart falls back on a KeyError
+            print('...FAILED ' + entry['name'] + ': ' + repr(e))
+    learner.write(path)
+    return learner
+
+
+def print_projections(base_df,entries):
+    """Prints how many base columns each chart loads"""
+    total = len(base_df.columns)
+    union = set()
+    full = 0
+    for entry in entries:
+        columns = chart_projection(entry['method'])
+        if columns is None:
+            full += 1
+            print(
+                '    ' + entry['name'] + ': full frame, undeclared '
+                + ', '.join(undeclared_metrics(entry['method']))
+            )
+            continue
+        read = [column for column in base_df.columns if column in columns]
+        union |= set(read)
+        print('    ' + entry['name'] + ': ' + str(len(read)) + '/' + str(total) + ' columns')
+    print(
+        '...Selected charts load ' + str(total if full else len(union)) + '/' + str(total)
+        + ' base columns (' + str(len(entries)-full) + '/' + str(len(entries)) + ' charts projected)'
+    )
@@ -0,0 +1,107 @@
+#Compact Plotly figure JSON export
+#
+#Layout written by write_compact_json():
+#   - layout.template is removed (the site applies its own theme)
+#   - x arrays used by more than one trace are stored once under "shared" and the
+#     traces reference them as {"ref": "<key>"}
+#   - numeric arrays are float32 base64 typed arrays {"dtype": "f4", "bdata": ...},
+#     the plotly.js typed array format
+#expand_figure() turns a compact figure back into a plain Plotly figure dict.
+import base64
+import json
+import numbers
+
+import numpy as np
+
+#Arrays shorter than this (zone boundaries, annotations) are left untouched
+MIN_ARRAY_LEN = 8
+
+
+def is_numeric(values):
+    return all(
+        value is None or (isinstance(value,numbers.Number) and not isinstance(value,bool))
+        for value in values
+    )
+
+
+def encode_array(values):
+    """float32 base64 typed array, None becomes NaN"""
+    array = np.array([np.nan if value is None else value for value in values],dtype='<f4')
+    return {'dtype':'f4','bdata':base64.b64encode(array.tobytes()).decode('ascii')}
+
+
+def decode_array(encoded):
+    array = np.frombuffer(base64.b64decode(encoded['bdata']),dtype='<' + encoded['dtype'])
+    return [None if np.isnan(value) else float(value) for value in array]
+
+
+def compact_figure(figure):
+    """
+    Converts a plain Plotly figure dict (as produced by fig.to_json()) to the compact layout
+    """
+    data = figure.get('data',[])
+    layout = dict(figure.get('layout',{}))
+    layout.pop('template',None)
+
+    #Count x arrays by content so only the ones repeated across traces are shared
+    x_seen = {}
+    for trace in data:
+        x = trace.get('x')
+        if isinstance(x,list) and len(x) >= MIN_ARRAY_LEN:
+            key = json.dumps(x)
+            x_seen[key] = x_seen.get(key,0) + 1
+
+    shared = {}
+    shared_keys = {}
+    traces = []
+    for trace in data:
+        trace = dict(trace)
+        x = trace.get('x')
+        if isinstance(x,list) and len(x) >= MIN_ARRAY_LEN:
+            key = json.dumps(x)
+            if x_seen[key] > 1:
+                if key not in shared_keys:
+                    shared_keys[key] = 'x' + str(len(shared_keys))
+                    shared[shared_keys[key]] = encode_array(x) if is_numeric(x) else x
+                trace['x'] = {'ref':shared_keys[key]}
+            elif is_numeric(x):
+                trace['x'] = encode_array(x)
+        y = trace.get('y')
+        if isinstance(y,list) and len(y) >= MIN_ARRAY_LEN and is_numeric(y):
+            trace['y'] = encode_array(y)
+        traces.append(trace)
+
+    compact = {'data':traces,'layout':layout}
+    if shared:
+        compact['shared'] = shared
+    return compact
+
+
+def expand_figure(compact):
+    """Restores a plain Plotly figure dict from the compact layout (values as float32)"""
+    shared = compact.get('shared',{})
+    traces = []
+    for trace in compact.get('data',[]):
+        trace = dict(trace)
+        for axis in ('x','y'):
+            values = trace.get(axis)
+            if isinstance(values,dict) and 'ref' in values:
+                values = shared[values['ref']]
+            if isinstance(values,dict) and 'bdata' in values:
+                values = decode_array(values)
+            if values is not None:
+                trace[axis] = values
+        traces.append(trace)
+    return {'data':traces,'layout':compact.get('layout',{})}
+
+
+def write_compact_json(fig,path):
+    """
+    Writes a Plotly figure in the compact layout
+    RETURNS: (full_bytes, compact_bytes), size of fig.write_json() output vs the compact file
+    """
+    full = fig.to_json()
+    compact = json.dumps(compact_figure(json.loads(full)),separators=(',',':'))
+    with open(path,'w') as f:
+        f.write(compact)
+    return len(full.encode('utf-8')), len(compact.encode('utf-8'))
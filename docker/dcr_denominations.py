@@ -0,0 +1,95 @@
+#Quote denominations of the native DCR flows behind the block subsidy and commitment charts
+#   price_matrix(df) -> quotes ['USD','BTC',...] and the DCR price in each (days x quotes)
+#   denominate(df)   -> df with <flow>Cap<quote> and <flow>Price<quote> for every flow and quote
+#Each flow is taken to DCR once (its native column, or its USD column over PriceUSD), then every
+#quote is one broadcast multiply against the price matrix (days x flows x quotes) and one cumsum.
+#USD and BTC come from PriceUSD and PriceBTC, any other <Q>_PriceUSD column in the frame (e.g.
+#ETH_PriceUSD) adds quote Q at PriceUSD / <Q>_PriceUSD, so a new denomination costs one column.
+import numpy as np
+import pandas as pd
+
+from dcr_trace import span
+
+#(output prefix, native DCR column, USD column giving the flow when the native column is missing)
+FLOWS = [
+    ('SubsidyPoW','PoW_income_dcr','PoW_income_usd'),
+    ('SubsidyPoS','PoS_income_dcr','PoS_income_usd'),
+    ('SubsidyFund','Fund_income_dcr','Fund_income_usd'),
+    ('Subsidy','Total_income_dcr','Total_income_usd'),
+    ('TicketsBound',None,'tic_usd_cost'),
+]
+#USD valued stocks converted at the day's cross rate for quotes upstream does not provide
+STOCKS = ['CapMrktCur','CapReal','PriceReal','IssuedCap','IssuedPrice']
+QUOTE_SUFFIX = '_PriceUSD'
+
+
+def price_matrix(df):
+    """
+    DCR price in every quote the frame can price
+    RETURNS: (quotes, array (days x quotes)), quotes[0] is always 'USD'
+    """
+    quotes = ['USD']
+    prices = [df['PriceUSD'].to_numpy(dtype='float64')]
+    if 'PriceBTC' in df.columns:
+        quotes.append('BTC')
+        prices.append(df['PriceBTC'].to_numpy(dtype='float64'))
+    for column in df.columns:
+        quote = column[:-len(QUOTE_SUFFIX)]
+        if column.endswith(QUOTE_SUFFIX) and quote.isalpha() and quote.isupper() and quote not in quotes:
+            quotes.append(quote)
+            with np.errstate(divide='ignore',invalid='ignore'):
+                prices.append(prices[0] / df[column].to_numpy(dtype='float64'))
+    return quotes, np.column_stack(prices)
+
+
+def native_flows(df,flows=FLOWS):
+    """Daily flows in DCR, array (days x flows)"""
+    price = df['PriceUSD'].to_numpy(dtype='float64')
+    columns = []
+    for prefix, native, usd in flows:
+        if native is not None and native in df.columns:
+            columns.append(df[native].to_numpy(dtype='float64'))
+        else:
+            with np.errstate(divide='ignore',invalid='ignore'):
+                columns.append(np.where(price != 0,df[usd].to_numpy(dtype='float64') / price,np.nan))
+    return np.column_stack(columns)
+
+
+def denominate(df,flows=FLOWS,stocks=STOCKS):
+    """
+    Cumulative value of the native flows in every quote denomination
+    INPUTS:
+        df     = DataFrame with PriceUSD, SplyCur, the flow columns and optional quote prices
+                 (metric_issued_cap output)
+        flows  = [(prefix,native,usd),...], see FLOWS
+        stocks = [str,...], USD valued stocks (<stock>USD) to convert, see STOCKS
+    RETURNS: df with <prefix>Cap<quote> (cumsum of the daily value, NaN days skipped like
+             Series.cumsum), <prefix>Price<quote> (cap over SplyCur) and <stock><quote> for
+             quotes missing from df
+    """
+    with span('denominations') as trace:
+        quotes, prices = price_matrix(df)
+        values = native_flows(df,flows)[:,:,None] * prices[:,None,:]
+        missing = np.isnan(values)
+        caps = np.where(missing,np.nan,np.nancumsum(values,axis=0))
+        with np.errstate(divide='ignore',invalid='ignore'):
+            per_coin = caps / df['SplyCur'].to_numpy(dtype='float64')[:,None,None]
+            rates = prices / prices[:,:1]
+        columns = {}
+        for i, (prefix, native, usd) in enumerate(flows):
+            for j, quote in enumerate(quotes):
+                columns[prefix + 'Cap' + quote] = caps[:,i,j]
+                columns[prefix + 'Price' + quote] = per_coin[:,i,j]
+        usd_stocks = [stock for stock in stocks if stock + 'USD' in df.columns]
+        if usd_stocks:
+            converted = df[[stock + 'USD' for stock in usd_stocks]].to_numpy(dtype='float64')[:,:,None] * rates[:,None,:]
+            for i, stock in enumerate(usd_stocks):
+                for j, quote in enumerate(quotes):
+                    if stock + quote not in df.columns:
+                        columns[stock + quote] = converted[:,i,j]
+        trace['quotes'] = len(quotes)
+        trace['columns'] = len(columns)
+    return pd.concat(
+        [df.drop(columns=[column for column in columns if column in df.columns]),pd.DataFrame(columns,index=df.index)],
+        axis=1
+    )
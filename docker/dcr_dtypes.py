@@ -0,0 +1,120 @@
+#Memory-compact dtype profile for the base DataFrame
+#   float64 -> float32, integer counters (blk, tx counts) -> int32 when their range fits,
+#   repetitive strings -> categorical, date -> tz-aware datetime64 (UTC)
+#compare_figures() measures how far chart values move so the profile can be checked
+#against a tolerance before it is used for exports.
+import numpy as np
+import pandas as pd
+
+#Relative tolerance on exported chart values, float32 keeps about 7 significant digits
+#and the metric chain loses some of that in differences and ratios
+DEFAULT_TOLERANCE = 1e-3
+#String columns become categorical when they have fewer distinct values than this share of rows
+CATEGORY_RATIO = 0.5
+INT32 = np.iinfo(np.int32)
+
+
+def frame_bytes(df):
+    return int(df.memory_usage(deep=True,index=True).sum())
+
+
+def compact_frame(df,keep=()):
+    """
+    Returns a copy of df with the compact dtype profile applied
+    INPUTS:
+        df   = DataFrame, dcr_ticket_models() output
+        keep = [str,...], columns left at their original dtype
+    """
+    columns = {}
+    for column in df.columns:
+        values = df[column]
+        if column in keep:
+            columns[column] = values
+        elif column == 'date':
+            values = pd.to_datetime(values)
+            if values.dt.tz is None:
+                values = values.dt.tz_localize('UTC')
+            columns[column] = values
+        elif pd.api.types.is_float_dtype(values):
+            columns[column] = values.astype('float32')
+        elif pd.api.types.is_integer_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            if len(values) and values.min() >= INT32.min and values.max() <= INT32.max:
+                columns[column] = values.astype('int32')
+            else:
+                columns[column] = values
+        elif (
+            (values.dtype == object or pd.api.types.is_string_dtype(values))
+            and values.map(lambda value: isinstance(value,str) or value is None or value != value).all()
+        ):
+            if values.nunique() < CATEGORY_RATIO * len(values):
+                columns[column] = values.astype('category')
+            else:
+                columns[column] = values
+        else:
+            columns[column] = values
+    return pd.DataFrame(columns,index=df.index)
+
+
+def memory_report(before,after,top=10):
+    """Prints total memory of both frames and the columns that shrank the most"""
+    total_before = frame_bytes(before)
+    total_after = frame_bytes(after)
+    print(
+        '...Base frame memory ' + '{:.1f}'.format(total_before/2**20) + 'MB -> '
+        + '{:.1f}'.format(total_after/2**20) + 'MB (-' + '{:.0%}'.format(1 - total_after/max(total_before,1)) + ')'
+    )
+    saved = before.memory_usage(deep=True) - after.memory_usage(deep=True)
+    for column, size in saved.sort_values(ascending=False)[:top].items():
+        if size > 0:
+            print(
+                '    ' + str(column) + ' ' + str(before[column].dtype) + ' -> ' + str(after[column].dtype)
+                + ' saves ' + '{:.0f}'.format(size/1024) + 'kB'
+            )
+    return total_before, total_after
+
+
+def numeric_values(values):
+    """Float array of a trace x/y list, None when the values are not numeric"""
+    if values is None:
+        return None
+    try:
+        array = np.asarray(values,dtype='float64')
+    except (TypeError,ValueError):
+        return None
+    return array if array.ndim == 1 else None
+
+
+def compare_figures(reference,candidate):
+    """
+    Largest relative deviation between the numeric trace values of two figures
+    Each value is compared relative to the largest magnitude of its series, so values
+    crossing zero do not inflate the deviation
+    INPUTS:
+        reference = Plotly figure built from the full precision frame
+        candidate = Plotly figure built from the compact frame
+    RETURNS: (max_deviation, trace_name) or (inf, reason) when the figures differ in shape
+    """
+    reference = reference.to_dict()['data']
+    candidate = candidate.to_dict()['data']
+    if len(reference) != len(candidate):
+        return float('inf'), 'trace count ' + str(len(reference)) + ' != ' + str(len(candidate))
+    worst = (0.0,None)
+    for trace_a, trace_b in zip(reference,candidate):
+        for axis in ('x','y','z'):
+            a = numeric_values(trace_a.get(axis))
+            b = numeric_values(trace_b.get(axis))
+            if a is None or b is None:
+                continue
+            name = str(trace_a.get('name')) + '.' + axis
+            if a.shape != b.shape:
+                return float('inf'), name + ' length ' + str(len(a)) + ' != ' + str(len(b))
+            if not np.array_equal(np.isnan(a),np.isnan(b)):
+                return float('inf'), name + ' NaN positions differ'
+            finite = np.isfinite(a) & np.isfinite(b)
+            scale = np.abs(a[finite]).max() if finite.any() else 0
+            if scale == 0:
+                continue
+            deviation = np.abs(a[finite] - b[finite]).max() / scale
+            if deviation > worst[0]:
+                worst = (float(deviation),name)
+    return worst
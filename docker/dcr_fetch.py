@@ -0,0 +1,140 @@
+#Up-front concurrent fetch of the upstream datasets used by the charts and insights
+import threading
+import time as clock
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from dcr_cache import dcr_base_cache
+from dcr_trace import add_span
+
+#Upper bound on simultaneous upstream requests
+MAX_FETCH_WORKERS = 8
+
+#Upstream datasets read by each chart method (besides the base frame)
+chart_sources = {
+    's2f_model_residuals':['btc_coin','btc_sply_halvings_step'],
+    'dcr_vs_btc':['btc_real','cm_doge'],
+    'fee_growth':['cm_btc','cm_eth'],
+    'treasury_payments':['dcr_treasury'],
+    'mining_pulse':['mining_pulse'],
+}
+#Upstream datasets read by the insight tables
+insight_sources = ['dcrdata_treasury']
+
+
+def upstream():
+    """Names visible to the chart scripts through their checkonchain star imports"""
+    import checkonchain.dcronchain.dcr_add_metrics as dcr
+    import checkonchain.btconchain.btc_add_metrics as btc
+    import checkonchain.general.standard_charts as charts
+    import checkonchain.general.general_helpers as helpers
+    namespace = {}
+    for module in (dcr,btc,charts,helpers):
+        namespace.update(vars(module))
+    return namespace
+
+
+def coinmetrics(asset,start):
+    ns = upstream()
+    return ns['Coinmetrics_api'](asset,start,ns['today']).convert_to_pd().set_index('date',drop=False)
+
+
+source_loaders = {
+    'btc_real':lambda store: upstream()['btc_add_metrics']().btc_real(),
+    'btc_coin':lambda store: upstream()['btc_add_metrics']().btc_coin(),
+    'btc_sply_halvings_step':lambda store: upstream()['btc_add_metrics']().btc_sply_halvings_step(),
+    'cm_btc':lambda store: coinmetrics('btc',"2009-01-03"),
+    'cm_eth':lambda store: coinmetrics('eth',"2015-07-30"),
+    'cm_doge':lambda store: coinmetrics('doge',"2013-01-01"),
+    'dcr_treasury':lambda store: upstream()['dcr_add_metrics']().dcr_treasury(),
+    'dcrdata_treasury':lambda store: upstream()['dcrdata_api']().dcr_treasury(),
+    'mining_pulse':lambda store: upstream()['dcr_add_metrics']().metric_mining_pulse(),
+    'dcr_ticket_models':lambda store: dcr_base_cache().base_frame(store.refresh,store.base_columns),
+}
+
+
+def sources_for(methods):
+    """Upstream datasets needed by a list of chart methods, without duplicates"""
+    names = []
+    for method in methods:
+        for name in chart_sources.get(method,[]):
+            if name not in names:
+                names.append(name)
+    return names
+
+
+class source_store():
+
+    def __init__(self,refresh=False,max_workers=MAX_FETCH_WORKERS,base_columns=None):
+        """
+        Holds upstream datasets fetched ahead of rendering
+        INPUTS:
+            refresh      = bool, rebuild the cached base frame from upstream
+            max_workers  = int, maximum simultaneous fetches
+            base_columns = set of str, base frame columns to load (dcr_columns projection),
+                           None loads every column
+        """
+        self.refresh = refresh
+        self.max_workers = max_workers
+        self.base_columns = base_columns
+        self.data = {}
+        self.timings = {}
+        self.lock = threading.Lock()
+
+    def fetch(self,name):
+        start = clock.perf_counter()
+        cpu = clock.thread_time()
+        result = source_loaders[name](self)
+        self.timings[name] = clock.perf_counter() - start
+        add_span(
+            'fetch:' + name,wall_s=self.timings[name],cpu_s=clock.thread_time()-cpu,
+            rows=len(result) if hasattr(result,'__len__') else None
+        )
+        with self.lock:
+            self.data[name] = result
+        return result
+
+    def prefetch(self,names):
+        """
+        Fetches every named source concurrently, wall time is set by the slowest source
+        A failed source is reported and left to be fetched again on first use
+        """
+        names = [name for name in names if name not in self.data]
+        if not names:
+            return
+        start = clock.perf_counter()
+        with ThreadPoolExecutor(max_workers=min(self.max_workers,len(names))) as pool:
+            futures = dict((name,pool.submit(self.fetch,name)) for name in names)
+        for name, future in futures.items():
+            if future.exception() is None:
+                print('...Fetched ' + name + ' in ' + '{:.2f}'.format(self.timings[name]) + 's')
+            else:
+                error = ''.join(traceback.format_exception(
+                    type(future.exception()),future.exception(),future.exception().__traceback__
+                ))
+                print('...FAILED fetching ' + name + '\n' + error)
+        fetched = sum(1 for future in futures.values() if future.exception() is None)
+        print(
+            '...Fetched ' + str(fetched) + '/' + str(len(names)) + ' upstream sources in '
+            + '{:.2f}'.format(clock.perf_counter()-start) + 's'
+        )
+
+    def get(self,name,copy=True):
+        """
+        Returns a prefetched source, fetching it now when it was not prefetched
+        DataFrames are copied by default because chart methods add columns to them
+        """
+        result = self.data.get(name)
+        if result is None:
+            result = self.fetch(name)
+        if copy and isinstance(result,pd.DataFrame):
+            return result.copy()
+        return result
+
+    def full_base_frame(self):
+        """Every column of the base frame, for a chart that read outside its projection"""
+        if self.base_columns is None:
+            return self.get('dcr_ticket_models')
+        return dcr_base_cache().base_frame()
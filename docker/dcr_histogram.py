@@ -0,0 +1,107 @@
+#Batched histograms and CDFs of the valuation multiples plotted by hist_metrics
+#   histogram_accumulator bins a (days x multiples) array on shared edges in one vectorised
+#   pass, bin i holds values in [start + i*step, start + (i+1)*step), out of range and NaN values
+#   are not counted. Adding a day increments one bin per multiple.
+#daily_histogram() keeps the counts of each multiple up to its last final day in the cache
+#directory, a run only bins the days added since. A multiple whose history moved (the S2F
+#multiple follows the daily regression refit) is binned again from scratch.
+import os
+
+import numpy as np
+import pandas as pd
+
+from dcr_cache import dcr_base_cache
+from dcr_incremental import committed_state
+from dcr_trace import add_span
+
+#Shared bins of the hist_metrics chart
+HIST_START = 0.1
+HIST_STOP = 3.0
+HIST_STEP = 0.1
+STATE_NAME = 'hist_state.json'
+
+
+class histogram_accumulator():
+
+    def __init__(self,names,start=HIST_START,stop=HIST_STOP,step=HIST_STEP):
+        """
+        Bin counts of several series on shared edges
+        INPUTS:
+            names = [str,...], one per column of the values passed to add()
+            start = float, left edge of the first bin
+            stop  = float, right edge of the last bin
+            step  = float, bin width
+        """
+        self.names = list(names)
+        self.start = start
+        self.step = step
+        self.n_bins = int(round((stop - start) / step))
+        self.counts = np.zeros((len(self.names),self.n_bins),dtype='int64')
+
+    def edges(self):
+        """Left edge of every bin, rounded so labels read 0.1, 0.2, ..."""
+        return np.round(self.start + self.step * np.arange(self.n_bins),10)
+
+    def add(self,values):
+        """
+        Counts rows of values
+        INPUTS:
+            values = array (rows x names), NaN for a day without a value
+        """
+        values = np.asarray(values,dtype='float64').reshape(-1,len(self.names))
+        with np.errstate(invalid='ignore'):
+            #Rounded before the floor so values on an edge (0.3 = 3 x 0.1) land in the upper bin
+            bins = np.floor(np.round((values - self.start) / self.step,9))
+        valid = np.isfinite(bins) & (bins >= 0) & (bins < self.n_bins)
+        flat = (np.arange(len(self.names))[None,:] * self.n_bins + np.where(valid,bins,0)).astype('int64')
+        self.counts += np.bincount(
+            flat[valid],minlength=len(self.names) * self.n_bins
+        ).reshape(len(self.names),self.n_bins)
+
+    def copy(self):
+        other = histogram_accumulator(self.names,self.start,self.start + self.step * self.n_bins,self.step)
+        other.counts = self.counts.copy()
+        return other
+
+    def to_dict(self):
+        return {'counts':self.counts.tolist()}
+
+    def load(self,state):
+        self.counts = np.array(state['counts'],dtype='int64')
+
+    def ident(self):
+        """Setup of the accumulator, persisted counts are only reused for the same setup"""
+        return {'names':self.names,'start':self.start,'step':self.step,'bins':self.n_bins}
+
+    def frame(self):
+        """
+        Counts and CDFs of every series
+        RETURNS: DataFrame with 'bin' (left edges) and <name>_count, <name>_cdf per series,
+                 the CDF is the share of the counted values up to and including the bin
+        """
+        df = pd.DataFrame({'bin':self.edges()})
+        for name, counts in zip(self.names,self.counts):
+            total = counts.sum()
+            df[name + '_count'] = counts
+            df[name + '_cdf'] = counts.cumsum() / total if total else np.nan
+        return df
+
+
+def daily_histogram(frame,state_dir=None):
+    """
+    Histogram and CDF of every column of frame, reusing the counts committed by earlier runs
+    INPUTS:
+        frame     = DataFrame (days x multiples), date index ascending
+        state_dir = str, directory keeping the committed counts (default cache directory)
+    RETURNS: histogram_accumulator.frame() of the columns
+    """
+    state = committed_state(os.path.join(state_dir or dcr_base_cache().cache_dir,STATE_NAME))
+    histogram = histogram_accumulator(frame.columns)
+    for j, name in enumerate(frame.columns):
+        column, added, rebuilt = state.update(
+            'hist:' + name,frame.index,frame[[name]].to_numpy(dtype='float64'),
+            lambda: histogram_accumulator([name]),histogram_accumulator([name]).ident()
+        )
+        histogram.counts[j] = column.counts[0]
+        add_span('histogram:' + name,rows=len(frame),added=added,rebuilt=rebuilt)
+    return histogram.frame()
@@ -0,0 +1,68 @@
+#Import-time audit: runs an import statement under `python -X importtime` in a fresh interpreter
+#   python3 -m dcronchain_data imports --stage insights
+import re
+import subprocess
+import sys
+import time as clock
+
+#Statement each pipeline stage imports before doing any work
+stage_imports = {
+    'insights':'import dcronchain_data, dcr_memo, generate_insights',
+    'charts':'import dcronchain_data, dcr_memo, generate_charts',
+}
+
+#import time: self [us] | cumulative | imported package
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)\s*$')
+
+
+def audit_imports(statement,cwd=None):
+    """
+    Imports statement in a fresh interpreter and collects the -X importtime log
+    INPUTS:
+        statement = str, python code to run (e.g. 'import generate_insights')
+        cwd       = str, working directory of the interpreter
+    RETURNS: (records, seconds, error), records = [(module,self_us,cumulative_us,depth),...],
+             seconds = wall time of the interpreter, error = stderr tail when the import failed
+    """
+    start = clock.perf_counter()
+    process = subprocess.run(
+        [sys.executable,'-X','importtime','-c',statement],
+        stdout=subprocess.DEVNULL,stderr=subprocess.PIPE,cwd=cwd,universal_newlines=True
+    )
+    seconds = clock.perf_counter() - start
+    records = []
+    other = []
+    for line in process.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            records.append((
+                match.group(4),int(match.group(1)),int(match.group(2)),len(match.group(3)) // 2
+            ))
+        elif not line.startswith('import time:'):
+            other.append(line)
+    error = '\n'.join(other[-5:]) if process.returncode != 0 else None
+    return records, seconds, error
+
+
+def package_totals(records):
+    """Self time per top level package (pandas, plotly, statsmodels, ...) in microseconds"""
+    totals = {}
+    for module, self_us, cumulative_us, depth in records:
+        package = module.split('.')[0]
+        totals[package] = totals.get(package,0) + self_us
+    return sorted(totals.items(),key=lambda item: -item[1])
+
+
+def print_audit(label,statement,top=15,cwd=None):
+    records, seconds, error = audit_imports(statement,cwd)
+    print('...Import audit for ' + label + ': ' + statement)
+    if error is not None:
+        print('...FAILED import\n' + error)
+    print(
+        '...Interpreter wall ' + '{:.2f}'.format(seconds) + 's, imports '
+        + '{:.2f}'.format(sum(record[1] for record in records) / 1e6) + 's over '
+        + str(len(records)) + ' modules'
+    )
+    for package, self_us in package_totals(records)[:top]:
+        print('    ' + '{:>8.1f}'.format(self_us / 1e3) + 'ms  ' + package)
+    return records, seconds, error
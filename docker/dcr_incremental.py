@@ -0,0 +1,195 @@
+#Incremental daily append for the full_decred_data frame exported by generate_insights.py
+#and committed daily state of the accumulators built on top of the history (see committed_state)
+import fcntl
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+#History rows fed to the metric chain ahead of the new rows
+#must exceed the widest rolling window in the chain (200 day Mayer Multiple)
+LOOKBACK_DAYS = 400
+#Trailing stored days treated as provisional and recomputed (upstream revises the latest days)
+REVISE_DAYS = 2
+
+
+class dcr_incremental_data():
+
+    def __init__(self,path,metrics,lookback=LOOKBACK_DAYS,revise=REVISE_DAYS,registry=None):
+        """
+        Appends new days to a persisted full_decred_data frame, recomputing only
+        the tail of the metric chain instead of the whole history
+        INPUTS:
+            path     = str, persisted full_decred_data.csv (date index)
+            metrics  = [(str,tuple),...], dcr_add_metrics methods and extra args
+                       applied in order to the base frame
+            lookback = int, history rows fed to the chain ahead of the new rows
+            revise   = int, trailing stored days that are recomputed every run
+            registry = metric_registry over the base frame, supplies the first
+                       metric of a full rebuild when it was already computed for charts
+        """
+        self.path = path
+        self.metrics = metrics
+        self.lookback = lookback
+        self.revise = revise
+        self.registry = registry
+
+    def apply_metrics(self,df,metrics=None):
+        from checkonchain.dcronchain.dcr_add_metrics import dcr_add_metrics
+        for name, args in (self.metrics if metrics is None else metrics):
+            df = getattr(dcr_add_metrics(),name)(df,*args)
+        return df
+
+    def load_persisted(self):
+        if not os.path.exists(self.path):
+            return None
+        return pd.read_csv(self.path,index_col='date',parse_dates=['date'])
+
+    def full_rebuild(self,base):
+        print('...Computing Decred metrics over full history')
+        if self.registry is not None and self.registry.df is base:
+            name, args = self.metrics[0]
+            df = self.registry.get(name,*args)
+            #A metric declared in column_registry.yaml comes back with its own columns only,
+            #the rest of the chain and the persisted frame need every base column
+            missing = [column for column in base.columns if column not in df.columns]
+            if missing and df.index.equals(base.index):
+                added = [column for column in df.columns if column not in base.columns]
+                df = pd.concat([base[missing],df],axis=1)[list(base.columns) + added]
+            elif missing:
+                df = self.apply_metrics(base.copy(),self.metrics[:1])
+            return self.apply_metrics(df,self.metrics[1:]).set_index('date')
+        return self.apply_metrics(base.copy()).set_index('date')
+
+    def rows_match(self,a,b,rtol=1e-6):
+        """Compares the numeric values of two rows, treating NaN == NaN"""
+        a = pd.to_numeric(a,errors='coerce').astype(float)
+        b = pd.to_numeric(b,errors='coerce').astype(float)
+        return bool(np.isclose(a.values,b.values,rtol=rtol,equal_nan=True).all())
+
+    def update(self,base,full=False):
+        """
+        Returns the date-indexed metric frame for base, appending to the persisted frame
+        INPUTS:
+            base = DataFrame, dcr_ticket_models() output sorted by date
+            full = bool, ignore the persisted frame and recompute everything
+        """
+        stored = None if full else self.load_persisted()
+        if stored is None or len(stored) <= self.revise:
+            return self.full_rebuild(base)
+
+        #Anchor = last stored day that is considered final
+        anchor_date = stored.index[-(self.revise+1)]
+        anchor_blk = stored['blk'].iloc[-(self.revise+1)]
+        new = ((base['date']>anchor_date) & (base['blk']>anchor_blk)).values
+        if not new.any():
+            print('...Decred metrics already up to date')
+            return stored
+        first_new = int(np.argmax(new))
+        if first_new == 0:
+            return self.full_rebuild(base)
+
+        tail = base.iloc[max(first_new-self.lookback,0):].copy()
+        tail = self.apply_metrics(tail).set_index('date')
+
+        #The anchor day must come out of the tail unchanged, otherwise the lookback
+        #was too short or upstream revised older history
+        if (
+            anchor_date not in tail.index
+            or set(tail.columns) != set(stored.columns)
+            or not self.rows_match(stored.loc[anchor_date],tail.loc[anchor_date,stored.columns])
+        ):
+            print('...Stored Decred metrics diverged from upstream, recomputing')
+            return self.full_rebuild(base)
+
+        appended = tail[tail.index>anchor_date][stored.columns]
+        print('...Appending ' + str(len(appended)) + ' days to Decred metrics')
+        return pd.concat([stored[stored.index<=anchor_date],appended])
+
+
+class committed_state():
+
+    def __init__(self,path,revise=REVISE_DAYS):
+        """
+        Daily accumulators (regression statistics, histograms, sketches) persisted up to the
+        last final day, so a run only folds in the days added since
+        An accumulator has add(values) (rows x columns array), copy(), to_dict() and load(state)
+        INPUTS:
+            path   = str, JSON file holding the committed state of every accumulator
+            revise = int, trailing days never committed (upstream revises them)
+        """
+        self.path = path
+        self.revise = revise
+        self.state = None
+
+    def read(self):
+        """Committed state on disk, {} when missing or unreadable"""
+        if os.path.exists(self.path):
+            try:
+                with open(self.path) as f:
+                    return json.load(f)
+            except ValueError:
+                pass
+        return {}
+
+    def load(self):
+        if self.state is None:
+            self.state = self.read()
+        return self.state
+
+    def save(self,names):
+        """
+        Writes the accumulators in names, keeping the ones other processes committed since load
+        Forked chart workers share the file, the lock serialises the re-read, merge and replace
+        """
+        os.makedirs(os.path.dirname(self.path) or '.',exist_ok=True)
+        with open(self.path + '.lock','a') as lock:
+            fcntl.flock(lock,fcntl.LOCK_EX)
+            state = self.read()
+            state.update((name,self.state[name]) for name in names)
+            self.state = state
+            tmp = self.path + '.' + str(os.getpid()) + '.tmp'
+            with open(tmp,'w') as f:
+                json.dump(self.state,f)
+            os.replace(tmp,self.path)
+
+    def update(self,name,dates,values,empty,ident=None):
+        """
+        Folds the rows of values into the accumulator committed for name
+        Committed rows are checked by count and by the date and values of the last committed
+        row, a mismatch (revised history, other dataset, changed ident) rebuilds from scratch
+        INPUTS:
+            name   = str, accumulator key
+            dates  = dates of the rows, ascending
+            values = array (rows x columns)
+            empty  = callable returning a new, empty accumulator
+            ident  = JSON value describing the accumulator setup (e.g. bin edges)
+        RETURNS: (accumulator over every row, rows added to the committed state, rebuilt)
+        """
+        dates = [str(value) for value in pd.to_datetime(pd.Series(dates).values,utc=True)]
+        values = np.asarray(values,dtype='float64')
+        commit = len(values) - self.revise
+        stored = self.load().get(name)
+        start = 0
+        committed = empty()
+        if stored is not None and stored['ident'] == ident and 0 < stored['rows'] <= commit:
+            last = stored['rows'] - 1
+            if dates[last] == stored['date'] and np.allclose(
+                values[last],np.array(stored['row'],dtype='float64'),equal_nan=True
+            ):
+                start = stored['rows']
+                committed.load(stored['state'])
+        if commit > start:
+            committed.add(values[start:commit])
+            self.state[name] = {
+                'ident':ident,'rows':commit,'date':dates[commit - 1],
+                #NaN is written as null so the file stays plain JSON
+                'row':[None if np.isnan(value) else float(value) for value in values[commit - 1]],
+                'state':committed.to_dict(),
+            }
+            self.save([name])
+        total = committed.copy()
+        total.add(values[max(commit,start):])
+        return total, max(commit - start,0), start == 0
+
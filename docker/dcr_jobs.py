@@ -0,0 +1,114 @@
+#Process pool scheduler for chart exports
+import multiprocessing
+import os
+import time as clock
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+from dcr_compact_json import write_compact_json
+from dcr_trace import active_trace, file_bytes, run_trace, span, swap_trace
+
+#Chart suite inherited by forked workers, set before the pool starts
+_suite = None
+
+
+def job_label(method,args):
+    return method + '(' + ','.join(str(arg) for arg in args) + ')'
+
+
+def render_job(task):
+    """
+    Builds one chart and writes its JSON
+    RETURNS: (seconds, error, sizes, spans), sizes = (full_bytes, compact_bytes) in compact mode,
+             spans = trace spans of the job, merged into the parent trace by run_chart_jobs
+    """
+    method, args, path, compact = task
+    #Spans go to a trace of their own so forked and in-process jobs report the same way
+    outer = active_trace()
+    job_trace = run_trace(outer.memory) if outer is not None else None
+    swap_trace(job_trace)
+    start = clock.perf_counter()
+    sizes = None
+    with span('chart:' + job_label(method,args)) as chart:
+        try:
+            with span('build') as build:
+                try:
+                    fig = getattr(_suite,method)(*args)
+                except KeyError as e:
+                    #Column outside the chart's projection, built again from the full frame
+                    if not _suite.widen(e):
+                        raise
+                    build['widened'] = True
+                    fig = getattr(_suite,method)(*args)
+            with span('write_json') as write:
+                if compact:
+                    sizes = write_compact_json(fig,path)
+                else:
+                    fig.write_json(path)
+                write['bytes'] = file_bytes(path)
+            chart['bytes'] = write['bytes']
+            error = None
+        except Exception:
+            #A broken chart is reported, it never takes the other jobs down
+            error = traceback.format_exc()
+            chart['failed'] = True
+    swap_trace(outer)
+    spans = job_trace.spans if job_trace is not None else []
+    return clock.perf_counter() - start, error, sizes, spans
+
+
+def run_chart_jobs(suite,jobs,data_dir,n_jobs=1,compact=False):
+    """
+    Renders chart jobs and writes them to data_dir
+    Workers are forked after the suite is built so they share its base frame copy-on-write
+    INPUTS:
+        suite    = dcr_chart_suite with the base frame loaded
+        jobs     = [(method,args,filename),...]
+        data_dir = str, output directory
+        n_jobs   = int, worker processes (1 renders in this process)
+        compact  = bool, write compact JSON (see dcr_compact_json) and report the savings
+    RETURNS:
+        list of (label,seconds,error) in job order, error = None on success
+    """
+    global _suite
+    _suite = suite
+    tasks = [(method,args,os.path.join(data_dir,filename),compact) for method, args, filename in jobs]
+
+    start = clock.perf_counter()
+    if n_jobs <= 1:
+        outcomes = [render_job(task) for task in tasks]
+    else:
+        outcomes = []
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(max_workers=n_jobs,mp_context=context) as pool:
+            futures = [pool.submit(render_job,task) for task in tasks]
+            for future in futures:
+                try:
+                    outcomes.append(future.result())
+                except Exception:
+                    #Worker died outright (e.g. killed for memory)
+                    outcomes.append((float('nan'),traceback.format_exc(),None,[]))
+
+    results = []
+    trace = active_trace()
+    for (method, args, filename), (seconds, error, sizes, spans) in zip(jobs,outcomes):
+        label = job_label(method,args)
+        if trace is not None:
+            trace.adopt(spans)
+        if error is None:
+            saving = ''
+            if sizes is not None:
+                saving = (
+                    ', ' + '{:.0f}'.format(sizes[0]/1024) + 'kB -> ' + '{:.0f}'.format(sizes[1]/1024)
+                    + 'kB (-' + '{:.0%}'.format(1 - sizes[1]/max(sizes[0],1)) + ')'
+                )
+            print('...Rendered ' + label + ' in ' + '{:.2f}'.format(seconds) + 's' + saving)
+        else:
+            print('...FAILED ' + label + '\n' + error)
+        results.append((label,seconds,error))
+    failed = sum(1 for result in results if result[2] is not None)
+    print(
+        '...Rendered ' + str(len(results)-failed) + '/' + str(len(results)) + ' charts in '
+        + '{:.2f}'.format(clock.perf_counter()-start) + 's with ' + str(n_jobs) + ' job(s)'
+    )
+    return results
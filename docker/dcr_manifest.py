@@ -0,0 +1,96 @@
+#Declarative chart catalogue deciding which dcr_chart_suite methods are exported
+import hashlib
+import json
+import os
+
+import yaml
+
+MANIFEST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),'chart_manifest.yaml')
+
+
+def load_manifest(path=MANIFEST_PATH):
+    """Returns the chart entries of a manifest file with defaults filled in"""
+    with open(path) as f:
+        manifest = yaml.safe_load(f)
+    entries = []
+    for entry in manifest['charts']:
+        entry = dict(entry)
+        entry.setdefault('args',[])
+        entry.setdefault('theme','light')
+        entry.setdefault('tags',[])
+        entries.append(entry)
+    names = [entry['name'] for entry in entries]
+    duplicates = sorted(set(name for name in names if names.count(name) > 1))
+    if duplicates:
+        raise ValueError('Duplicate chart names in manifest: ' + ', '.join(duplicates))
+    return entries
+
+
+def select_entries(entries,tags=None,names=None):
+    """
+    Selects manifest entries
+    INPUTS:
+        tags  = [str,...], keep entries carrying any of these tags
+        names = [str,...], keep entries with these names
+        With neither, the whole catalogue is returned
+    """
+    if not tags and not names:
+        return list(entries)
+    known = set(entry['name'] for entry in entries)
+    unknown = [name for name in (names or []) if name not in known]
+    if unknown:
+        raise ValueError('Unknown charts: ' + ', '.join(unknown))
+    return [
+        entry for entry in entries
+        if entry['name'] in (names or [])
+        or set(entry['tags']) & set(tags or [])
+    ]
+
+
+def file_fingerprint(path):
+    with open(path,'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+
+class manifest_state():
+
+    def __init__(self,path):
+        """
+        Remembers the input fingerprint of each rendered chart so that charts
+        whose inputs did not change since their last render can be skipped
+        INPUTS:
+            path = str, JSON state file
+        """
+        self.path = path
+        self.keys = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.keys = json.load(f)
+
+    def entry_key(self,entry,input_key,source_keys=None):
+        """
+        Hash of the manifest entry and the inputs it is rendered from
+        INPUTS:
+            entry       = dict, manifest entry
+            input_key   = str, fingerprint of the base frame columns and the chart module
+            source_keys = {name:str,...}, fingerprint of each upstream dataset the chart reads
+                          (None when it fetched nothing), charts without sources keep their key
+        """
+        ident = [entry,input_key]
+        if source_keys:
+            ident.append(source_keys)
+        ident = json.dumps(ident,sort_keys=True)
+        return hashlib.sha256(ident.encode('utf-8')).hexdigest()[:16]
+
+    def is_current(self,entry,key,data_dir):
+        output = os.path.join(data_dir,entry['output'])
+        return self.keys.get(entry['name']) == key and os.path.exists(output)
+
+    def record(self,entry,key):
+        self.keys[entry['name']] = key
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.',exist_ok=True)
+        with open(self.path + '.tmp','w') as f:
+            json.dump(self.keys,f,indent=1,sort_keys=True)
+        os.replace(self.path + '.tmp',self.path)
@@ -0,0 +1,98 @@
+#Memoized dcr_add_metrics transforms shared by the chart suite and the insight tables
+import pandas as pd
+from checkonchain.dcronchain.dcr_add_metrics import dcr_add_metrics
+
+from dcr_cache import frame_fingerprint
+from dcr_columns import metric_inputs, project
+from dcr_trace import span
+
+
+def copy_result(result):
+    """Copies the DataFrames in a metric result so callers may add columns freely"""
+    if isinstance(result,pd.DataFrame):
+        return result.copy()
+    if isinstance(result,(list,tuple)):
+        return type(result)(copy_result(item) for item in result)
+    return result
+
+
+class metric_registry():
+
+    def __init__(self,df,df_key=None,learner=None):
+        """
+        Computes each dcr_add_metrics transform once per (metric, parameters, base frame)
+        INPUTS:
+            df      = DataFrame, base frame the metrics are computed from
+            df_key  = str, frame_fingerprint(df) when the caller already has it
+            learner = dcr_columns.column_learner recording the columns each metric reads
+        """
+        self.df = df
+        self.df_key = df_key or frame_fingerprint(df)
+        self.learner = learner
+        self.cache = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self,name,*args,columns=None,after=None):
+        """
+        Returns dcr_add_metrics().<name>(frame,*args)
+        INPUTS:
+            name    = str, dcr_add_metrics method
+            args    = extra positional arguments of the method
+            columns = [str,...], project the base frame to these columns first
+            after   = (str,*args), feed the result of this metric instead of the base frame
+        """
+        key = (name,args,tuple(columns) if columns else None,after,self.df_key)
+        if self.learner is not None and after is None and not columns:
+            self.learner.touch(name)
+        if key in self.cache:
+            self.hits += 1
+        else:
+            self.misses += 1
+            projected = False
+            if after is not None:
+                frame = self.get(*after)
+            elif columns:
+                frame = self.df[list(columns)].copy()
+            elif self.learner is None and name in metric_inputs():
+                #Copy only the columns the metric is declared to read (column_registry.yaml)
+                frame = project(self.df,metric_inputs()[name]).copy()
+                projected = len(frame.columns) < len(self.df.columns)
+            else:
+                frame = self.df.copy()
+            function = getattr(dcr_add_metrics(),name)
+            with span('metric:' + name) as trace:
+                if self.learner is not None and after is None and not columns:
+                    self.cache[key] = self.learner.compute(name,frame,lambda frame: function(frame,*args))
+                else:
+                    try:
+                        self.cache[key] = function(frame,*args)
+                    except KeyError as e:
+                        if not projected:
+                            raise
+                        print('...Column registry misses ' + str(e) + ' for ' + name + ', using the full frame')
+                        trace['projection_miss'] = True
+                        self.cache[key] = function(self.df.copy(),*args)
+                trace['rows'] = len(frame)
+                trace['columns'] = len(frame.columns)
+        return copy_result(self.cache[key])
+
+    def warm(self,calls):
+        """
+        Computes metrics ahead of the charts, e.g. in the parent before chart workers fork so
+        they inherit the results instead of each computing its own
+        INPUTS:
+            calls = [(name,args,kwargs),...], see dcr_columns.shared_metric_calls
+        """
+        for name, args, kwargs in calls:
+            try:
+                self.get(name,*args,**kwargs)
+            except Exception as e:
+                #Left to the charts, which compute it again and report the error
+                print('...Could not precompute ' + name + ': ' + repr(e))
+
+    def summary(self):
+        return (
+            '...Metric cache: ' + str(self.hits) + ' hits, ' + str(self.misses) + ' misses, '
+            + str(len(self.cache)) + ' metrics held'
+        )
@@ -0,0 +1,158 @@
+#Prometheus metrics for render runs, derived from the run report (see dcr_trace)
+#
+#Exposed as:
+#   - a text exposition file (node_exporter textfile collector / pushgateway format)
+#   - a push to a Prometheus pushgateway
+#   - an HTTP endpoint while dcronchain_data runs in daemon mode
+import json
+import os
+import time as clock
+
+from prometheus_client import CollectorRegistry, Counter, Gauge
+from prometheus_client import push_to_gateway, start_http_server, write_to_textfile
+
+from dcr_cache import dcr_base_cache
+
+#Job name used for the pushgateway grouping key
+PUSH_JOB = 'dcronchain_data'
+#Time of the last successful run, kept across runs so a failure does not reset it
+LAST_SUCCESS_NAME = 'last_success.json'
+
+
+def spans_named(report,prefix):
+    return [record for record in report['spans'] if record['name'].startswith(prefix)]
+
+
+class run_metrics():
+
+    def __init__(self,state_dir=None):
+        """
+        Prometheus gauges describing the latest render run
+        INPUTS:
+            state_dir = str, directory keeping the last success time (default cache directory)
+        """
+        self.state_path = os.path.join(state_dir or dcr_base_cache().cache_dir,LAST_SUCCESS_NAME)
+        self.registry = CollectorRegistry()
+        #Label sets set on each labelled gauge by the last update
+        self.labelled = {}
+        self.duration = Gauge(
+            'dcr_run_duration_seconds','Wall time of the last render run',registry=self.registry
+        )
+        self.success = Gauge(
+            'dcr_run_success','1 when every stage of the last run succeeded',registry=self.registry
+        )
+        self.run_time = Gauge(
+            'dcr_run_timestamp_seconds','Unix time the last run finished',registry=self.registry
+        )
+        self.last_success = Gauge(
+            'dcr_last_success_timestamp_seconds','Unix time of the last successful run',registry=self.registry
+        )
+        self.stage_seconds = Gauge(
+            'dcr_stage_seconds','Wall time per pipeline stage',['stage'],registry=self.registry
+        )
+        self.chart_seconds = Gauge(
+            'dcr_chart_render_seconds','Build and write time per chart',['chart'],registry=self.registry
+        )
+        self.chart_bytes = Gauge(
+            'dcr_chart_output_bytes','JSON bytes written per chart',['chart'],registry=self.registry
+        )
+        self.chart_failures = Gauge(
+            'dcr_chart_failures','Charts that failed in the last run',registry=self.registry
+        )
+        self.output_bytes = Gauge(
+            'dcr_output_bytes','Total bytes written by the last run',registry=self.registry
+        )
+        self.fetch_seconds = Gauge(
+            'dcr_fetch_seconds','Fetch latency per upstream source',['source'],registry=self.registry
+        )
+        self.cache_events = Gauge(
+            'dcr_cache_events','Cache hits and misses in the last run',['cache','result'],registry=self.registry
+        )
+        self.runs = Counter(
+            'dcr_runs','Render runs since the exporter started',['result'],registry=self.registry
+        )
+
+    def load_last_success(self):
+        if not os.path.exists(self.state_path):
+            return None
+        with open(self.state_path) as f:
+            return json.load(f)['timestamp']
+
+    def save_last_success(self,timestamp):
+        os.makedirs(os.path.dirname(self.state_path) or '.',exist_ok=True)
+        with open(self.state_path,'w') as f:
+            json.dump({'timestamp':timestamp},f)
+
+    def update(self,report,ok):
+        """
+        Sets every gauge from a run report
+        INPUTS:
+            report = dict, dcr_trace run report
+            ok     = bool, every stage succeeded
+        """
+        now = clock.time()
+        runs = [record for record in report['spans'] if record['name'] == 'run']
+        self.duration.set(runs[-1]['wall_s'] if runs else 0)
+        self.success.set(1 if ok else 0)
+        self.run_time.set(now)
+        self.runs.labels('success' if ok else 'failure').inc()
+        if ok:
+            self.save_last_success(now)
+        last = self.load_last_success()
+        if last is not None:
+            self.last_success.set(last)
+
+        stages = {}
+        for record in report['spans']:
+            if record['path'].count('/') == 1 and record['path'].startswith('run/'):
+                stages[(record['name'],)] = record['wall_s']
+        self.set_labelled(self.stage_seconds,stages)
+
+        seconds = {}
+        sizes = {}
+        for record in spans_named(report,'chart:'):
+            chart = record['name'][len('chart:'):]
+            seconds[(chart,)] = record['wall_s']
+            if record.get('bytes'):
+                sizes[(chart,)] = record['bytes']
+        self.set_labelled(self.chart_seconds,seconds)
+        self.set_labelled(self.chart_bytes,sizes)
+        written = sum(record.get('bytes') or 0 for record in spans_named(report,'write_full_data'))
+        self.output_bytes.set(sum(sizes.values()) + written)
+        self.chart_failures.set(sum(1 for record in spans_named(report,'chart:') if record.get('failed')))
+        self.set_labelled(self.fetch_seconds,dict(
+            ((record['name'][len('fetch:'):],),record['wall_s']) for record in spans_named(report,'fetch:')
+        ))
+
+        base = spans_named(report,'base_cache')
+        metric_cache = report.get('metric_cache') or {}
+        self.set_labelled(self.cache_events,{
+            ('base_frame','hit'):sum(1 for record in base if record['hit']),
+            ('base_frame','miss'):sum(1 for record in base if not record['hit']),
+            ('chart','hit'):len(spans_named(report,'skip:')),
+            ('chart','miss'):len(spans_named(report,'chart:')),
+            ('metric','hit'):metric_cache.get('hits',0),
+            ('metric','miss'):metric_cache.get('misses',0),
+        })
+
+    def set_labelled(self,gauge,values):
+        """Sets a labelled gauge to values and drops the labels of earlier runs not in values"""
+        previous = self.labelled.get(gauge,set())
+        for labels in previous - set(values):
+            gauge.remove(*labels)
+        for labels, value in values.items():
+            gauge.labels(*labels).set(value)
+        self.labelled[gauge] = set(values)
+
+    def write(self,path):
+        """Writes the text exposition format, atomically (write_to_textfile renames a temp file)"""
+        write_to_textfile(path,self.registry)
+        print('...Prometheus metrics written to ' + path)
+
+    def push(self,gateway):
+        push_to_gateway(gateway,job=PUSH_JOB,registry=self.registry)
+        print('...Prometheus metrics pushed to ' + gateway)
+
+    def serve(self,port):
+        start_http_server(port,registry=self.registry)
+        print('...Serving Prometheus metrics on port ' + str(port))
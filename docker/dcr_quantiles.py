@@ -0,0 +1,160 @@
+#Streaming quantiles of the valuation multiples behind the percentile bands
+#   kll_sketch keeps levels of retained values, a value on level h stands for 2^h observations.
+#   When the sketch holds more values than its levels fit, the lowest level over capacity is
+#   sorted and every other value moves up one level (compaction). The sketch holds O(k) values
+#   however long the history and two sketches merge level by level. At k = 200 the rank error
+#   stays under ~0.5% of the observations.
+#Compaction alternates between odd and even positions instead of picking at random, the same
+#days always give the same sketch. The sketch of each multiple is committed up to its last final
+#day in the cache directory (dcr_incremental.committed_state), a run only adds the new days.
+#Percentile bands are on with --percentile-bands (DCR_PERCENTILE_BANDS=1), the charts keep their
+#fixed thresholds otherwise.
+import os
+
+import numpy as np
+
+from dcr_cache import dcr_base_cache
+from dcr_incremental import committed_state
+from dcr_trace import add_span
+
+KLL_K = 200
+#Capacity ratio between a level and the one above it
+KLL_C = 2.0 / 3.0
+STATE_NAME = 'quantile_state.json'
+BANDS_ENV = 'DCR_PERCENTILE_BANDS'
+
+
+class kll_sketch():
+
+    def __init__(self,k=KLL_K):
+        """
+        Mergeable quantile sketch (Karnin, Lang and Liberty), NaN values are not counted
+        INPUTS:
+            k = int, capacity of the top level, sets the accuracy
+        """
+        self.k = k
+        self.n = 0
+        self.levels = [np.empty(0)]
+        #Position (0 or 1) the next compaction of each level keeps
+        self.flips = [0]
+
+    def capacity(self,level):
+        return max(2,int(np.ceil(self.k * KLL_C ** (len(self.levels) - level - 1))))
+
+    def compress(self):
+        """Compacts the lowest level over its capacity while the sketch holds more than all levels fit"""
+        while self.size() > sum(self.capacity(h) for h in range(len(self.levels))):
+            h = [h for h, items in enumerate(self.levels) if len(items) > self.capacity(h)][0]
+            if h + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+                self.flips.append(0)
+            items = np.sort(self.levels[h])
+            #An odd item out stays on this level, the pairs lose half their values at twice the weight
+            keep = len(items) % 2
+            self.levels[h] = items[len(items) - keep:]
+            self.levels[h + 1] = np.concatenate([self.levels[h + 1],items[self.flips[h]:len(items) - keep:2]])
+            self.flips[h] ^= 1
+
+    def add(self,values):
+        """
+        Counts values
+        INPUTS:
+            values = array of floats (any shape), NaN for a day without a value
+        """
+        values = np.asarray(values,dtype='float64').ravel()
+        values = values[np.isfinite(values)]
+        self.n += len(values)
+        self.levels[0] = np.concatenate([self.levels[0],values])
+        self.compress()
+
+    def merge(self,other):
+        """Sketch of both samples together"""
+        merged = self.copy()
+        for h, items in enumerate(other.levels):
+            if h == len(merged.levels):
+                merged.levels.append(np.empty(0))
+                merged.flips.append(0)
+            merged.levels[h] = np.concatenate([merged.levels[h],items])
+        merged.n += other.n
+        merged.compress()
+        return merged
+
+    def quantile(self,q):
+        """
+        Smallest retained value with at least a share q of the observations at or below it
+        RETURNS: float, NaN for an empty sketch
+        """
+        if self.n == 0:
+            return np.nan
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level),2.0 ** h) for h, level in enumerate(self.levels)])
+        order = np.argsort(items,kind='mergesort')
+        ranks = np.cumsum(weights[order])
+        return float(items[order][min(np.searchsorted(ranks,q * ranks[-1]),len(items) - 1)])
+
+    def size(self):
+        """Values retained"""
+        return sum(len(level) for level in self.levels)
+
+    def copy(self):
+        other = kll_sketch(self.k)
+        other.load(self.to_dict())
+        return other
+
+    def to_dict(self):
+        return {'n':self.n,'levels':[level.tolist() for level in self.levels],'flips':list(self.flips)}
+
+    def load(self,state):
+        self.n = state['n']
+        self.levels = [np.array(level,dtype='float64') for level in state['levels']]
+        self.flips = list(state['flips'])
+
+    def ident(self):
+        """Setup of the sketch, persisted sketches are only reused for the same setup"""
+        return {'k':self.k,'c':KLL_C}
+
+
+def bands_enabled():
+    return os.environ.get(BANDS_ENV) == '1'
+
+
+def history_quantiles(dates,values,name,quantiles,state_dir=None):
+    """
+    Quantiles of a daily series over its whole history, reusing the sketch committed by earlier runs
+    INPUTS:
+        dates     = Series of dates, ascending
+        values    = array of floats, NaN for a day without a value
+        name      = str, sketch key (e.g. 'Mayer_Multiple')
+        quantiles = [float,...], between 0 and 1
+        state_dir = str, directory keeping the committed sketches (default cache directory)
+    RETURNS: [float,...], one per quantile
+    """
+    state = committed_state(os.path.join(state_dir or dcr_base_cache().cache_dir,STATE_NAME))
+    sketch, added, rebuilt = state.update(
+        'kll:' + name,dates,np.asarray(values,dtype='float64').reshape(-1,1),kll_sketch,kll_sketch().ident()
+    )
+    add_span('quantiles:' + name,rows=sketch.n,added=added,rebuilt=rebuilt,retained=sketch.size())
+    return [sketch.quantile(q) for q in quantiles]
+
+
+def threshold_bands(df,column,levels,name=None):
+    """
+    Threshold lines of a valuation multiple chart
+    INPUTS:
+        df     = DataFrame with 'date' and column
+        column = str, the multiple
+        levels = [(value,text,quantile),...], fixed threshold, its label text and the
+                 percentile replacing it when bands are on
+        name   = str, sketch key (default column)
+    RETURNS: [(value,text),...], the fixed thresholds, or the percentiles of the multiple's
+             history labelled e.g. 'P95 2.31' when bands are on
+    """
+    if not bands_enabled():
+        return [(value,text) for value, text, quantile in levels]
+    values = history_quantiles(
+        df['date'],df[column].to_numpy(dtype='float64'),name or column,[quantile for value, text, quantile in levels]
+    )
+    return [
+        (value,'P' + '{:g}'.format(quantile * 100) + ' ' + '{:.2f}'.format(value))
+        for value, (level, text, quantile) in zip(values,levels)
+    ]
@@ -0,0 +1,266 @@
+#Online log-log OLS fits for the regression charts (S2F and difficulty models)
+#   ln(y) = const + slope * ln(x)
+#metric_s2f_model and metric_difficulty_model rebuild the upstream dcr_add_metrics transforms of
+#the same name on top of these fits, so no chart fits a model from scratch on a normal run.
+#Each model is kept as sufficient statistics (count, means, centred sums of squares and
+#products) in the cache directory. A run adds only the days after the last committed day, the
+#latest REVISE_DAYS are fitted on top every run because upstream revises them.
+#statsmodels is only imported in validation mode (--validate-ols or DCR_OLS_VALIDATE=1), which
+#also fits regression_analysis().ln_regression_OLS (or runs the upstream metric for the rebuilt
+#models) and reports how far the two differ.
+import os
+
+import numpy as np
+import pandas as pd
+
+from dcr_cache import dcr_base_cache
+from dcr_incremental import REVISE_DAYS, committed_state
+from dcr_trace import add_span
+
+STATE_NAME = 'ols_state.json'
+VALIDATE_ENV = 'DCR_OLS_VALIDATE'
+#Largest relative deviation from statsmodels accepted in validation mode
+VALIDATE_TOLERANCE = 1e-8
+
+#Regression service of this process, created on first use
+_service = None
+
+
+class ols_stats():
+
+    def __init__(self,n=0,mean_x=0.0,mean_y=0.0,sxx=0.0,sxy=0.0,syy=0.0,x_name='x'):
+        """
+        Sufficient statistics of a simple OLS regression
+        INPUTS:
+            n           = int, observations
+            mean_x      = float, mean of x
+            mean_y      = float, mean of y
+            sxx/sxy/syy = float, centred sums of squares and products
+            x_name      = str, regressor name used in params
+        """
+        self.x_name = x_name
+        self.n = n
+        self.mean_x = mean_x
+        self.mean_y = mean_y
+        self.sxx = sxx
+        self.sxy = sxy
+        self.syy = syy
+
+    def merge(self,other):
+        """Statistics of both samples together (Chan et al. pairwise update)"""
+        n = self.n + other.n
+        if self.n == 0 or other.n == 0:
+            return other if self.n == 0 else self
+        dx = other.mean_x - self.mean_x
+        dy = other.mean_y - self.mean_y
+        weight = self.n * other.n / n
+        return ols_stats(
+            n,self.mean_x + dx * other.n / n,self.mean_y + dy * other.n / n,
+            self.sxx + other.sxx + dx * dx * weight,
+            self.sxy + other.sxy + dx * dy * weight,
+            self.syy + other.syy + dy * dy * weight,
+        )
+
+    @property
+    def slope(self):
+        return self.sxy / self.sxx if self.sxx > 0 else np.nan
+
+    @property
+    def const(self):
+        return self.mean_y - self.slope * self.mean_x
+
+    @property
+    def rsquared(self):
+        return self.sxy * self.sxy / (self.sxx * self.syy) if self.sxx > 0 and self.syy > 0 else np.nan
+
+    @property
+    def params(self):
+        """Coefficients indexed like statsmodels results.params"""
+        return pd.Series([self.const,self.slope],index=['const',self.x_name])
+
+    def add(self,values):
+        """Folds rows of (x, y) into the statistics"""
+        merged = self.merge(batch_stats(values[:,0],values[:,1]))
+        self.load(merged.to_dict())
+
+    def copy(self):
+        return ols_stats(x_name=self.x_name,**self.to_dict())
+
+    def to_dict(self):
+        return dict(n=self.n,mean_x=self.mean_x,mean_y=self.mean_y,sxx=self.sxx,sxy=self.sxy,syy=self.syy)
+
+    def load(self,state):
+        for key, value in state.items():
+            setattr(self,key,value)
+
+
+def batch_stats(x,y):
+    """ols_stats of arrays x, y"""
+    if len(x) == 0:
+        return ols_stats()
+    mean_x = float(x.mean())
+    mean_y = float(y.mean())
+    dx = x - mean_x
+    dy = y - mean_y
+    return ols_stats(len(x),mean_x,mean_y,float(dx @ dx),float(dx @ dy),float(dy @ dy))
+
+
+class regression_service():
+
+    def __init__(self,state_dir=None,revise=REVISE_DAYS):
+        """
+        Log-log OLS models updated with the days added since their last fit
+        INPUTS:
+            state_dir = str, directory keeping the committed statistics (default cache directory)
+            revise    = int, trailing days never committed (upstream revises them)
+        """
+        self.state = committed_state(
+            os.path.join(state_dir or dcr_base_cache().cache_dir,STATE_NAME),revise
+        )
+
+    def fit(self,name,dates,x,y):
+        """
+        Fits ln(y) on ln(x), reusing the statistics committed for name by earlier runs
+        INPUTS:
+            name  = str, model key (e.g. 'dcr_s2f')
+            dates = Series of dates, ascending
+            x, y  = arrays, already in log space, non-finite rows are left out
+        RETURNS: ols_stats over every finite row
+        """
+        finite = np.isfinite(x) & np.isfinite(y)
+        model, added, refit = self.state.update(
+            name,pd.Series(dates).values[finite],np.column_stack([x[finite],y[finite]]),ols_stats
+        )
+        add_span('ols:' + name,rows=int(finite.sum()),added=added,refit=refit)
+        return model
+
+
+def active_service():
+    global _service
+    if _service is None:
+        _service = regression_service()
+    return _service
+
+
+def ln_regression(df,x_metric,y_metric,name,service=None):
+    """
+    Log-log OLS of y_metric on x_metric, the columns of
+    regression_analysis().ln_regression_OLS(df,x_metric,y_metric,True) without statsmodels
+    INPUTS:
+        df       = DataFrame with 'date', x_metric and y_metric, sorted by date
+        x_metric = str, regressor column
+        y_metric = str, regressand column
+        name     = str, model key the statistics are kept under
+        service  = regression_service (default one per process)
+    RETURNS: {'df':df with <x[:3]>_<y[:5]>_predict/_multiple/_residual added, 'model':ols_stats}
+    """
+    with np.errstate(divide='ignore',invalid='ignore'):
+        x = np.log(df[x_metric].to_numpy(dtype='float64'))
+        y = np.log(df[y_metric].to_numpy(dtype='float64'))
+    model = (service or active_service()).fit(name,df['date'],x,y)
+    model.x_name = x_metric
+    prefix = x_metric[:3] + '_' + y_metric[:5]
+    fitted = model.const + model.slope * x
+    df[prefix + '_predict'] = np.exp(fitted)
+    df[prefix + '_multiple'] = df[y_metric] / df[prefix + '_predict']
+    df[prefix + '_residual'] = y - fitted
+    if os.environ.get(VALIDATE_ENV) == '1':
+        return validate(df,x_metric,y_metric,name,model,prefix)
+    return {'df':df,'model':model}
+
+
+def validate(df,x_metric,y_metric,name,model,prefix):
+    """Fits the statsmodels reference, reports the deviation and returns it when over tolerance"""
+    from checkonchain.general.regression_analysis import regression_analysis
+    columns = [column for column in df.columns if not column.startswith(prefix + '_')]
+    reference = regression_analysis().ln_regression_OLS(df[columns].copy(),x_metric,y_metric,True)
+    deviation = max(
+        [param_deviation(model,reference['model'],x_metric)]
+        + [column_deviation(df[prefix + suffix],reference['df'][prefix + suffix]) for suffix in ['_predict','_multiple','_residual']]
+    )
+    add_span('ols_validate:' + name,deviation=deviation)
+    print('...OLS ' + name + ' deviates ' + '{:.2e}'.format(deviation) + ' from statsmodels')
+    if deviation > VALIDATE_TOLERANCE:
+        print('...OLS ' + name + ' FAILED validation, using the statsmodels fit')
+        return reference
+    return {'df':df,'model':model}
+
+
+def param_deviation(model,reference,x_metric):
+    """Largest relative deviation of the coefficients from a statsmodels result"""
+    return max(
+        abs(model.params[key] - reference.params[key]) / max(abs(reference.params[key]),1e-12)
+        for key in ['const',x_metric]
+    )
+
+
+def column_deviation(a,b):
+    """Largest relative deviation of column a from column b where both are finite"""
+    a = np.asarray(a,dtype='float64')
+    b = np.asarray(b,dtype='float64')
+    finite = np.isfinite(a) & np.isfinite(b)
+    if not finite.any():
+        return 0.0
+    return float(np.max(np.abs(a[finite] - b[finite]) / np.maximum(np.abs(b[finite]),1e-12)))
+
+
+def metric_s2f_model(df,service=None):
+    """
+    dcr_add_metrics().metric_s2f_model fitted with ln_regression
+    INPUTS:
+        df      = DataFrame with date, age_sply, S2F, PriceUSD, SplyCur and CapMrktCurUSD
+        service = regression_service (default one per process)
+    RETURNS: [df with the S2F_CapMr_* fit and the S2F_Price_* / Plan B columns, ols_stats]
+    """
+    frame = df.dropna(axis=0)
+    analysis = ln_regression(frame.copy(),'S2F','CapMrktCurUSD','dcr_s2f_model',service)
+    result = analysis['df']
+    result['S2F_Price_predict'] = result['S2F_CapMr_predict'] / result['SplyCur']
+    result['S2F_Price_multiple'] = result['PriceUSD'] / result['S2F_Price_predict']
+    #Plan B model, fixed coefficients of the Bitcoin S2F fit
+    result['S2F_Price_predict_PB'] = np.exp(-1.84) * result['S2F'] ** 3.36
+    result['S2F_CapMr_predict_PB'] = result['S2F_Price_predict_PB'] * result['SplyCur']
+    result['S2F_Price_multiple_PB'] = result['PriceUSD'] / result['S2F_Price_predict_PB']
+    if os.environ.get(VALIDATE_ENV) == '1':
+        return validate_metric([result,analysis['model']],'metric_s2f_model',df,'S2F','dcr_s2f_model')
+    return [result,analysis['model']]
+
+
+def metric_difficulty_model(df,service=None):
+    """
+    dcr_add_metrics().metric_difficulty_model fitted with ln_regression
+    INPUTS:
+        df      = DataFrame, metric_difficulty_price output (date, DiffPriceUSD, PriceUSD, ...)
+        service = regression_service (default one per process)
+    RETURNS: [df with the Dif_Price_* fit of PriceUSD on DiffPriceUSD, ols_stats]
+    """
+    analysis = ln_regression(df.copy(),'DiffPriceUSD','PriceUSD','dcr_difficulty',service)
+    if os.environ.get(VALIDATE_ENV) == '1':
+        return validate_metric([analysis['df'],analysis['model']],'metric_difficulty_model',df,'DiffPriceUSD','dcr_difficulty')
+    return [analysis['df'],analysis['model']]
+
+
+def validate_metric(result,metric,df,x_metric,name):
+    """
+    Runs the upstream metric a model rebuilds, reports the deviation of the coefficients and of
+    every column both produce (rows matched on date), returns the upstream result when over tolerance
+    """
+    from checkonchain.dcronchain.dcr_add_metrics import dcr_add_metrics
+    reference = list(getattr(dcr_add_metrics(),metric)(df.copy()))
+    deviations = [param_deviation(result[1],reference[1],x_metric)]
+    ours = result[0].set_index('date')
+    theirs = reference[0].set_index('date')
+    if not ours.index.equals(theirs.index):
+        #Different rows kept, the rebuilt metric does not match upstream
+        deviations.append(np.inf)
+    else:
+        for column in ours.columns:
+            if column in theirs.columns and column not in df.columns:
+                deviations.append(column_deviation(ours[column],theirs[column]))
+    deviation = max(deviations)
+    add_span('ols_validate:' + name,deviation=deviation)
+    print('...OLS ' + name + ' deviates ' + '{:.2e}'.format(deviation) + ' from ' + metric)
+    if deviation > VALIDATE_TOLERANCE:
+        print('...OLS ' + name + ' FAILED validation, using ' + metric)
+        return reference
+    return result
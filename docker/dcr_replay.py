@@ -0,0 +1,175 @@
+#Record / replay of upstream HTTP responses for offline, repeatable runs
+#
+#Every request sent through the requests library (Coinmetrics_api, dcrdata_api and the
+#btc_add_metrics loaders) goes through requests.adapters.HTTPAdapter.send, which is
+#patched here:
+#   record = send the request and store the response as <fixture dir>/<key>.json
+#   replay = answer from the fixture directory, never touching the network
+#<key> hashes the method, url and body of the request. In replay a request with no exact
+#match falls back to the only fixture with the same method, host, path and query
+#parameter names (e.g. a Coinmetrics query whose end date moved on since recording).
+#Traffic that bypasses requests (urllib, pd.read_csv on a url) is not captured.
+import base64
+import hashlib
+import json
+import os
+from urllib.parse import parse_qsl, urlsplit
+
+#Environment variables selecting the mode when no command line flag is given
+RECORD_ENV = 'DCR_HTTP_RECORD'
+REPLAY_ENV = 'DCR_HTTP_REPLAY'
+
+
+def request_key(method,url,body):
+    if isinstance(body,str):
+        body = body.encode('utf-8')
+    digest = hashlib.sha256()
+    for part in (method.encode('ascii'),url.encode('utf-8'),body or b''):
+        digest.update(part)
+        digest.update(b'\0')
+    return digest.hexdigest()[:20]
+
+
+def request_shape(method,url):
+    """Method, host, path and sorted query parameter names of a request"""
+    parts = urlsplit(url)
+    names = sorted(set(name for name, value in parse_qsl(parts.query,keep_blank_values=True)))
+    return (method,parts.netloc,parts.path,tuple(names))
+
+
+class http_fixtures():
+
+    def __init__(self,directory,mode):
+        """
+        Records upstream HTTP responses to, or replays them from, a fixture directory
+        INPUTS:
+            directory = str, fixture directory
+            mode      = 'record' or 'replay'
+        """
+        if mode not in ('record','replay'):
+            raise ValueError('mode must be record or replay, got ' + str(mode))
+        if mode == 'replay' and not os.path.isdir(directory):
+            raise FileNotFoundError('No fixture directory at ' + directory)
+        self.directory = directory
+        self.mode = mode
+        self.original = None
+        self.served = 0
+        self.recorded = 0
+
+    def path(self,key):
+        return os.path.join(self.directory,key + '.json')
+
+    def install(self):
+        """Patches requests so every adapter records or replays through this instance"""
+        import requests.adapters
+        if self.original is not None:
+            return self
+        if self.mode == 'record':
+            os.makedirs(self.directory,exist_ok=True)
+        self.original = requests.adapters.HTTPAdapter.send
+        fixtures = self
+
+        def send(adapter,request,**kwargs):
+            return fixtures.send(adapter,request,**kwargs)
+
+        requests.adapters.HTTPAdapter.send = send
+        print('...HTTP ' + self.mode + ' mode, fixtures in ' + self.directory)
+        return self
+
+    def uninstall(self):
+        import requests.adapters
+        if self.original is not None:
+            requests.adapters.HTTPAdapter.send = self.original
+            self.original = None
+
+    def send(self,adapter,request,**kwargs):
+        key = request_key(request.method,request.url,request.body)
+        if self.mode == 'record':
+            response = self.original(adapter,request,**kwargs)
+            self.save(key,request,response)
+            return response
+        return self.load(key,request)
+
+    def save(self,key,request,response):
+        content = response.content
+        try:
+            body = {'text':content.decode('utf-8')}
+        except UnicodeDecodeError:
+            body = {'base64':base64.b64encode(content).decode('ascii')}
+        fixture = {
+            'method':request.method,
+            'url':request.url,
+            'status':response.status_code,
+            'reason':response.reason,
+            'headers':dict(response.headers),
+            'encoding':response.encoding,
+            'body':body,
+        }
+        #Recording threads write distinct keys, tmp + replace keeps each file whole
+        tmp = self.path(key) + '.' + str(os.getpid()) + '.tmp'
+        with open(tmp,'w') as f:
+            json.dump(fixture,f)
+        os.replace(tmp,self.path(key))
+        self.recorded += 1
+
+    def find(self,key,request):
+        if os.path.exists(self.path(key)):
+            return self.path(key)
+        #Unique fixture with the same request shape
+        shape = request_shape(request.method,request.url)
+        matches = []
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith('.json'):
+                continue
+            with open(os.path.join(self.directory,name)) as f:
+                fixture = json.load(f)
+            if request_shape(fixture['method'],fixture['url']) == shape:
+                matches.append(os.path.join(self.directory,name))
+        if len(matches) == 1:
+            return matches[0]
+        return None
+
+    def load(self,key,request):
+        import requests
+        from requests.structures import CaseInsensitiveDict
+
+        path = self.find(key,request)
+        if path is None:
+            raise requests.exceptions.ConnectionError(
+                'No recorded response for ' + request.method + ' ' + request.url
+                + ' in ' + self.directory,request=request
+            )
+        with open(path) as f:
+            fixture = json.load(f)
+        response = requests.models.Response()
+        response.status_code = fixture['status']
+        response.reason = fixture['reason']
+        response.headers = CaseInsensitiveDict(fixture['headers'])
+        #Bodies are stored decoded, the original transfer encoding no longer applies
+        response.headers.pop('Content-Encoding',None)
+        response.encoding = fixture['encoding']
+        if 'text' in fixture['body']:
+            response._content = fixture['body']['text'].encode('utf-8')
+        else:
+            response._content = base64.b64decode(fixture['body']['base64'])
+        response.url = request.url
+        response.request = request
+        self.served += 1
+        return response
+
+
+def install_fixtures(record=None,replay=None):
+    """
+    Installs record or replay mode from command line values, falling back to the
+    DCR_HTTP_RECORD / DCR_HTTP_REPLAY environment variables
+    RETURNS: http_fixtures instance, None when neither mode is selected
+    """
+    record = record or os.environ.get(RECORD_ENV)
+    replay = replay or os.environ.get(REPLAY_ENV)
+    if record and replay:
+        raise ValueError('Choose either HTTP record or replay mode, not both')
+    if record:
+        return http_fixtures(record,'record').install()
+    if replay:
+        return http_fixtures(replay,'replay').install()
+    return None
@@ -0,0 +1,122 @@
+#Rolling window statistics for many window sizes from one cumulative sum pass
+#   rolling_mean(df['DiffMean'],[9,14,25])  -> array (days x windows), column j = .rolling(windows[j]).mean()
+#   rolling_mean(df['PriceUSD'],200)        -> array (days), same as .rolling(200).mean()
+#NaN handling follows pandas rolling(window) with the default min_periods = window: a window
+#shorter than window rows or holding a NaN or +-inf gives NaN.
+#Window sums are differences of running sums taken around the series mean, so the squares
+#behind the std keep their digits on long histories.
+import numpy as np
+
+
+class running_sums():
+
+    def __init__(self,values):
+        """
+        Running sums of a series, any window sum is the difference of two entries
+        INPUTS:
+            values = Series or array of floats, NaN (or +-inf, e.g. a ratio over zero) marks a missing day
+        """
+        values = np.asarray(values,dtype='float64')
+        #One inf would make the offset and every running sum after it inf
+        missing = ~np.isfinite(values)
+        #Offset so the sums hold deviations rather than levels (keeps the variance digits)
+        self.offset = values[~missing].mean() if (~missing).any() else 0.0
+        shifted = np.where(missing,0.0,values - self.offset)
+        self.length = len(values)
+        self.sums = np.concatenate([[0.0],np.cumsum(shifted)])
+        self.squares = np.concatenate([[0.0],np.cumsum(shifted * shifted)])
+        self.nans = np.concatenate([[0],np.cumsum(missing)])
+
+    def trailing(self,windows,stat,ddof=1):
+        """
+        Trailing window statistic for every window size
+        INPUTS:
+            windows = [int,...], window sizes in rows
+            stat    = 'sum' | 'mean' | 'std'
+        RETURNS: array (rows x windows), NaN for rows before a full window and windows holding a NaN or inf
+        """
+        result = np.full((self.length,len(windows)),np.nan)
+        for j, window in enumerate(windows):
+            if window <= 0 or window > self.length:
+                continue
+            #Rows window-1 .. end, each the difference of two running sums window rows apart
+            total = self.sums[window:] - self.sums[:-window]
+            clean = (self.nans[window:] - self.nans[:-window]) == 0
+            if stat == 'sum':
+                values = total + window * self.offset
+            elif stat == 'mean':
+                values = total / window + self.offset
+            elif window > ddof:
+                squares = self.squares[window:] - self.squares[:-window]
+                #Rounding can leave a tiny negative variance on a flat window
+                values = np.sqrt(np.clip((squares - total * total / window) / (window - ddof),0,None))
+            else:
+                continue
+            result[window - 1:,j] = np.where(clean,values,np.nan)
+        return result
+
+    def windows(self,start,end):
+        """
+        Mean of rows [start, end) per output row, for windows that vary per row
+        RETURNS: array, NaN where the window is empty, leaves the series or holds a NaN
+        """
+        count = end - start
+        valid = (count > 0) & (start >= 0) & (end <= self.length)
+        start = np.clip(start,0,self.length)
+        end = np.clip(end,0,self.length)
+        valid = valid & ((self.nans[end] - self.nans[start]) == 0)
+        with np.errstate(divide='ignore',invalid='ignore'):
+            mean = (self.sums[end] - self.sums[start]) / np.where(valid,count,1) + self.offset
+        return np.where(valid,mean,np.nan)
+
+
+def rolling(values,windows,stat,ddof=1):
+    """One column per window, or a flat array when a single int window was asked for"""
+    result = running_sums(values).trailing([int(window) for window in np.atleast_1d(windows)],stat,ddof)
+    return result[:,0] if np.ndim(windows) == 0 else result
+
+
+def rolling_sum(values,windows):
+    """
+    Trailing sums, Series.rolling(window).sum() for every window at once
+    INPUTS:
+        values  = Series or array of floats
+        windows = int or [int,...], window sizes in rows
+    RETURNS: array (rows x windows), or (rows) for a single int window
+    """
+    return rolling(values,windows,'sum')
+
+
+def rolling_mean(values,windows):
+    """
+    Trailing means, Series.rolling(window).mean() for every window at once
+    INPUTS:
+        values  = Series or array of floats
+        windows = int or [int,...], window sizes in rows
+    RETURNS: array (rows x windows), or (rows) for a single int window
+    """
+    return rolling(values,windows,'mean')
+
+
+def rolling_std(values,windows,ddof=1):
+    """
+    Trailing standard deviations, Series.rolling(window).std(ddof) for every window at once
+    INPUTS:
+        values  = Series or array of floats
+        windows = int or [int,...], window sizes in rows
+        ddof    = int, delta degrees of freedom (1 = sample std as in pandas)
+    RETURNS: array (rows x windows), or (rows) for a single int window
+    """
+    return rolling(values,windows,'std',ddof)
+
+
+def window_mean(values,start,end):
+    """
+    Mean of rows [start, end) for each output row, for windows that vary per row
+    INPUTS:
+        values = Series or array of floats
+        start  = array of int, first row of each window
+        end    = array of int, row after the last row of each window
+    RETURNS: array, NaN where the window is empty, leaves the series or holds a NaN
+    """
+    return running_sums(values).windows(np.asarray(start),np.asarray(end))
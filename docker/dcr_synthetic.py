@@ -0,0 +1,191 @@
+#Synthetic Decred history at a multiple of the real length, for scaling benchmarks
+#
+#synthetic_base_frame(scale) returns a daily frame shaped like dcr_ticket_models():
+#   - with a template (a real base frame) every template column is stretched over
+#     scale x the rows, so the schema and dtypes match upstream exactly
+#   - without one, the raw columns the chart suite reads are generated from the Decred
+#     emission schedule and seeded random walks for price, difficulty and volumes
+#synthetic_block_frame(n) returns block level data following the same emission schedule.
+import numpy as np
+import pandas as pd
+
+from dcr_cache import GENESIS
+
+BLOCKS_PER_DAY = 288
+#Decred emission: 1.68M DCR at block 1, block subsidy from block 2 starts at 31.19582664 DCR
+#and is multiplied by 100/101 every 6144 blocks, split 60% PoW, 30% PoS, 10% treasury
+PREMINE = 1680000
+SUBSIDY_BASE = 31.19582664
+SUBSIDY_INTERVAL = 6144
+SUBSIDY_RATIO = 100/101
+SUBSIDY_SPLIT = {'pow':0.6,'pos':0.3,'fund':0.1}
+SUPPLY_CAP = 21000000
+TICKET_POOL = 40960
+#Earliest date pandas can hold with margin, longer histories start here on a compressed calendar
+MIN_DATE = pd.Timestamp('1678-01-02')
+
+
+def block_subsidy(blk):
+    """Total block subsidy (DCR) at each block height"""
+    blk = np.asarray(blk)
+    return np.where(blk < 2,0.0,SUBSIDY_BASE * SUBSIDY_RATIO ** (blk // SUBSIDY_INTERVAL))
+
+
+def supply_at(blk):
+    """Coins issued up to and including each block height, closed form of the emission"""
+    blk = np.asarray(blk,dtype='float64')
+    mined = np.clip(blk - 1,0,None)         #Subsidised blocks 2..blk
+    #Block 0 and 1 sit in the first interval, which has SUBSIDY_INTERVAL-2 subsidised blocks
+    shifted = mined + 2
+    full = shifted // SUBSIDY_INTERVAL
+    part = shifted % SUBSIDY_INTERVAL
+    geometric = SUBSIDY_INTERVAL * (1 - SUBSIDY_RATIO**full) / (1 - SUBSIDY_RATIO)
+    issued = SUBSIDY_BASE * (geometric + part * SUBSIDY_RATIO**full) - 2 * SUBSIDY_BASE
+    return np.where(blk >= 1,PREMINE + issued,0.0)
+
+
+def random_walk(rng,n,start,drift,vol):
+    """Geometric random walk with daily drift and volatility"""
+    steps = rng.normal(drift,vol,n)
+    steps[0] = 0
+    return start * np.exp(np.cumsum(steps))
+
+
+def daily_dates(n,end):
+    """
+    n dates ending at end (time zone kept), one per day
+    When n days reach back past MIN_DATE (e.g. 100x the real history) the rows are spread evenly
+    from MIN_DATE to end instead, a compressed calendar with one row every few hours. Only the
+    dates are compressed, blk and the age columns keep their daily steps
+    """
+    end = pd.Timestamp(end)
+    tz = end.tz
+    end = end.tz_localize(None).normalize()
+    if (end - MIN_DATE).days >= n - 1:
+        dates = pd.date_range(end=end,periods=n,freq='D')
+    else:
+        step = int((end - MIN_DATE).total_seconds()) // max(n - 1,1)
+        if step < 1:
+            raise ValueError(str(n) + ' rows do not fit the pandas datetime range')
+        dates = pd.date_range(end=end,periods=n,freq=pd.Timedelta(seconds=step))
+    return dates if tz is None else dates.tz_localize(tz)
+
+
+def stretch_frame(template,n):
+    """Stretches every template column over n rows (linear for numbers, nearest otherwise)"""
+    source = np.linspace(0,len(template)-1,n)
+    nearest = np.rint(source).astype(int)
+    columns = {}
+    for column in template.columns:
+        values = template[column]
+        if column == 'date':
+            continue
+        if pd.api.types.is_bool_dtype(values) or not pd.api.types.is_numeric_dtype(values):
+            columns[column] = values.iloc[nearest].values
+        elif pd.api.types.is_integer_dtype(values):
+            columns[column] = np.rint(np.interp(source,np.arange(len(values)),values.values)).astype(values.dtype)
+        else:
+            columns[column] = np.interp(
+                source,np.arange(len(values)),values.values.astype('float64')
+            ).astype(values.dtype)
+    return pd.DataFrame(columns,columns=[column for column in template.columns if column != 'date'])
+
+
+def model_frame(n,dates,seed):
+    """Raw dcr_ticket_models() columns read by the chart suite, from the emission model"""
+    rng = np.random.default_rng(seed)
+    day = np.arange(n)
+    blk = (day + 1) * BLOCKS_PER_DAY
+    sply = supply_at(blk)
+    issued = np.diff(sply,prepend=0.0)
+    price = random_walk(rng,n,0.5,0.0015,0.05)
+    btc_price = random_walk(rng,n,400,0.0012,0.035)
+    cap = price * sply
+    #Realised cap: market cap smoothed over a year, lags price like the on-chain measure
+    cap_real = pd.Series(cap).ewm(span=365,adjust=False).mean().values
+    tic_price = sply * 0.45 / TICKET_POOL * random_walk(rng,n,1,0,0.01)
+    tfr = sply * 0.004 * random_walk(rng,n,1,0,0.1)
+
+    df = pd.DataFrame({
+        'date':dates,
+        'blk':blk,
+        'age_days':day,
+        'age_sply':sply / SUPPLY_CAP,
+        'SplyCur':sply,
+        'DailyIssuedNtv':issued,
+        'DailyIssuedUSD':issued * price,
+        'S2F':sply / np.maximum(issued * 365,1e-9),
+        'PriceUSD':price,
+        'BTC_PriceUSD':btc_price,
+        'PriceBTC':price / btc_price,
+        'CapMrktCurUSD':cap,
+        'CapMrktCurBTC':cap / btc_price,
+        'CapRealUSD':cap_real,
+        'CapRealBTC':cap_real / btc_price,
+        'PriceRealUSD':cap_real / sply,
+        'PriceRealBTC':cap_real / sply / btc_price,
+        'DiffMean':issued * SUBSIDY_SPLIT['pow'] * price * 1e6 * random_walk(rng,n,1,0.0005,0.03),
+        'FeeTotNtv':rng.lognormal(2,0.5,n),
+        'TxTfrValNtv':tfr,
+        'dcr_tfr_vol':tfr,
+        'dcr_tic_vol':tic_price * BLOCKS_PER_DAY * 5 * rng.uniform(0.8,1.2,n),
+        'dcr_tic_sply_avg':tic_price * TICKET_POOL,
+        'dcr_anon_mix_vol':tfr * rng.uniform(0.1,0.5,n),
+        'tic_price_avg':tic_price,
+        'tx_tic':rng.poisson(BLOCKS_PER_DAY * 5,n),
+        'tx_reg':rng.poisson(4000,n),
+        'tx_mix':rng.poisson(600,n),
+    })
+    return df
+
+
+def synthetic_base_frame(scale=1,days=None,template=None,seed=0):
+    """
+    Daily base frame with scale x the rows of real history
+    INPUTS:
+        scale    = int, multiple of the real history length
+        days     = int, real history length (default: template length, else GENESIS to today)
+        template = DataFrame, real dcr_ticket_models() frame whose schema is reproduced
+        seed     = int, random seed of the generated series
+    """
+    if days is None:
+        if template is not None:
+            days = len(template)
+        else:
+            days = (pd.Timestamp.today().normalize() - pd.Timestamp(GENESIS)).days + 1
+    n = int(days * scale)
+    end = template['date'].iloc[-1] if template is not None else pd.Timestamp.today()
+    dates = daily_dates(n,end)
+    if template is None:
+        return model_frame(n,dates,seed)
+    df = stretch_frame(template,n)
+    df.insert(list(template.columns).index('date'),'date',dates)
+    return df
+
+
+def synthetic_block_frame(n_blocks,seed=0):
+    """
+    Block level data: height, time, subsidy split, supply, difficulty and ticket price
+    INPUTS:
+        n_blocks = int, number of blocks from genesis
+        seed     = int, random seed of difficulty and ticket price
+    """
+    rng = np.random.default_rng(seed)
+    blk = np.arange(n_blocks)
+    subsidy = block_subsidy(blk)
+    #Difficulty and ticket price retarget every 144 blocks
+    windows = n_blocks // 144 + 1
+    window = blk // 144
+    df = pd.DataFrame({
+        'blk':blk,
+        'time':pd.Timestamp(GENESIS) + pd.to_timedelta(blk * 300,unit='s'),
+        'subsidy':subsidy,
+        'subsidy_pow':subsidy * SUBSIDY_SPLIT['pow'],
+        'subsidy_pos':subsidy * SUBSIDY_SPLIT['pos'],
+        'subsidy_fund':subsidy * SUBSIDY_SPLIT['fund'],
+        'sply':supply_at(blk),
+        'difficulty':random_walk(rng,windows,1e6,0.002,0.05)[window],
+        'tic_price':random_walk(rng,windows,2,0.001,0.03)[window],
+        'tic_pool':rng.integers(TICKET_POOL-2000,TICKET_POOL+2000,windows)[window],
+    })
+    return df
@@ -0,0 +1,157 @@
+#Tracing spans and the JSON run report written next to the exported data
+#
+#   start_trace()                       begins a run, spans are no-ops until then
+#   with span('charts') as s:           times a stage, spans nest by path (run/charts/...)
+#       s['rows'] = len(df)             rows processed / bytes written are set by the caller
+#   write_run_report(path)              writes every span of the run as JSON
+#
+#Each span records wall and CPU seconds, and the tracemalloc peak when the trace was started
+#with memory=True (tracemalloc slows Python allocations down, so it is opt-in).
+import json
+import os
+import resource
+import sys
+import threading
+import time as clock
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+#Run trace spans are recorded into, None when tracing is off
+_trace = None
+
+
+class run_trace():
+
+    def __init__(self,memory=False):
+        """
+        Spans recorded during one run
+        INPUTS:
+            memory = bool, record the tracemalloc peak of every span
+        """
+        self.memory = memory
+        self.started = datetime.utcnow().isoformat(timespec='seconds')
+        self.spans = []
+        self.stack = []
+        self.lock = threading.Lock()
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def path(self,name):
+        return '/'.join([entry['path'] for entry in self.stack[-1:]] + [name])
+
+    def add(self,name,**fields):
+        """Records a finished span under the innermost open span (safe from worker threads)"""
+        record = {'path':self.path(name),'name':name}
+        record.update(fields)
+        with self.lock:
+            self.spans.append(record)
+        return record
+
+    def adopt(self,spans):
+        """Re-roots spans recorded by a separate trace (e.g. a forked worker) under the open span"""
+        prefix = self.stack[-1]['path'] + '/' if self.stack else ''
+        with self.lock:
+            for record in spans:
+                record = dict(record)
+                record['path'] = prefix + record['path']
+                self.spans.append(record)
+                #Peaks of adopted spans count towards the open span
+                if self.stack and record.get('peak_mb') is not None:
+                    self.stack[-1]['peak'] = max(self.stack[-1]['peak'],record['peak_mb'] * 2**20)
+
+    @contextmanager
+    def span(self,name,**fields):
+        record = {'path':self.path(name),'name':name}
+        record.update(fields)
+        entry = {'path':record['path'],'peak':0}
+        if self.memory:
+            #The peak is reset per span, the parent keeps the largest peak seen so far
+            if self.stack:
+                self.stack[-1]['peak'] = max(self.stack[-1]['peak'],tracemalloc.get_traced_memory()[1])
+            if hasattr(tracemalloc,'reset_peak'):
+                tracemalloc.reset_peak()
+        self.stack.append(entry)
+        wall = clock.perf_counter()
+        cpu = clock.process_time()
+        try:
+            yield record
+        finally:
+            record['wall_s'] = clock.perf_counter() - wall
+            record['cpu_s'] = clock.process_time() - cpu
+            self.stack.pop()
+            if self.memory:
+                peak = max(entry['peak'],tracemalloc.get_traced_memory()[1])
+                record['peak_mb'] = peak / 2**20
+                if self.stack:
+                    self.stack[-1]['peak'] = max(self.stack[-1]['peak'],peak)
+            with self.lock:
+                self.spans.append(record)
+
+    def report(self):
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {
+            'started':self.started,
+            'python':sys.version.split()[0],
+            'memory_traced':self.memory,
+            #ru_maxrss is in kB on Linux
+            'maxrss_mb':maxrss / 1024,
+            'spans':self.spans,
+        }
+
+
+@contextmanager
+def no_span():
+    yield {}
+
+
+def start_trace(memory=False):
+    global _trace
+    _trace = run_trace(memory)
+    return _trace
+
+
+def active_trace():
+    return _trace
+
+
+def swap_trace(trace):
+    """Makes trace the active trace and returns the previous one"""
+    global _trace
+    previous = _trace
+    _trace = trace
+    return previous
+
+
+def span(name,**fields):
+    """Times a block as a span of the active trace, a no-op when tracing is off"""
+    if _trace is None:
+        return no_span()
+    return _trace.span(name,**fields)
+
+
+def add_span(name,**fields):
+    if _trace is not None:
+        _trace.add(name,**fields)
+
+
+def file_bytes(path):
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def write_run_report(path,extra=None):
+    """
+    Writes the active trace as JSON
+    INPUTS:
+        path  = str, report file (run_report.json in the data directory)
+        extra = dict, additional top level entries (e.g. the previous git push timing)
+    RETURNS: report dict, None when tracing is off
+    """
+    if _trace is None:
+        return None
+    report = _trace.report()
+    report.update(extra or {})
+    with open(path,'w') as f:
+        json.dump(report,f,indent=1)
+    print('...Run report written to ' + path)
+    return report
@@ -0,0 +1,231 @@
+#Single-process entry point running the chart and insight exports from one base frame
+#   python3 -m dcronchain_data run --charts --insights
+import argparse
+import json
+import os
+import sys
+import time as clock
+import traceback
+
+from dcr_cache import dcr_base_cache
+from dcr_columns import projection_for
+from dcr_fetch import insight_sources, source_store, sources_for
+from dcr_manifest import load_manifest, select_entries
+from dcr_replay import install_fixtures
+from dcr_trace import active_trace, span, start_trace, write_run_report
+
+#Export stages in run order
+STAGES = ['charts','insights']
+#Run report written to the data directory
+REPORT_NAME = 'run_report.json'
+#git push timing written by render_and_upload.sh after the previous run
+PUSH_RECORD_NAME = 'last_push.json'
+
+
+def run_charts(base_df,data_dir,args,metrics,sources):
+    #Imported here so insights-only runs skip the charting stack
+    from generate_charts import export_charts
+    print('...Exporting Decred charts')
+    #A chart reading outside its projection is built again from every base column
+    reload = sources.full_base_frame
+    if args.compact_dtypes:
+        from dcr_dtypes import compact_frame
+        reload = lambda: compact_frame(sources.full_base_frame())
+    results = export_charts(
+        base_df,data_dir,args.jobs,args.tag,args.chart,args.force,metrics,args.compact_json,sources,reload
+    )
+    return all(error is None for label, seconds, error in results)
+
+
+def run_insights(base_df,data_dir,args,metrics,sources):
+    from generate_insights import export_insights
+    print('...Exporting Decred insights')
+    export_insights(base_df,data_dir,args.full_rebuild,metrics,sources)
+    return True
+
+
+stage_runners = {
+    'charts':run_charts,
+    'insights':run_insights,
+}
+
+
+def load_push_record():
+    """git push timing of the previous run, None when render_and_upload.sh did not record one"""
+    path = os.path.join(dcr_base_cache().cache_dir,PUSH_RECORD_NAME)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except ValueError:
+        return None
+
+
+def run_stages(args,stages,data_dir,summary):
+    names = ['dcr_ticket_models']
+    base_columns = None
+    if 'charts' in stages:
+        methods = [entry['method'] for entry in select_entries(load_manifest(),args.tag,args.chart)]
+        names = names + sources_for(methods)
+        #Chart-only runs load just the base columns the selected charts read
+        if stages == ['charts'] and not args.full_frame:
+            base_columns = projection_for(methods)
+    #Fetch the base frame and every upstream dataset of the selected stages concurrently
+    sources = source_store(args.refresh,base_columns=base_columns)
+    if 'insights' in stages:
+        names = names + insight_sources
+    with span('fetch'):
+        sources.prefetch(names)
+        base_df = sources.get('dcr_ticket_models',copy=False)
+    summary['base_columns'] = len(base_df.columns)
+    if args.compact_dtypes:
+        from dcr_dtypes import compact_frame, memory_report
+        with span('compact_dtypes') as trace:
+            compact = compact_frame(base_df)
+            trace['bytes_before'], trace['bytes_after'] = memory_report(base_df,compact)
+            base_df = compact
+    #One metric registry for every stage so shared transforms are computed once
+    from dcr_memo import metric_registry
+    metrics = metric_registry(base_df)
+    ok = True
+    for stage in stages:
+        #A failed chart does not stop the insights, the exit code reports it
+        with span(stage) as trace:
+            trace['rows'] = len(base_df)
+            ok = stage_runners[stage](base_df,data_dir,args,metrics,sources) and ok
+    #Forked chart workers keep their own registry, these are in-process lookups only
+    summary['metric_cache'] = {'hits':metrics.hits,'misses':metrics.misses}
+    return ok
+
+
+def run_once(args):
+    """
+    Runs the selected stages once and writes the run report
+    RETURNS: (ok, report)
+    """
+    #No stage flag selects every stage
+    stages = [stage for stage in STAGES if getattr(args,stage)] or STAGES
+    data_dir = args.data_dir or os.path.join(os.environ['GITHUB_REPO'],'data')
+
+    start_trace(args.trace_memory)
+    ok = False
+    summary = {'previous_git_push':load_push_record()}
+    try:
+        with span('run') as trace:
+            ok = run_stages(args,stages,data_dir,summary)
+            trace['ok'] = ok
+    finally:
+        #Written even when a stage raises, the spans show how far the run got
+        report = write_run_report(os.path.join(data_dir,REPORT_NAME),summary)
+    return ok, report
+
+
+def export_metrics(exporter,args,ok,report):
+    exporter.update(report,ok)
+    if args.metrics_file:
+        exporter.write(args.metrics_file)
+    if args.pushgateway:
+        try:
+            exporter.push(args.pushgateway)
+        except Exception as e:
+            #Monitoring being down must not fail the render
+            print('...Unable to push Prometheus metrics: ' + str(e))
+
+
+def add_run_arguments(run):
+    run.add_argument('--charts',action='store_true',help='export chart datasets')
+    run.add_argument('--insights',action='store_true',help='export insight tables and the full dataset')
+    run.add_argument('--refresh',action='store_true',help='rebuild the cached base DataFrame from upstream')
+    run.add_argument('--full-rebuild',action='store_true',help='recompute metrics over the whole history instead of appending new days')
+    run.add_argument('--jobs',type=int,default=1,help='worker processes rendering charts in parallel')
+    run.add_argument('--tag',action='append',help='render manifest charts with this tag (repeatable)')
+    run.add_argument('--chart',action='append',help='render this manifest chart (repeatable)')
+    run.add_argument('--force',action='store_true',help='render charts even when their inputs are unchanged')
+    run.add_argument('--compact-json',action='store_true',help='write compact chart JSON and report the size savings')
+    run.add_argument('--full-frame',action='store_true',help='load every base frame column even when the selected charts declare a projection')
+    run.add_argument('--compact-dtypes',action='store_true',help='hold the base frame as float32/int32/categorical (see bench_charts.py --check-dtypes)')
+    run.add_argument('--validate-ols',action='store_true',help='check the online regressions against statsmodels and the upstream metrics they rebuild')
+    run.add_argument('--percentile-bands',action='store_true',help='draw valuation multiple thresholds at percentiles of their history')
+    run.add_argument('--record-http',metavar='DIR',default=None,help='record every upstream HTTP response to DIR')
+    run.add_argument('--replay-http',metavar='DIR',default=None,help='serve upstream HTTP responses from DIR, no network access')
+    run.add_argument('--trace-memory',action='store_true',help='record the tracemalloc peak of every span in the run report (slower)')
+    run.add_argument('--metrics-file',default=None,help='write Prometheus metrics of the run to this file (text exposition format)')
+    run.add_argument('--pushgateway',default=None,help='push Prometheus metrics of the run to this pushgateway (host:port)')
+    run.add_argument('--data-dir',default=None,help='output directory (default $GITHUB_REPO/data)')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='dcronchain_data',description='Decred On-Chain data pipeline')
+    commands = parser.add_subparsers(dest='command')
+    run = commands.add_parser('run',help='build the base frame once and run the selected export stages')
+    add_run_arguments(run)
+    daemon = commands.add_parser('daemon',help='run the export stages on an interval and serve Prometheus metrics')
+    add_run_arguments(daemon)
+    daemon.add_argument('--port',type=int,default=9108,help='port serving the Prometheus metrics endpoint')
+    daemon.add_argument('--interval',type=float,default=24,help='hours between runs')
+    imports = commands.add_parser('imports',help='report the import time of each stage (python -X importtime)')
+    imports.add_argument('--stage',action='append',choices=STAGES,help='stage to audit (repeatable, default all)')
+    imports.add_argument('--top',type=int,default=15,help='packages listed per stage')
+    columns = commands.add_parser('columns',help='show the base frame columns each chart reads (column_registry.yaml)')
+    columns.add_argument('--learn',action='store_true',help='render the charts once from the full frame and record the columns each metric reads')
+    columns.add_argument('--tag',action='append',help='charts with this tag (repeatable)')
+    columns.add_argument('--chart',action='append',help='this manifest chart (repeatable)')
+    columns.add_argument('--replay-http',metavar='DIR',default=None,help='serve upstream HTTP responses from DIR, no network access')
+    args = parser.parse_args(argv)
+    if args.command == 'columns':
+        install_fixtures(replay=args.replay_http)
+        from dcr_columns import learn_columns, print_projections
+        entries = select_entries(load_manifest(),args.tag,args.chart)
+        base_df = dcr_base_cache().base_frame()
+        if args.learn:
+            learn_columns(base_df,entries,source_store())
+        print_projections(base_df,entries)
+        return 0
+    if args.command == 'imports':
+        from dcr_import_audit import print_audit, stage_imports
+        for stage in args.stage or STAGES:
+            print_audit(stage,stage_imports[stage],args.top,os.path.dirname(os.path.abspath(__file__)))
+        return 0
+    if args.command not in ('run','daemon'):
+        parser.print_help()
+        return 2
+
+    install_fixtures(args.record_http,args.replay_http)
+    if args.validate_ols:
+        #Read by dcr_regression, forked chart workers inherit it
+        from dcr_regression import VALIDATE_ENV
+        os.environ[VALIDATE_ENV] = '1'
+    if args.percentile_bands:
+        #Read by dcr_quantiles, forked chart workers inherit it
+        from dcr_quantiles import BANDS_ENV
+        os.environ[BANDS_ENV] = '1'
+    exporter = None
+    if args.command == 'daemon' or args.metrics_file or args.pushgateway:
+        from dcr_prometheus import run_metrics
+        exporter = run_metrics()
+
+    if args.command == 'run':
+        ok, report = run_once(args)
+        if exporter is not None:
+            export_metrics(exporter,args,ok,report)
+        return 0 if ok else 1
+
+    exporter.serve(args.port)
+    while True:
+        started = clock.time()
+        try:
+            ok, report = run_once(args)
+        except Exception:
+            #A failed run is reported through the metrics, the daemon keeps going
+            print('...FAILED run\n' + traceback.format_exc())
+            ok = False
+            trace = active_trace()
+            report = trace.report() if trace is not None else None
+        if report is not None:
+            export_metrics(exporter,args,ok,report)
+        clock.sleep(max(args.interval * 3600 - (clock.time() - started),0))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
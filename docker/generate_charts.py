@@ -2,19 +2,38 @@
 from checkonchain.dcronchain.dcr_add_metrics import *
 from checkonchain.btconchain.btc_add_metrics import *
 from checkonchain.general.standard_charts import *
-from checkonchain.general.regression_analysis import *
 from checkonchain.general.general_helpers import *
 from datetime import date, datetime, time, timedelta
+import argparse
 import os
+import sys
+from dcr_cache import dcr_base_cache, frame_fingerprint, projected_supply
+from dcr_columns import chart_projection, project, projection_for, shared_metric_calls
+from dcr_denominations import denominate
+from dcr_fetch import source_store, sources_for
+from dcr_histogram import daily_histogram
+from dcr_jobs import run_chart_jobs
+from dcr_manifest import file_fingerprint, load_manifest, manifest_state, select_entries
+from dcr_replay import install_fixtures
+from dcr_rolling import rolling_mean, rolling_sum, window_mean
+from dcr_trace import add_span, span
+from dcr_memo import metric_registry
+from dcr_quantiles import bands_enabled, threshold_bands
+from dcr_regression import ln_regression, metric_difficulty_model, metric_s2f_model
 
 class dcr_chart_suite():
 
-    def __init__(self,theme):
+    def __init__(self,theme,refresh=False,df=None,metrics=None,sources=None,reload=None):
         """
         Modules for producing standard check-onchain charts for Decred
         INPUT = theme (string)
             theme = 'light' = light theme chart
             theme = 'dark'  = dark theme chart (default)
+        refresh = bool, rebuild the cached base DataFrame from upstream
+        df      = DataFrame, prebuilt dcr_ticket_models() frame (skips loading)
+        metrics = metric_registry over the same base frame, shared between suites
+        sources = dcr_fetch.source_store holding prefetched upstream datasets
+        reload  = callable returning the full base frame when df is a column projection
         """
         self.theme = theme
         self.chart = check_standard_charts(self.theme)
@@ -34,7 +53,17 @@ class dcr_chart_suite():
         self.price_lb_btc   = -4    #Price Lower Bound (log)
         self.price_ub_btc   = -1     #Price Lower Bound (log)
         
-        self.df = dcr_add_metrics().dcr_ticket_models()
+        if df is None:
+            df = dcr_base_cache().base_frame(refresh)
+        #Shared base frame, chart methods only see it through the self.df view
+        self.base_df = df
+        #Memoized dcr_add_metrics transforms of the base frame
+        self.metrics = metrics if metrics is not None else metric_registry(self.base_df)
+        #Upstream datasets other than the base frame
+        self.sources = sources if sources is not None else source_store(refresh)
+        self.reload = reload
+        #metric_issued_cap in every quote denomination, built on first use
+        self.denominations = None
         #Create dataframe with key events like market tops, btms and halvings
         events = pd.DataFrame(
             data = [
@@ -59,6 +88,51 @@ class dcr_chart_suite():
         self.events = events.drop(columns='date')
 
 
+    @property
+    def df(self):
+        """
+        Per-call view of the base frame
+        The view shares the base columns, columns a chart adds stay in its own view
+        so the base frame does not grow and results do not depend on call order
+        """
+        return self.base_df.copy(deep=False)
+
+    def metric(self,name,*args,**kwargs):
+        """Memoized dcr_add_metrics().<name>(self.df,*args), see dcr_memo.metric_registry"""
+        return self.metrics.get(name,*args,**kwargs)
+
+    def denominated(self):
+        """
+        metric_issued_cap with the block subsidy and commitment caps in every quote the
+        frame prices (USD, BTC, ...), see dcr_denominations
+        """
+        if self.denominations is None:
+            self.denominations = denominate(self.metric('metric_issued_cap'))
+        return self.denominations.copy(deep=False)
+
+    def s2f_analysis(self):
+        """metric_s2f_model fitted online, see dcr_regression.metric_s2f_model"""
+        return metric_s2f_model(self.df[['date','age_sply','S2F','PriceUSD','SplyCur','CapMrktCurUSD']])
+
+    def source(self,name):
+        """Upstream dataset, prefetched by export_charts or fetched on first use"""
+        return self.sources.get(name)
+
+    def widen(self,error):
+        """
+        Swaps a projected base frame for the full frame after a chart read a column
+        outside its projection (see dcr_columns)
+        RETURNS: True when the chart should be built again
+        """
+        if self.reload is None:
+            return False
+        print('...Column projection misses ' + str(error) + ', loading the full base frame')
+        self.base_df = self.reload()
+        self.metrics = metric_registry(self.base_df)
+        self.denominations = None
+        self.reload = None
+        return True
+
     def add_slider(self,fig):
         """
         Adds x-axis slider to chart
@@ -138,6 +212,10 @@ class dcr_chart_suite():
             model = 1   = Pricing Model (Coin price, realised price etc)
         """
         df = self.df
+        #Thresholds, percentiles of the MVRV history with --percentile-bands
+        (sell,sell_text), (buy,buy_text) = threshold_bands(
+            df,'CapMVRVCur',[(1.8,'1.8',0.95),(0.7,'0.7',0.05)]
+        )
 
         #STANDARD SETTINGS
         loop_data=[[0,1],[2,3,4,5,6]]
@@ -182,18 +260,18 @@ class dcr_chart_suite():
                 df['CapRealUSD'],
                 df['CapMVRVCur'],
                 [5,5],      #NA Ceiling  
-                [1.8,1.8],  #SELL
+                [sell,sell],  #SELL
                 [1.0,1.0],  #UNITY
-                [0.7,0.7],  #BUY
+                [buy,buy],  #BUY
             ]
             name_data = [
                 'Market Cap',
                 'Realised Cap',
                 'MVRV Ratio',
                 'N/A',
-                'SELL ZONE (1.8)',
+                'SELL ZONE (' + sell_text + ')',
                 'UNITY (1.0)',
-                'BUY ZONE (0.7)',
+                'BUY ZONE (' + buy_text + ')',
             ]
             title_data = [
                 '<b>Decred MVRV Ratio Valuation</b>',
@@ -209,18 +287,18 @@ class dcr_chart_suite():
                 df['PriceRealUSD'],
                 df['CapMVRVCur'],
                 [5,5],      #NA Ceiling  
-                [1.8,1.8],  #SELL
+                [sell,sell],  #SELL
                 [1.0,1.0],  #UNITY
-                [0.7,0.7],  #BUY
+                [buy,buy],  #BUY
             ]
             name_data = [
                 'DCR Price',
                 'Realised Price',
                 'MVRV Ratio',
                 'N/A',
-                'SELL ZONE (1.8)',
+                'SELL ZONE (' + sell_text + ')',
                 'UNITY (1.0)',
-                'BUY ZONE (0.7)',
+                'BUY ZONE (' + buy_text + ')',
             ]
             title_data = [
                 '<b>Decred MVRV Ratio Pricing</b>',
@@ -256,8 +334,7 @@ class dcr_chart_suite():
             model = 0   = Network Valuation (Market Cap, Realised Cap etc)
             model = 1   = Pricing Model (Coin price, realised price etc)
         """
-        df = self.df
-        df = dcr_add_metrics().metric_mvrv_relative_btc(df)
+        df = self.metric('metric_mvrv_relative_btc')
 
         #STANDARD SETTINGS
         loop_data       = [[0,1,2,3,4],[5,6,7,   8,9,10,11]]
@@ -425,8 +502,7 @@ class dcr_chart_suite():
             INPUTS
                 period = period of gradient (defaults to 28)
         """
-        df = self.df
-        df = dcr_add_metrics().metric_mrkt_real_gradient_usd(df,period)
+        df = self.metric('metric_mrkt_real_gradient_usd',period)
 
         #STANDARD SETTINGS
         loop_data=[[0,1,6,7,8],[2,3,4,5]]
@@ -516,8 +592,7 @@ class dcr_chart_suite():
             INPUTS
                 period = period of gradient (defaults to 28)
         """
-        df = self.df
-        df = dcr_add_metrics().metric_mrkt_real_gradient_btc(df,period)
+        df = self.metric('metric_mrkt_real_gradient_btc',period)
 
         #STANDARD SETTINGS
         loop_data=[[0,1,2,3,4],[5,6,7,8,9]] #,10,11,12 Volume
@@ -630,8 +705,7 @@ class dcr_chart_suite():
 
     def unrealised_PnL(self):
         """"Decred Unrealised PnL from Market and Realised"""
-        df = self.df
-        df = dcr_add_metrics().metric_unrealised_PnL(df)
+        df = self.metric('metric_unrealised_PnL')
             
         loop_data=[[0,1],[2,3,4,5,6]]
         x_data = [
@@ -786,11 +860,14 @@ class dcr_chart_suite():
             ADD DIFFICULTY RIBBON
         ================================="""
         color_ribbon = str(color_data[6])
-        for i in [9,14,25,40,60,90,128,200]:
+        windows = [9,14,25,40,60,90,128,200]
+        #Every ribbon average from one running sum of DiffMean
+        ribbon = rolling_mean(df['DiffMean'],windows)
+        for j, i in enumerate(windows):
             fig.add_trace(go.Scatter(
                 mode='lines',
                 x=df['date'], 
-                y=df['DiffMean'].rolling(i).mean(),
+                y=ribbon[:,j],
                 name='D_ '+str(i),
                 opacity=0.5,
                 showlegend=True,
@@ -819,9 +896,7 @@ class dcr_chart_suite():
         Difficulty Ribbon after @woonomic
 
         """
-        df = self.df
-        df = dcr_add_metrics().metric_difficulty_price(df)
-        df = dcr_add_metrics().metric_difficulty_model(df)[0]
+        df = metric_difficulty_model(self.metric('metric_difficulty_price'))[0]
 
         df['DiffPricePnL']      = (df['DiffPriceUSD']/df['Dif_Price_predict'])
         #df['DiffPricePnL']      = (df['DiffPriceUSD'] - df['Dif_Price_predict'])/df['Dif_Price_predict']
@@ -918,7 +993,7 @@ class dcr_chart_suite():
         y_data = [
             df['PoW_income_usd'],
             df['pow_hashrate_THs_avg'],
-            df['PoW_income_dcr'].rolling(90).mean(),
+            rolling_mean(df['PoW_income_dcr'],90),
         ]
         name_data = [
             'PoW Daily Income (USD, LHS)',
@@ -972,8 +1047,7 @@ class dcr_chart_suite():
             model = 0   = Network Valuation (Market Cap, Realised Cap etc)
             model = 1   = Pricing Model (Coin price, realised price etc)
         """
-        df = self.df
-        df = dcr_add_metrics().metric_block_subsidy_usd(df)
+        df = self.denominated()
 
         #STANDARD SETTINGS
         x_data = [
@@ -1030,10 +1104,10 @@ class dcr_chart_suite():
             loop_data = [[0,1,2,3,4],[]]
             y_data = [
                 df['PriceUSD'],
-                df['PoW_income_usd'].cumsum()/df['SplyCur'],
-                df['PoS_income_usd'].cumsum()/df['SplyCur'],
-                df['Fund_income_usd'].cumsum()/df['SplyCur'],
-                df['Total_income_usd'].cumsum()/df['SplyCur'],
+                df['SubsidyPoWPriceUSD'],
+                df['SubsidyPoSPriceUSD'],
+                df['SubsidyFundPriceUSD'],
+                df['SubsidyPriceUSD'],
             ]
             name_data = [
                 'DCR/USD Price', 
@@ -1079,8 +1153,7 @@ class dcr_chart_suite():
             model = 0   = Network Valuation (Market Cap, Realised Cap etc)
             model = 1   = Pricing Model (Coin price, realised price etc)
         """
-        df = self.df
-        df = dcr_add_metrics().metric_block_subsidy_btc(df)
+        df = self.denominated()
 
         #STANDARD SETTINGS
         x_data = [
@@ -1137,10 +1210,10 @@ class dcr_chart_suite():
         elif model == 1:
             loop_data = [[0,1,2,3,4],[]]
             y_data = [
-                df['SubsidyPoWCapBTC']/df['SplyCur'],
-                df['SubsidyPoSCapBTC']/df['SplyCur'],
-                df['SubsidyFundCapBTC']/df['SplyCur'],
-                df['SubsidyCapBTC']/df['SplyCur'],
+                df['SubsidyPoWPriceBTC'],
+                df['SubsidyPoSPriceBTC'],
+                df['SubsidyFundPriceBTC'],
+                df['SubsidyPriceBTC'],
                 df['PriceBTC'],
                 ]
             name_data = [
@@ -1199,8 +1272,7 @@ class dcr_chart_suite():
             model = 0   = Network Valuation (Market Cap, Realised Cap etc)
             model = 1   = Pricing Model (Coin price, realised price etc)
         """
-        df = self.df
-        df = dcr_add_metrics().metric_issued_cap(df)
+        df = self.denominated()
 
         #STANDARD SETTINGS
         loop_data=[[0,1,2,3,4,5,6,7],[]]
@@ -1240,11 +1312,11 @@ class dcr_chart_suite():
             y_data = [
                 df['CapMrktCurUSD'],
                 df['CapRealUSD'],
-                df['PoW_income_usd'].cumsum(),
-                df['PoS_income_usd'].cumsum(),
-                df['Fund_income_usd'].cumsum(),
-                df['Total_income_usd'].cumsum(),
-                df['tic_usd_cost'].cumsum(),
+                df['SubsidyPoWCapUSD'],
+                df['SubsidyPoSCapUSD'],
+                df['SubsidyFundCapUSD'],
+                df['SubsidyCapUSD'],
+                df['TicketsBoundCapUSD'],
                 df['IssuedCapUSD'],
             ]
             name_data = [
@@ -1269,11 +1341,11 @@ class dcr_chart_suite():
             y_data = [
                 df['PriceUSD'],
                 df['PriceRealUSD'],
-                df['PoW_income_usd'].cumsum()/df['SplyCur'],
-                df['PoS_income_usd'].cumsum()/df['SplyCur'],
-                df['Fund_income_usd'].cumsum()/df['SplyCur'],
-                df['Total_income_usd'].cumsum()/df['SplyCur'],
-                df['tic_usd_cost'].cumsum()/df['SplyCur'],
+                df['SubsidyPoWPriceUSD'],
+                df['SubsidyPoSPriceUSD'],
+                df['SubsidyFundPriceUSD'],
+                df['SubsidyPriceUSD'],
+                df['TicketsBoundPriceUSD'],
                 df['IssuedPriceUSD'],
             ]
             name_data = [
@@ -1325,8 +1397,7 @@ class dcr_chart_suite():
             model = 0   = Network Valuation (Market Cap, Realised Cap etc)
             model = 1   = Pricing Model (Coin price, realised price etc)
         """
-        df = self.df
-        df = dcr_add_metrics().metric_issued_cap(df)
+        df = self.denominated()
 
         #STANDARD SETTINGS
         loop_data=[[0,1,2,3,4,5,6,7],[]]
@@ -1368,11 +1439,11 @@ class dcr_chart_suite():
             y_data = [
                 df['CapMrktCurBTC'],
                 df['CapRealBTC'],
-                df['PoW_income_btc'].cumsum(),
-                df['PoS_income_btc'].cumsum(),
-                df['Fund_income_btc'].cumsum(),
-                df['Total_income_btc'].cumsum(),
-                df['tic_btc_cost'].cumsum(),
+                df['SubsidyPoWCapBTC'],
+                df['SubsidyPoSCapBTC'],
+                df['SubsidyFundCapBTC'],
+                df['SubsidyCapBTC'],
+                df['TicketsBoundCapBTC'],
                 df['IssuedCapBTC'],
             ]
             name_data = [
@@ -1396,11 +1467,11 @@ class dcr_chart_suite():
             y_data = [
                 df['PriceBTC'],
                 df['PriceRealBTC'],
-                df['PoW_income_btc'].cumsum()/df['SplyCur'],
-                df['PoS_income_btc'].cumsum()/df['SplyCur'],
-                df['Fund_income_btc'].cumsum()/df['SplyCur'],
-                df['Total_income_btc'].cumsum()/df['SplyCur'],
-                df['tic_btc_cost'].cumsum()/df['SplyCur'],
+                df['SubsidyPoWPriceBTC'],
+                df['SubsidyPoSPriceBTC'],
+                df['SubsidyFundPriceBTC'],
+                df['SubsidyPriceBTC'],
+                df['TicketsBoundPriceBTC'],
                 df['IssuedPriceBTC']
             ]
             name_data = [
@@ -1450,21 +1521,13 @@ class dcr_chart_suite():
             model = 0   = Network Valuation (Market Cap, Realised Cap etc)
             model = 1   = Pricing Model (Coin price, realised price etc)
         """
-        df = self.df[['date','age_sply','S2F','PriceUSD','SplyCur','CapMrktCurUSD']]
-        analysis   = dcr_add_metrics().metric_s2f_model(df)
+        analysis   = self.s2f_analysis()
         df      = analysis[0]
         const   = analysis[1].params['const']
         s2f     = analysis[1].params['S2F']
 
-        #calculate projected supply curve
-        df_sply = dcr_add_metrics().dcr_sply_curtailed(2000000)
-        #   age_day assuming blocktime of 5mins
-        #   calculate date from genesis
-        df_sply['age_day'] = df_sply['blk']*5/(60*24)
-        df_sply['date'] = (
-            pd.to_datetime('2016-02-08 20:32:25+00:00',utc=True) 
-            + df_sply['age_day'].apply(timedelta)
-        )
+        #Projected supply curve (daily, 5min blocks from genesis), cached across runs
+        df_sply = projected_supply()
         
         """Calculate projects S2F model from regression"""
         df_sply['S2F_Cap_ideal']       = (np.exp(
@@ -1638,18 +1701,17 @@ class dcr_chart_suite():
         Shows the distance Price or Market Cap have moved away from the mean
         """
         #Run Decred Analysis
-        df = self.df[['date','age_sply','S2F','PriceUSD','SplyCur','CapMrktCurUSD']]
-        df = dcr_add_metrics().metric_s2f_model(df)[0]
+        df = self.s2f_analysis()[0]
 
         #Run OLS Linear Regression for Bitcoin dataset
-        df2 = btc_add_metrics().btc_coin()
+        df2 = self.source('btc_coin')
         df2 = df2[['date','age_sply','S2F','PriceUSD','SplyCur','CapMrktCurUSD']]
         df2['CapMrktCurUSD'] = df2['PriceUSD'] * df2['SplyCur']
         df2 = df2.dropna(axis=0)
-        df2 = regression_analysis().ln_regression_OLS(df2,'S2F','CapMrktCurUSD',True)['df']
+        df2 = ln_regression(df2,'S2F','CapMrktCurUSD','btc_s2f')['df']
         
         #Add Bitcoin Halvings
-        df3 = btc_add_metrics().btc_sply_halvings_step()
+        df3 = self.source('btc_sply_halvings_step')
         df3 = df3[:10]
         df3['y_arb'].replace(to_replace=0,value=-10,inplace=True)
         df3['y_arb'].replace(to_replace=1e20,value=10,inplace=True)
@@ -1666,8 +1728,8 @@ class dcr_chart_suite():
             [0,1],    # SELL
         ]
         y_data = [
-            df['S2F_CapMr_residual'].rolling(14).mean(),
-            df2['S2F_CapMr_residual'].rolling(14).mean(),
+            rolling_mean(df['S2F_CapMr_residual'],14),
+            rolling_mean(df2['S2F_CapMr_residual'],14),
             df3['y_arb'],
             [-10,-10],
             [-1.5,-1.5],
@@ -1727,13 +1789,16 @@ class dcr_chart_suite():
 
     def mayer_multiple(self):
         """"Mayer Multiple Bands"""
-        df = self.df
-        df = dcr_add_metrics().metric_mayer_multiple(df)
+        df = self.metric('metric_mayer_multiple')
+        #Thresholds, percentiles of the Mayer Multiple history with --percentile-bands
+        (ssell,ssell_text), (sell,sell_text), (buy,buy_text), (sbuy,sbuy_text) = threshold_bands(
+            df,'Mayer_Multiple',[(2.8,'2.8',0.98),(2.0,'2.0',0.95),(0.6,'0.6',0.05),(0.4,'0.4',0.02)]
+        )
 
-        df['Mayer_SBUY']    = df['200DMA'] * 0.4
-        df['Mayer_BUY']     = df['200DMA'] * 0.6
-        df['Mayer_SELL']    = df['200DMA'] * 2.0
-        df['Mayer_SSELL']   = df['200DMA'] * 2.8
+        df['Mayer_SBUY']    = df['200DMA'] * sbuy
+        df['Mayer_BUY']     = df['200DMA'] * buy
+        df['Mayer_SELL']    = df['200DMA'] * sell
+        df['Mayer_SSELL']   = df['200DMA'] * ssell
 
         loop_data=[[0,1,3,4,5,6],[7,8,9,10,11,12,13,14]]
         x_data = [
@@ -1764,11 +1829,11 @@ class dcr_chart_suite():
             df['Mayer_SSELL'],
             # SECONDARY
             [6,6],
-            [2.8,2.8],
-            [2.0,2.0],
-            [0.6,0.6],
-            [0.4,0.4],
-            [0.4,0.4],
+            [ssell,ssell],
+            [sell,sell],
+            [buy,buy],
+            [sbuy,sbuy],
+            [sbuy,sbuy],
             [1.0,1.0],
             df['Mayer_Multiple'],
         ]
@@ -1776,17 +1841,17 @@ class dcr_chart_suite():
             'DCR Price (USD)',
             '200DMA',
             '128DMA',
-            'STRONG BUY (0.4)',
-            'BUY (0.6)',
-            'SELL (2.0)',
-            'STRONG SELL (2.8)',
+            'STRONG BUY (' + sbuy_text + ')',
+            'BUY (' + buy_text + ')',
+            'SELL (' + sell_text + ')',
+            'STRONG SELL (' + ssell_text + ')',
             #SECONDARY
             'N/A',
-            'STRONG SELL (2.8)',
-            'SELL (2.0)',
+            'STRONG SELL (' + ssell_text + ')',
+            'SELL (' + sell_text + ')',
             'N/A',
-            'BUY (0.6)',
-            'STRONG BUY (0.4)',
+            'BUY (' + buy_text + ')',
+            'STRONG BUY (' + sbuy_text + ')',
             'Unity',
             'Mayer Multiple',
         ]
@@ -1858,8 +1923,11 @@ class dcr_chart_suite():
 
     def puell_multiple(self):
         """"Puell Multiple"""
-        df = self.df
-        df = dcr_add_metrics().metric_puell_multiple(df)
+        df = self.metric('metric_puell_multiple')
+        #Thresholds, percentiles of the Puell Multiple history with --percentile-bands
+        (ssell,ssell_text), (sell,sell_text), (buy,buy_text), (sbuy,sbuy_text) = threshold_bands(
+            df,'Puell_Multiple',[(5,'2.8',0.98),(2.5,'2.0',0.95),(0.6,'0.6',0.05),(0.4,'0.4',0.02)]
+        )
 
         loop_data=[[0,1,2,3,4],[5,6,7,8,9,10,11,12]]
         x_data = [
@@ -1887,11 +1955,11 @@ class dcr_chart_suite():
             #Secondary
             df['Puell_Multiple'],
             [10,10],
-            [5,5],
-            [2.5,2.5],
-            [0.6,0.6],            
-            [0.4,0.4],
-            [0.4,0.4],
+            [ssell,ssell],
+            [sell,sell],
+            [buy,buy],
+            [sbuy,sbuy],
+            [sbuy,sbuy],
             [1.0,1.0],
         ]
         name_data = [
@@ -1901,11 +1969,11 @@ class dcr_chart_suite():
             #Secondary
             'Puell Multiple',
             'N/A',
-            'Extreme Miner Profit (2.8)',
-            'Miner Profit (2.0)',
+            'Extreme Miner Profit (' + ssell_text + ')',
+            'Miner Profit (' + sell_text + ')',
             'N/A',
-            'Miner Stress (0.6)',
-            'Extreme Miner Stress (0.4)',
+            'Miner Stress (' + buy_text + ')',
+            'Extreme Miner Stress (' + sbuy_text + ')',
             'Unity'
         ]
         width_data      = [
@@ -1973,8 +2041,7 @@ class dcr_chart_suite():
 
     def contractor_multiple(self):
         """"Contractor Multiple"""
-        df = self.df
-        df = dcr_add_metrics().metric_contractor_multiple(df)
+        df = self.metric('metric_contractor_multiple')
 
         loop_data=[[0,1],[2,3,4,5]]
         x_data = [
@@ -1987,7 +2054,7 @@ class dcr_chart_suite():
         ]
         y_data = [
             df['PriceUSD'],
-            df['PriceUSD'].rolling(30).mean(),
+            rolling_mean(df['PriceUSD'],30),
             df['Contractor_Multiple'],
             [3.0,3.0],
             [1.7,1.7],
@@ -2043,8 +2110,7 @@ class dcr_chart_suite():
     def beam_indicator(self):
         """"BEAM Indicator (Bitcoin Economics Adaptive Multiple) 
         after https://bitcoineconomics.io/beam.html"""
-        df = self.df
-        df = dcr_add_metrics().metric_beam_indicator(df)
+        df = self.metric('metric_beam_indicator')
 
         loop_data=[[0,1,2],[3,4,5,6,7,8,9]]
         x_data = [
@@ -2290,8 +2356,13 @@ class dcr_chart_suite():
             mode: 1 = TxTfrValAdjUSD
         """
         df = pd.DataFrame()
-        df = self.df
-        df = dcr_add_metrics().metric_nvt_rvt(df,mode)
+        df = self.metric('metric_nvt_rvt',mode)
+        #Zones, percentiles of the NVTS history with --percentile-bands (the lines are unlabelled)
+        #Fixed zones of the unadjusted volume ratio (mode 0) sit 5x lower
+        zones = [x / 5 for x in [250,175,100,50]] if mode == 0 else [250,175,100,50]
+        (sell,_), (normal,_), (buy,_) = threshold_bands(
+            df,'NVTS',[(zones[1],'',0.95),(zones[2],'',0.5),(zones[3],'',0.05)],'NVTS_' + str(mode)
+        )
 
         loop_data=[[0,1],[2,3,4,5,6,7,   8,9,10,11,12]]
         x_data = [
@@ -2318,15 +2389,12 @@ class dcr_chart_suite():
             df['RVT_28'],
             df['RVT_90'],
             df['RVTS'],
-            [250,250],
-            [175,175],
-            [100,100],
-            [50,50],
-            [50,50]
+            [zones[0],zones[0]],
+            [sell,sell],
+            [normal,normal],
+            [buy,buy],
+            [buy,buy]
         ]
-        if mode == 0:
-            for i in [8,9,10,11,12]:
-                y_data[i] = [x / 5 for x in y_data[i]]
 
         name_data = [
             'Market Cap (USD)',
@@ -2402,8 +2470,7 @@ class dcr_chart_suite():
                             REALISED CAP + 142DAY CAP
         #############################################################################
         """
-        df = self.df
-        df = dcr_add_metrics().metric_TVWAP(df)
+        df = self.metric('metric_TVWAP')
 
         loop_data=[[0,1,2,3,4],[5,6,7,   8,9,10,11,12]]
         x_data = [
@@ -2504,8 +2571,7 @@ class dcr_chart_suite():
     def hodler_conversion(self):
         """"Decred Hodler Conversion Rates
             after @permabullnino"""
-        df = self.df
-        df = dcr_add_metrics().metric_hodler_conversion(df)
+        df = self.metric('metric_hodler_conversion')
 
         #CHART
         loop_data=[[0,1,2],[3,4]]
@@ -2586,8 +2652,14 @@ class dcr_chart_suite():
             _28_142_toggle = 0 for 28 day (default)
                            = 1 for 142 day
         """
-        df = self.df
-        df = dcr_add_metrics().metric_strongest_hand(df)
+        df = self.metric('metric_strongest_hand')
+        #Thresholds, percentiles of the ratio history with --percentile-bands
+        (weak_28,weak_28_text), (strong_28,strong_28_text) = threshold_bands(
+            df,'stronghand_ratio_28',[(1.618,'1.618',0.95),(1.0,'1.0',0.05)]
+        )
+        (weak_142,weak_142_text), (strong_142,strong_142_text) = threshold_bands(
+            df,'stronghand_ratio_142',[(1.45,'1.45',0.95),(0.60,'0.60',0.05)]
+        )
 
         if _28_142_toggle == 1: #142 Day
             loop_data=[[0,3,4,5],[7,11,12,13]]
@@ -2623,12 +2695,12 @@ class dcr_chart_suite():
             df['stronghand_ratio_142'],
             #28 Day
             [2,2],
-            [1.618,1.618],
-            [1.0,1.0],
+            [weak_28,weak_28],
+            [strong_28,strong_28],
             #142 Day
             [1.8,1.8],
-            [1.45,1.45],
-            [0.60,0.60]
+            [weak_142,weak_142],
+            [strong_142,strong_142]
         ]
         name_data = [
             'DCR Market Cap',
@@ -2640,11 +2712,11 @@ class dcr_chart_suite():
             'Strongest Hand Ratio 28-day',
             'Strongest Hand Ratio 142-day',
             'NA',
-            'Weak Hands (1.618)',
-            'Strong Hands (1.0)',
+            'Weak Hands (' + weak_28_text + ')',
+            'Strong Hands (' + strong_28_text + ')',
             'NA',
-            'Weak Hands (1.45)',
-            'Strong Hands (0.60)',
+            'Weak Hands (' + weak_142_text + ')',
+            'Strong Hands (' + strong_142_text + ')',
         ]
         width_data      = [
             2,2,2,2,2,2,
@@ -2720,9 +2792,8 @@ class dcr_chart_suite():
     def mining_pulse(self):
         """Decred Mining Pulse after @permabull Nino
         """
-        df  = self.df
-        df  = dcr_add_metrics().metric_puell_multiple(df)
-        df2 = dcr_add_metrics().metric_mining_pulse()
+        df  = self.metric('metric_puell_multiple')
+        df2 = self.source('mining_pulse')
 
         loop_data=[[0,1,2,3,4],[7,8,9,10,5,6,11,12]]
         x_data = [
@@ -2838,8 +2909,7 @@ class dcr_chart_suite():
         Positive Values = Low Relative demand for tickets, Mininmum willingness to hold DCR
         Negative Values = High Relative demand for tickets, Maximum willingness to hold DCR 
         """
-        df  = self.df
-        df  = dcr_add_metrics().metric_ticket_funding_rate(df,period,sumperiod)
+        df  = self.metric('metric_ticket_funding_rate',period,sumperiod)
 
         loop_data=[[0,1,],[2,3,4,5,6,7]]
         x_data = [
@@ -2925,8 +2995,7 @@ class dcr_chart_suite():
     def ticket_overunder(self):
         """"Decred Ticket Over/Under Measure
             after @permabullnino"""
-        df = self.df
-        df = dcr_add_metrics().metric_ticket_overunder(df)
+        df = self.metric('metric_ticket_overunder')
 
         #CHART
         loop_data=[[0,1],[2,3,4,5]]
@@ -3000,8 +3069,7 @@ class dcr_chart_suite():
     def tic_vol_sum_142day(self):
         """"Decred 142-day sum of tickets with Fibonacci multiple bands 
             after @permabullnino"""
-        df = self.df
-        df = dcr_add_metrics().metric_tic_vol_sum_142day(df)
+        df = self.metric('metric_tic_vol_sum_142day')
 
         loop_data=[[0,1,2,3,4,5],[6,7,8,9,10,11,12]]
         x_data = [
@@ -3109,8 +3177,7 @@ class dcr_chart_suite():
     def tx_volatility_ratio(self):
         """"Decred Transactional Volatility Ratio
             after @permabullnino"""
-        df = self.df
-        df = dcr_add_metrics().metric_tx_volatility_ratio(df)
+        df = self.metric('metric_tx_volatility_ratio')
 
         #CHART
         loop_data=[[0,1],[2,3,4,5]]
@@ -3182,8 +3249,7 @@ class dcr_chart_suite():
     def tx_sum_adjsply_28d_142d(self):
         """"Decred 28 and 142day Sum of coins moved, adjusted for supply
         after @permabullnino"""
-        df = self.df
-        df = dcr_add_metrics().metric_tx_sum_adjsply_28d_142d(df)
+        df = self.metric('metric_tx_sum_adjsply_28d_142d')
 
         loop_data=[[0],[3,4,5,1,2]]
         x_data = [
@@ -3258,8 +3324,7 @@ class dcr_chart_suite():
     def max_vol_ratio(self):
         """"Decred Maximum Volume Ratio
             after @permabullnino"""
-        df = self.df
-        df = dcr_add_metrics().metric_max_vol_ratio(df)
+        df = self.metric('metric_max_vol_ratio')
 
         #CHART
         loop_data=[[0,1],[2,3,4,5,6]]
@@ -3340,10 +3405,9 @@ class dcr_chart_suite():
         """"Compare DCR and BTC by Coin Age"""
 
         dcr = self.df
-        dcr['age_sply'] = dcr['age_sply']
 
-        btc = btc_add_metrics().btc_real()
-        doge = Coinmetrics_api('doge',"2013-01-01",today).convert_to_pd().set_index('date',drop=False)
+        btc = self.source('btc_real')
+        doge = self.source('cm_doge')
         doge['age_sply'] = doge['SplyCur']/280666706295.71
 
         loop_data=[[0,1,4],[2,3,5]]
@@ -3412,8 +3476,7 @@ class dcr_chart_suite():
     def MACD(self):
         """"Decred MACD Indicator
         """
-        df = self.df
-        df = dcr_add_metrics().metric_MACD(df)
+        df = self.metric('metric_MACD')
 
         #CHART
         loop_data=[[0,1,2],[5,6]]
@@ -3493,8 +3556,7 @@ class dcr_chart_suite():
     def onchain_OBV(self):
         """"Decred Onchain Volume OBV Indicator
         """
-        df = self.df
-        df = dcr_add_metrics().metric_OBV(df)
+        df = self.metric('metric_OBV')
 
         #CHART
         loop_data=[[0],[1,2,3,4,5,6]]
@@ -3582,9 +3644,10 @@ class dcr_chart_suite():
             + df['dcr_tic_vol']
             + df['dcr_anon_mix_vol']
         )
-        df['tx_mix'] = df['dcr_anon_mix_vol'].cumsum()
-        df['tx_tic'] = df['dcr_tic_vol'].cumsum()
-        df['tx_reg'] = df['dcr_tfr_reg'].cumsum()
+        #Cumulative sums under their own names, tx_mix/tx_tic/tx_reg are base columns
+        df['tx_mix_cum'] = df['dcr_anon_mix_vol'].cumsum()
+        df['tx_tic_cum'] = df['dcr_tic_vol'].cumsum()
+        df['tx_reg_cum'] = df['dcr_tfr_reg'].cumsum()
         
         loop_data=[[0,1,2],[4,5]]
         x_data = [
@@ -3596,9 +3659,9 @@ class dcr_chart_suite():
             df['date'],
         ]
         y_data = [
-            df['tx_reg'],
-            (df['tx_reg']+df['tx_tic']),
-            (df['tx_reg']+df['tx_tic']+df['tx_mix']),
+            df['tx_reg_cum'],
+            (df['tx_reg_cum']+df['tx_tic_cum']),
+            (df['tx_reg_cum']+df['tx_tic_cum']+df['tx_mix_cum']),
             df['dcr_tfr_reg'].rolling(1).mean()/df['dcr_sply'],
             df['dcr_tic_sply_avg']/df['dcr_sply'],
             df['dcr_anon_part'],
@@ -3670,9 +3733,10 @@ class dcr_chart_suite():
             + df['dcr_tic_vol']
             + df['dcr_anon_mix_vol']
         )
-        df['tx_mix'] = df['dcr_anon_mix_vol'].cumsum()
-        df['tx_tic'] = df['dcr_tic_vol'].cumsum()
-        df['tx_reg'] = df['dcr_tfr_reg'].cumsum()
+        #Cumulative sums under their own names, tx_mix/tx_tic/tx_reg are base columns
+        df['tx_mix_cum'] = df['dcr_anon_mix_vol'].cumsum()
+        df['tx_tic_cum'] = df['dcr_tic_vol'].cumsum()
+        df['tx_reg_cum'] = df['dcr_tfr_reg'].cumsum()
         
         loop_data=[[0,1,2],[3,4,5]]
         x_data = [
@@ -3684,9 +3748,9 @@ class dcr_chart_suite():
             df['date'],
         ]
         y_data = [
-            df['tx_reg'],
-            (df['tx_reg']+df['tx_tic']),
-            (df['tx_reg']+df['tx_tic']+df['tx_mix']),
+            df['tx_reg_cum'],
+            (df['tx_reg_cum']+df['tx_tic_cum']),
+            (df['tx_reg_cum']+df['tx_tic_cum']+df['tx_mix_cum']),
             df['dcr_tfr_reg'],
             df['dcr_tic_vol'],
             df['dcr_anon_mix_vol'],
@@ -3829,12 +3893,12 @@ class dcr_chart_suite():
     def fee_growth(self):
         """Decred Growth of Fees"""
         dcr = self.df
-        btc = Coinmetrics_api('btc',"2009-01-03",today).convert_to_pd().set_index('date',drop=False)
-        eth = Coinmetrics_api('eth',"2015-07-30",today).convert_to_pd().set_index('date',drop=False)
+        btc = self.source('cm_btc')
+        eth = self.source('cm_eth')
 
-        dcr['Fee142Growth'] = dcr['FeeTotNtv'] / dcr['FeeTotNtv'].rolling(142).mean()
-        btc['Fee142Growth'] = btc['FeeTotNtv'] / btc['FeeTotNtv'].rolling(142).mean()
-        eth['Fee142Growth'] = eth['FeeTotNtv'] / eth['FeeTotNtv'].rolling(142).mean()
+        dcr['Fee142Growth'] = dcr['FeeTotNtv'] / rolling_mean(dcr['FeeTotNtv'],142)
+        btc['Fee142Growth'] = btc['FeeTotNtv'] / rolling_mean(btc['FeeTotNtv'],142)
+        eth['Fee142Growth'] = eth['FeeTotNtv'] / rolling_mean(eth['FeeTotNtv'],142)
 
 
         
@@ -3912,8 +3976,8 @@ class dcr_chart_suite():
         #############################################################################
         """
         df          = self.df
-        df_pay      = dcr_add_metrics().metric_treasury_payments(df)
-        treasury    = dcr_add_metrics().dcr_treasury()
+        df_pay      = self.metric('metric_treasury_payments')
+        treasury    = self.source('dcr_treasury')
         treasury    = treasury.merge(self.df[['date','PriceUSD']],on='date',copy=False)
         
         treasury['net_usd']      = treasury['net_dcr']      * treasury['PriceUSD']
@@ -3934,7 +3998,7 @@ class dcr_chart_suite():
             treasury['received_dcr'].cumsum(),
             treasury['sent_dcr'].cumsum(),
             df['PriceUSD'],
-            df['PriceUSD'].rolling(30).mean(),
+            rolling_mean(df['PriceUSD'],30),
             ]
         name_data = [
             #Chart 1
@@ -4005,7 +4069,7 @@ class dcr_chart_suite():
         blk_cur     = df['blk'].iloc[-2]
         if blk_start <= 0:
             blk_start = blk_cur
-        sply        = dcr_add_metrics().metric_staking_return(df,tic_num,blk_start)
+        sply        = self.metric('metric_staking_return',tic_num,blk_start)
 
         #build chart dataset for DCR reward
         x_data = y_data = name_data = width_data = opacity_data = dash_data = legend_data =[]
@@ -4091,7 +4155,7 @@ class dcr_chart_suite():
         blk_cur     = df['blk'].iloc[-2]
         if blk_start <= 0:
             blk_start = blk_cur
-        sply        = dcr_add_metrics().metric_staking_return(df,tic_num,blk_start)
+        sply        = self.metric('metric_staking_return',tic_num,blk_start)
 
         #build chart dataset for DCR reward
         x_data = y_data = name_data = width_data = opacity_data = dash_data = legend_data =[]
@@ -4188,50 +4252,53 @@ class dcr_chart_suite():
         df = df[df['pow_hashrate_THs_avg']>1]
         miners               = pd.read_csv(r'../resources/data/dcr_mining_hardware.csv')
         miners['TH_per_kWh'] = miners['hashrate_THs']/miners['power_kWh']
-        miners[['max_cnt','avg_cnt']]    = 0
 
-
-        #Cycles through each device in asic dataframe
-        #Adds column to df for each 'device_cnt' = hashrate / unit hashpower
-        #Adds column to df for each 'device_cost' = device_cnt * device_unitcost
-        #Adds column to df for each 'device_power' = device_cnt * device_power_kWh
+        #Broadcast the hashrate vector (days) against the hardware table (devices)
+        #giving one days x devices array per metric, so extra devices cost one column each
         print("...Calculating Performance for Mining Hardware")
-        count = 0
-        for i in miners['model']:
-            #Device Count
-            name_cnt        = i +'_cnt'
-            df[name_cnt]    = df['pow_hashrate_THs_avg'] / miners.loc[count,'hashrate_THs']
-            df[name_cnt]    = df[name_cnt].apply(np.ceil) #round to nearest integer
-            #Device Purchase Cost
-            name_cost       = i + '_cost'
-            df[name_cost]   = df[name_cnt] * miners.loc[count,'device_price_usd']
-            #Device Power Consumption per Day (kW)
-            name_power      = i + '_power_kWh'
-            df[name_power]  = df[name_cnt] * miners.loc[count,'power_kWh'] * 24
-            #CAPEX and OPEX
-            name_CAPEX      = i + '_CAPEX'
-            name_OPEX       = i + '_OPEX'
-            #CAPEX (aggregate) = ASIC cost * (1 + overhead factor)
-            df[name_CAPEX]  = df[name_cost] * (1 + overhead)
-            #OPEX (aggregate) = 
-            #           ASIC count * 24hrs * ASIC_kWh consumption * Power Price
-            #           + overhead/365 * device Capital Cost
-            df[name_OPEX]  = df[name_power] * power_usdkWh + op_overhead/365 * df[name_cost]
-            #Profitability per day per device (as proportion of device cost)
-            #(Income - OPEX)_aggregate / CAPEX_aggregate
-            name_prof       = i + '_pow_prof'
-            df[name_prof]   = (df['PoW_income_usd'] - df[name_OPEX]) / df[name_CAPEX] #(Income - OPEX)/CAPEX
-            #Record max and average device count
-            _df             = df[df['blk']>=miners.loc[count,'blk_start']]   
-            miners.loc[count,'max_cnt']         = int(_df[name_cnt].max())
-            miners.loc[count,'avg_cnt']         = int(_df[name_cnt].mean())
-            count += 1
+        hashrate    = df['pow_hashrate_THs_avg'].to_numpy(dtype=float)[:,None]
+        income      = df['PoW_income_usd'].to_numpy(dtype=float)[:,None]
+        device_ths  = miners['hashrate_THs'].to_numpy(dtype=float)[None,:]
+        device_usd  = miners['device_price_usd'].to_numpy(dtype=float)[None,:]
+        device_kWh  = miners['power_kWh'].to_numpy(dtype=float)[None,:]
+        hardware = {}
+        #Device Count = hashrate / unit hashpower, rounded up to whole devices
+        hardware['_cnt']        = np.ceil(hashrate / device_ths)
+        #Device Purchase Cost
+        hardware['_cost']       = hardware['_cnt'] * device_usd
+        #Device Power Consumption per Day (kW)
+        hardware['_power_kWh']  = hardware['_cnt'] * device_kWh * 24
+        #CAPEX (aggregate) = ASIC cost * (1 + overhead factor)
+        hardware['_CAPEX']      = hardware['_cost'] * (1 + overhead)
+        #OPEX (aggregate) = 
+        #           ASIC count * 24hrs * ASIC_kWh consumption * Power Price
+        #           + overhead/365 * device Capital Cost
+        hardware['_OPEX']       = hardware['_power_kWh'] * power_usdkWh + op_overhead/365 * hardware['_cost']
+        #Profitability per day per device (as proportion of device cost)
+        #(Income - OPEX)_aggregate / CAPEX_aggregate
+        hardware['_pow_prof']   = (income - hardware['_OPEX']) / hardware['_CAPEX']
+        self.miner_hardware = hardware
+
+        #Record max and average device count once each device was launched, whole devices
+        #A device launching after the last day has no count, its metrics stay NaN
+        blk         = df['blk'].to_numpy()
+        blk_start   = miners['blk_start'].to_numpy(dtype=float)
+        launched    = blk[:,None] >= blk_start[None,:]
+        seen        = launched.any(axis=0)
+        _cnt        = np.where(launched,hardware['_cnt'],np.nan)[:,seen]
+        max_cnt     = np.full(len(miners),np.nan)
+        avg_cnt     = np.full(len(miners),np.nan)
+        max_cnt[seen] = np.trunc(np.nanmax(_cnt,axis=0))
+        avg_cnt[seen] = np.trunc(np.nanmean(_cnt,axis=0))
+        miners['max_cnt']       = max_cnt
+        miners['avg_cnt']       = avg_cnt
         miners['max_CAPEX']     = miners['max_cnt'] * miners['device_price_usd'] * (1+overhead)
         miners['max_OPEX']      = miners['max_cnt'] * miners['power_kWh'] * 24 * power_usdkWh
         miners['max_OPEX_ratio']  = miners['max_OPEX'] / miners['max_CAPEX']
         print('...Calculating Miner Hardware Metrics')
         print(miners)
         self.miners = miners
+        count = len(miners)
 
         #Build Chart
         loop_data = [[count],range(0,count)]
@@ -4241,28 +4308,29 @@ class dcr_chart_suite():
         #   Chart 3 = OPEX Investment (power + )
         def build_xyname(miners_df,suffix):
             """
-            builds x_data, y_data and name_data
+            builds x_data, y_data and name_data from column slices of the hardware arrays
             """
-            miners = miners_df
             x_data = y_data = name_data = []
-            for i in miners['model']:
+            for j, i in enumerate(miners_df['model']):
                 #Consider only data after device was launched
-                blk_start = float(miners[miners['model']==i]['blk_start'])
-                _df       = df[df['blk']>blk_start]
-                #Add cumulative profitability
-                name_prof            = i + '_pow_prof'
-                name_prof_cum        = i + '_pow_prof_cum'
-                _df[name_prof_cum]   = _df[name_prof].cumsum() #cumulative sum
+                launched    = blk > blk_start[j]
+                dates       = df['date'][launched]
+                if suffix == '_pow_prof_cum':
+                    #Add cumulative profitability
+                    values = pd.Series(hardware['_pow_prof'][launched,j],index=dates.index).cumsum()
+                else:
+                    values = pd.Series(hardware[suffix][launched,j],index=dates.index)
                 #Build chart datasets
                 name_data = name_data + [i]
-                x_data = x_data + [_df['date']]
-                y_data = y_data + [_df[i+metric]]
+                x_data = x_data + [dates]
+                y_data = y_data + [values]
             return x_data, y_data, name_data
             
         #Build X, Y and name datasets + add hashrate for 2nd axis
-        x_data      = build_xyname(miners,metric)[0] + [df['date']]
-        y_data      = build_xyname(miners,metric)[1] + [df['PriceUSD']]
-        name_data   = build_xyname(miners,metric)[2] + ['DCR/USD Price']
+        x_data, y_data, name_data = build_xyname(miners,metric)
+        x_data      = x_data    + [df['date']]
+        y_data      = y_data    + [df['PriceUSD']]
+        name_data   = name_data + ['DCR/USD Price']
         
         color_data = [
             'rgb(255, 0, 0)','rgb(255, 0, 99)','rgb(255, 46, 174)',
@@ -4396,20 +4464,18 @@ class dcr_chart_suite():
         
     def hist_calc_multiples(self,metric):
         """
-        Calculates the multiple values for use in histogram charts and returns
-        DataFrame with metric bins, frequency count and cumulative distribution
+        Calculates the multiple values for use in histogram charts
+        RETURNS: Series of the multiple named metric, indexed by date
         """
         df = self.df
 
         if metric == 'Mayer':
             #Mayer Multiple
-            df['Mayer'] = df['PriceUSD']/df['PriceUSD'].rolling(200).mean()
-            response = general_helpers().metric_histogram(df,'Mayer',0.1,3.0,0.1)
-            response.columns = ['Mayer','Mayer_count','Mayer_cdf']
+            df['Mayer'] = df['PriceUSD']/rolling_mean(df['PriceUSD'],200)
+            multiple = df['Mayer']
             
         elif metric == 'MVRV':
-            response = general_helpers().metric_histogram(df,'CapMVRVCur',0.1,3.0,0.1)
-            response.columns = ['MVRV','MVRV_count','MVRV_cdf']
+            multiple = df['CapMVRVCur']
 
         elif metric == 'S2F':
             #S2F Multiple
@@ -4417,36 +4483,31 @@ class dcr_chart_suite():
             df = df.dropna(axis=0)
             x = 'S2F'
             y = 'CapMrktCurUSD'
-            analysis    = regression_analysis().ln_regression_OLS(df,x,y,True)
+            analysis    = ln_regression(df,x,y,'dcr_s2f')
             df          = analysis['df']
-            reg_model   = analysis['model']
-            df['S2F_Price_predict'] = df['S2F_CapMr_predict'] / df['SplyCur']
-            response = general_helpers().metric_histogram(df,'S2F_CapMr_multiple',0.1,3.0,0.1)
-            response.columns = ['S2F','S2F_count','S2F_cdf']
+            multiple    = df['S2F_CapMr_multiple']
 
         elif metric == 'Puell':
-            df['Puell'] = 0
-            for i in df.index:
-                _a = min(i,364)
-                _b = df['DailyIssuedUSD'].rolling(_a).mean().loc[i]
-                _c = df.loc[i,'DailyIssuedUSD']
-                df.loc[i,'Puell'] = _c / _b
-            response = general_helpers().metric_histogram(df,'Puell',0.1,3.0,0.1)
-            response.columns = ['Puell','Puell_count','Puell_cdf']
+            #Daily issuance over its trailing mean, window = min(i,364) rows ending at row i
+            #Window means come from one running sum instead of a full rolling mean per row
+            issued = df['DailyIssuedUSD'].to_numpy(dtype=float)
+            window = np.minimum(df.index.to_numpy(),364)
+            end    = np.arange(1,len(issued)+1)
+            #Same NaN rules as rolling(window): empty or short windows and any NaN give NaN
+            with np.errstate(divide='ignore',invalid='ignore'):
+                df['Puell'] = issued / window_mean(issued,end - window,end)
+            multiple = df['Puell']
 
         elif metric == 'Contractor':
-            df['Contractor'] = df['PriceUSD'] / df['PriceUSD'].rolling(30).mean()
-            response = general_helpers().metric_histogram(df,'Contractor',0.1,2.0,0.1)
-            response.columns = ['Contractor','Contractor_count','Contractor_cdf']
-
+            df['Contractor'] = df['PriceUSD'] / rolling_mean(df['PriceUSD'],30)
+            multiple = df['Contractor']
 
         elif metric == '142d_tic':
-            df['tic_usd_cost_142sum'] = df['tic_usd_cost'].rolling(142).sum()/df['dcr_sply']
+            df['tic_usd_cost_142sum'] = rolling_sum(df['tic_usd_cost'],142)/df['dcr_sply']
             df['142d_tic'] = df['PriceUSD'] / (df['tic_usd_cost_142sum']*0.500)
-            response = general_helpers().metric_histogram(df,'142d_tic',0.1,2.0,0.1)
-            response.columns = ['142d_tic','142d_tic_count','142d_tic_cdf']
+            multiple = df['142d_tic']
 
-        return response
+        return pd.Series(multiple.to_numpy(dtype=float),index=pd.to_datetime(df['date']),name=metric)
 
     def hist_metrics(self,metrics):
         """
@@ -4461,26 +4522,15 @@ class dcr_chart_suite():
                         142d_tic    = 142day Ticket Multiple (50%)
         """     
 
-        hist = pd.DataFrame() #final histogram DataFrame
-        count = 0
-        x_data_temp = y_data_bar = y_data_cdf = name_data_bar = name_data_cdf = []
-        for i in metrics:
-            hist_temp = pd.DataFrame() #final histogram DataFrame
-            hist_temp = self.hist_calc_multiples(i)
-            if count == 0:
-                j = i #store metric as 'previous' for merge
-                hist = hist_temp
-            else:
-                hist = hist.merge(hist_temp,left_on=j,right_on=i,copy=False)
-                j = i #store metric as 'previous' for merge
-            count += 1
-            #Use hist_temp to build up x_data and y_data
-            #requires x_data to append itself, y_bar appends y_cdf
-            x_data_temp     = x_data_temp   + [pd.DataFrame(hist_temp[i]).iloc[:,0]]
-            y_data_bar      = y_data_bar    + [pd.DataFrame(hist[i + '_count']).iloc[:,0]]
-            y_data_cdf      = y_data_cdf    + [pd.DataFrame(hist[i + '_cdf']).iloc[:,0]]
-            name_data_bar   = name_data_bar + [i + ' Histogram']
-            name_data_cdf   = name_data_cdf + [i + ' CDF']
+        #One date-aligned column per multiple, all binned on the same edges (see dcr_histogram)
+        multiples = pd.concat([self.hist_calc_multiples(i) for i in metrics],axis=1).sort_index()
+        hist = daily_histogram(multiples)
+        count = len(metrics)
+        x_data_temp     = [hist['bin']] * count
+        y_data_bar      = [hist[i + '_count'] for i in metrics]
+        y_data_cdf      = [hist[i + '_cdf'] for i in metrics]
+        name_data_bar   = [i + ' Histogram' for i in metrics]
+        name_data_cdf   = [i + ' CDF' for i in metrics]
             
         #print(count)
         loop_bar = range(0,count)
@@ -4541,38 +4591,119 @@ class dcr_chart_suite():
         return fig
 
 
-repo_dir = os.environ["GITHUB_REPO"]
-
-
-#Start charting suite
-dcr_charts = dcr_chart_suite('light')
-
-#Export Mayer Multiple
-fig_mayer_multiple = dcr_charts.mayer_multiple()
-fig_mayer_multiple.write_json(f'{repo_dir}/data/mayermultiple_pricing_usd.json')
-
-# Export both realised cap and MVRV (pricing and valuation)
-fig_mvrv_valuation = dcr_charts.mvrv(0)
-fig_mvrv_valuation.write_json(f'{repo_dir}/data/mvrv_valuation_usd.json')
-fig_mvrv_pricing = dcr_charts.mvrv(1)
-fig_mvrv_pricing.write_json(f'{repo_dir}/data/mvrv_pricing_usd.json')
-
-# Export both Relative Realised Cap (valuation and pricing)
-fig_relative_valuation = dcr_charts.mvrv_relative_btc(0)
-fig_relative_valuation.write_json(f'{repo_dir}/data/mvrv_valuation_btc.json')
-fig_relative_pricing = dcr_charts.mvrv_relative_btc(1)
-fig_relative_pricing.write_json(f'{repo_dir}/data/mvrv_pricing_btc.json')
-# fig_relative_pricing.show()
-# fig_relative_valuation.show()
-
-# Export Market Realised Gradient Oscilator both 28 and 142
-market_oscillator_28 = dcr_charts.mrkt_real_gradient_usd(28)
-market_oscillator_28.write_json(f'{repo_dir}/data/mrktrealgrad_28_day_oscillator_usd.json')
-market_oscillator_142 = dcr_charts.mrkt_real_gradient_usd(142)
-market_oscillator_142.write_json(f'{repo_dir}/data/mrktrealgrad_142_day_oscillator_usd.json')
-# market_oscillator_142.show()
-# market_oscillator_28.show()
-
-# Export Unrealised Profit and Loss
-unrealised_pnl = dcr_charts.unrealised_PnL()
-unrealised_pnl.write_json(f'{repo_dir}/data/unrealisedpnl_oscillator_usd.json')
\ No newline at end of file
+def export_charts(base_df,data_dir,n_jobs=1,tags=None,names=None,force=False,metrics=None,compact=False,sources=None,reload=None):
+    """
+    Renders the chart_manifest.yaml entries selected by tags/names to data_dir as Plotly JSON
+    Charts whose inputs (their base frame columns, upstream sources, manifest entry, this module)
+    did not change since their last render are skipped unless force is set
+    INPUTS:
+        base_df  = DataFrame, dcr_ticket_models() output or a column projection of it
+        data_dir = str, output directory
+        n_jobs   = int, worker processes
+        tags     = [str,...], manifest tags to render (default all)
+        names    = [str,...], manifest chart names to render (default all)
+        force    = bool, render even when inputs are unchanged
+        metrics  = metric_registry over base_df, shared with the insights stage
+        compact  = bool, write compact JSON (shared x axes, float32 arrays, no template)
+        sources  = dcr_fetch.source_store, upstream datasets shared with the insights stage
+        reload   = callable returning the full base frame when base_df is a projection
+    RETURNS: list of (label,seconds,error) per rendered chart
+    """
+    entries = select_entries(load_manifest(),tags,names)
+    state = manifest_state(os.path.join(dcr_base_cache().cache_dir,'chart_manifest_state.json'))
+    module_key = file_fingerprint(__file__) + ('compact' if compact else '') + ('bands' if bands_enabled() else '')
+    #Charts with a projection are keyed on their own columns, so loading a projection or the
+    #full frame gives the same key and a chart re-renders only when its columns change
+    frame_keys = {}
+
+    def input_key(method):
+        columns = chart_projection(method)
+        if columns is not None:
+            columns = tuple(column for column in base_df.columns if column in columns)
+        if columns not in frame_keys:
+            frame_keys[columns] = frame_fingerprint(base_df if columns is None else base_df[list(columns)])
+        return frame_keys[columns] + module_key
+
+    if sources is None:
+        sources = source_store()
+    #Upstream datasets are fetched before the skip decision, a chart re-renders when one it reads
+    #changed even if the base frame did not
+    sources.prefetch(sources_for(entry['method'] for entry in entries))
+    source_fingerprints = {}
+
+    def source_keys(method):
+        keys = {}
+        for name in sources_for([method]):
+            if name not in source_fingerprints:
+                #None (failed fetch, unhashable cells) never matches a recorded key, the chart renders
+                data = sources.data.get(name)
+                try:
+                    source_fingerprints[name] = frame_fingerprint(data) if isinstance(data,pd.DataFrame) else None
+                except TypeError:
+                    source_fingerprints[name] = None
+            keys[name] = source_fingerprints[name]
+        return keys
+
+    pending = []
+    for entry in entries:
+        key = state.entry_key(entry,input_key(entry['method']),source_keys(entry['method']))
+        if not force and state.is_current(entry,key,data_dir):
+            print('...Skipping ' + entry['name'] + ', inputs unchanged')
+            add_span('skip:' + entry['name'])
+            continue
+        pending.append((entry,key))
+
+    if metrics is None:
+        metrics = metric_registry(base_df)
+    if reload is None:
+        reload = lambda: base_df.copy()
+    if n_jobs > 1:
+        #Workers fork from this process, a metric several pending charts read is computed here
+        #once and inherited instead of being computed again in each worker
+        metrics.warm(shared_metric_calls((entry['method'],entry['args']) for entry, key in pending))
+    results = []
+    for theme in sorted(set(entry['theme'] for entry, key in pending)):
+        group = [(entry,key) for entry, key in pending if entry['theme'] == theme]
+        with span('suite:' + theme) as trace:
+            #Each suite (and the workers forked from it) holds only the columns its charts read
+            columns = projection_for(entry['method'] for entry, key in group)
+            df = base_df if columns is None else project(base_df,columns)
+            trace['columns'] = len(df.columns)
+            dcr_charts = dcr_chart_suite(
+                theme,df=df.copy(),metrics=metrics,sources=sources,reload=reload if columns is not None else None
+            )
+        jobs = [(entry['method'],tuple(entry['args']),entry['output']) for entry, key in group]
+        theme_results = run_chart_jobs(dcr_charts,jobs,data_dir,n_jobs,compact)
+        for (entry,key), (label,seconds,error) in zip(group,theme_results):
+            if error is None:
+                state.record(entry,key)
+        results = results + theme_results
+    state.save()
+    #Forked workers keep their own registry, this only counts in-process lookups
+    print(metrics.summary())
+    return results
+
+
+if __name__ == '__main__':
+    repo_dir = os.environ["GITHUB_REPO"]
+
+    parser = argparse.ArgumentParser(description='Export Decred chart datasets')
+    parser.add_argument('--refresh',action='store_true',help='rebuild the cached base DataFrame from upstream')
+    parser.add_argument('--jobs',type=int,default=1,help='worker processes rendering charts in parallel')
+    parser.add_argument('--tag',action='append',help='render manifest charts with this tag (repeatable)')
+    parser.add_argument('--chart',action='append',help='render this manifest chart (repeatable)')
+    parser.add_argument('--force',action='store_true',help='render charts even when their inputs are unchanged')
+    parser.add_argument('--compact-json',action='store_true',help='write compact chart JSON and report the size savings')
+    args = parser.parse_args()
+
+    #DCR_HTTP_RECORD / DCR_HTTP_REPLAY select the fixture mode
+    install_fixtures()
+    #Read only the base columns the selected charts declare (all of them when one is undeclared)
+    columns = projection_for(entry['method'] for entry in select_entries(load_manifest(),args.tag,args.chart))
+    base_df = dcr_base_cache().base_frame(args.refresh,columns)
+    results = export_charts(
+        base_df,f'{repo_dir}/data',args.jobs,args.tag,args.chart,args.force,compact=args.compact_json,
+        reload=dcr_base_cache().base_frame
+    )
+    if any(error is not None for label, seconds, error in results):
+        sys.exit(1)
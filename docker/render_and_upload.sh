@@ -1,13 +1,24 @@
 cd ${GITHUB_REPO}
 git pull
 cd ..
+WORKDIR=$(pwd)
+#git push timing is picked up by the next run report (see dcronchain_data.py)
+CACHE_DIR=${DCR_CACHE_DIR:-.dcr_cache}
+case ${CACHE_DIR} in
+    /*) ;;
+    *) CACHE_DIR=${WORKDIR}/${CACHE_DIR} ;;
+esac
 echo "Updating DCR On Chain data..."
 mkdir ${GITHUB_REPO}/data
-python3 generate_charts.py
-python3 generate_insights.py
+python3 -m dcronchain_data run --charts --insights --jobs ${RENDER_JOBS:-4} \
+    ${METRICS_FILE:+--metrics-file ${METRICS_FILE}} ${PUSHGATEWAY:+--pushgateway ${PUSHGATEWAY}}
 echo "Uploading new data to Github"
 cd ${GITHUB_REPO}/data
 git add .
 git commit -m "regular data update"
+PUSH_START=$(date +%s%N)
 git push https://${GITHUB_TOKEN}:x-oauth-basic@${GITHUB_URL} master
-
+PUSH_STATUS=$?
+PUSH_END=$(date +%s%N)
+mkdir -p ${CACHE_DIR}
+echo "{\"seconds\": $(( (PUSH_END - PUSH_START) / 1000000 ))e-3, \"exit_code\": ${PUSH_STATUS}, \"finished\": \"$(date -u +%Y-%m-%dT%H:%M:%S)\"}" > ${CACHE_DIR}/last_push.json
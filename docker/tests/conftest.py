@@ -0,0 +1,49 @@
+#The pipeline modules are flat files in docker/, imported the way the container runs them
+import multiprocessing
+import os
+import queue as queues
+import sys
+
+import pytest
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def run_forked(target,args,directory=None):
+    """
+    Runs target(*args) for every args tuple at once, each in its own forked process,
+    the way chart workers share state files under --jobs
+    INPUTS:
+        target    = function run by each worker
+        args      = [tuple,...], arguments of each worker
+        directory = str, directory the workers write to, checked for leftover .tmp files
+    RETURNS: [value,...], what target returned in each worker, in args order
+    """
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+
+    def worker(i,*values):
+        results.put((i,target(*values)))
+
+    workers = [context.Process(target=worker,args=(i,) + tuple(values)) for i, values in enumerate(args)]
+    for process in workers:
+        process.start()
+    #Drained before joining so a large result cannot block its worker on the pipe
+    returned = {}
+    for process in workers:
+        try:
+            i, value = results.get(timeout=60)
+        except queues.Empty:
+            break
+        returned[i] = value
+    for process in workers:
+        process.join()
+    assert [process.exitcode for process in workers] == [0] * len(workers)
+    if directory is not None:
+        assert not [name for name in os.listdir(directory) if name.endswith('.tmp')]
+    return [returned[i] for i in range(len(workers))]
+
+
+@pytest.fixture
+def fork_writers():
+    return run_forked
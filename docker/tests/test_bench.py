@@ -0,0 +1,53 @@
+import pytest
+
+pytest.importorskip('checkonchain')
+import bench_charts
+
+
+def report(labels,tags=None,**times):
+    results = dict((label,{'median_s':times.get(label,1.0),'error':None}) for label in labels)
+    return {'meta':{'tags':tags,'charts':None},'results':results}
+
+
+def test_repeat_below_one_is_rejected():
+    with pytest.raises(SystemExit) as e:
+        bench_charts.main(['--scale','1','--repeat','0'])
+    assert e.value.code == 2
+
+
+def test_missing_chart_is_a_regression():
+    baseline = report(['mvrv(0)','privacy()'])
+    regressions = bench_charts.compare_reports(report(['mvrv(0)']),baseline,0.1)
+    assert regressions == [('privacy()','missing, benchmarked in the baseline')]
+    #Slowdowns are still reported next to missing charts
+    regressions = bench_charts.compare_reports(report(['mvrv(0)'],**{'mvrv(0)':2.0}),baseline,0.1)
+    assert [label for label, message in regressions] == ['privacy()','mvrv(0)']
+
+
+def test_narrowed_run_skips_missing_check():
+    baseline = report(['mvrv(0)','privacy()'])
+    assert bench_charts.compare_reports(report(['mvrv(0)'],tags=['valuation']),baseline,0.1) == []
+
+
+def test_every_call_rebuilds_the_denominations():
+    import plotly.graph_objects as go
+    from dcr_synthetic import synthetic_base_frame
+
+    class suite():
+
+        def __init__(self):
+            self.base_df = synthetic_base_frame(days=20)
+            self.denominations = None
+            self.built = 0
+
+        def block_subsidy_usd(self,model):
+            if self.denominations is None:
+                self.built += 1
+                self.denominations = self.base_df
+            return go.Figure()
+
+    charts = suite()
+    result = bench_charts.bench_case(charts,'block_subsidy_usd',(0,),1,3)
+    assert result['error'] is None
+    #Warm-up, timed and traced calls each start from nothing cached
+    assert charts.built == 1 + 3 + 1
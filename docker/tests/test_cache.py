@@ -0,0 +1,31 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+metrics = pytest.importorskip('checkonchain.dcronchain.dcr_add_metrics')
+
+import dcr_cache
+
+
+def fake_curve(self,blocks):
+    #Slow enough that the workers overlap
+    time.sleep(0.2)
+    blk = np.arange(blocks)
+    return pd.DataFrame({'blk':blk,'Sply':blk * 10.0})
+
+
+def build_supply(cache_dir):
+    dcr_cache.projected_supply(5000,cache_dir)
+
+
+def test_parallel_cold_supply_cache(tmp_path,monkeypatch,fork_writers):
+    #s2f_model(0) and s2f_model(1) build the curve at once in separate workers
+    monkeypatch.setattr(metrics.dcr_add_metrics,'dcr_sply_curtailed',fake_curve,raising=False)
+    monkeypatch.setattr(dcr_cache,'_supply_curves',{})
+    fork_writers(build_supply,[(str(tmp_path),)] * 4,str(tmp_path))
+    curve = dcr_cache.projected_supply(5000,str(tmp_path))
+    #One row per day, the last block of the day (288 blocks a day at 5 minutes)
+    assert len(curve) == len(curve['date'].dt.floor('D').unique())
+    assert curve['blk'].iloc[-1] == 4999
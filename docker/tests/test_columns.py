@@ -0,0 +1,82 @@
+import argparse
+import sys
+import types
+
+import pandas as pd
+import pytest
+
+import dcronchain_data
+from dcr_synthetic import synthetic_base_frame
+
+#Read by the charts below, left out of the projection
+UNLISTED = 'TxTfrValNtv'
+
+
+def full_frame():
+    df = synthetic_base_frame()
+    df['date'] = df['date'].dt.tz_localize('UTC')
+    return df
+
+
+class full_sources():
+
+    def __init__(self,df):
+        self.df = df
+
+    def full_base_frame(self):
+        return self.df.copy()
+
+
+def test_run_charts_reloads_the_full_base_frame(monkeypatch):
+    full = full_frame()
+    calls = []
+    charts = types.ModuleType('generate_charts')
+
+    def export_charts(base_df,data_dir,*args):
+        calls.append(args)
+        return []
+
+    charts.export_charts = export_charts
+    monkeypatch.setitem(sys.modules,'generate_charts',charts)
+    args = argparse.Namespace(jobs=1,tag=None,chart=None,force=False,compact_json=False,compact_dtypes=False)
+    assert dcronchain_data.run_charts(full[['date','PriceUSD']],'data',args,None,full_sources(full))
+    reload = calls[0][-1]
+    assert list(reload().columns) == list(full.columns)
+
+
+def test_chart_reading_an_unlisted_column_widens(tmp_path):
+    pytest.importorskip('checkonchain')
+    import plotly.graph_objects as go
+    import dcr_jobs
+    from dcr_memo import metric_registry
+    from generate_charts import dcr_chart_suite
+
+    class suite(dcr_chart_suite):
+
+        def reads_unlisted(self):
+            df = self.df
+            return go.Figure(go.Scatter(x=df['date'],y=df[UNLISTED]))
+
+    full = full_frame()
+    projected = full[['date','PriceUSD']]
+    path = str(tmp_path / 'chart.json')
+
+    dcr_jobs._suite = suite('dark',df=projected.copy(),metrics=metric_registry(projected),reload=None)
+    seconds, error, sizes, spans = dcr_jobs.render_job(('reads_unlisted',(),path,False))
+    assert 'KeyError' in error
+
+    dcr_jobs._suite = suite('dark',df=projected.copy(),metrics=metric_registry(projected),reload=lambda: full)
+    seconds, error, sizes, spans = dcr_jobs.render_job(('reads_unlisted',(),path,False))
+    assert error is None
+    assert UNLISTED in dcr_jobs._suite.base_df.columns
+    assert (tmp_path / 'chart.json').exists()
+
+
+def test_homepage_charts_are_projectable():
+    from dcr_columns import projection_for
+    from dcr_manifest import load_manifest, select_entries
+
+    methods = [entry['method'] for entry in select_entries(load_manifest(),['homepage'])]
+    columns = projection_for(methods)
+    assert columns is not None
+    assert len([column for column in full_frame().columns if column in columns]) < len(full_frame().columns)
@@ -0,0 +1,72 @@
+import json
+
+import numpy as np
+import plotly.graph_objects as go
+
+from dcr_compact_json import MIN_ARRAY_LEN, compact_figure, expand_figure, write_compact_json
+
+
+def figure():
+    dates = ['2020-01-%02d' % day for day in range(1,21)]
+    steps = [float(i) for i in range(20)]
+    price = [1000.0 / 3 * 1.01 ** i for i in range(20)]
+    price[3] = None
+    price[17] = None
+    fig = go.Figure()
+    #Two traces share the date axis, two more share a numeric one
+    fig.add_trace(go.Scatter(x=dates,y=price,name='Price'))
+    fig.add_trace(go.Scatter(x=dates,y=[0.1 * i for i in range(20)],name='Ratio'))
+    fig.add_trace(go.Scatter(x=steps,y=[2.0 ** -i for i in range(20)],name='Decay'))
+    fig.add_trace(go.Scatter(x=steps,y=[7.0] * 20,name='Flat'))
+    #Zone boundaries are below MIN_ARRAY_LEN and stay plain lists
+    fig.add_trace(go.Scatter(x=['2020-01-01','2020-01-20'],y=[0.5,1.5],name='Zone'))
+    fig.update_layout(title='Compact')
+    return fig
+
+
+def test_round_trip(tmp_path):
+    fig = figure()
+    full = json.loads(fig.to_json())
+    full_bytes, compact_bytes = write_compact_json(fig,str(tmp_path / 'chart.json'))
+    assert compact_bytes < full_bytes
+    with open(tmp_path / 'chart.json') as f:
+        compact = json.load(f)
+
+    assert 'template' not in compact['layout']
+    assert compact['layout']['title'] == full['layout']['title']
+    #Repeated x arrays are stored once, dates as strings and steps as float32
+    assert len(compact['shared']) == 2
+    refs = [trace['x'] for trace in compact['data'][:4]]
+    assert refs[0] == refs[1] and refs[2] == refs[3] and refs[0] != refs[2]
+    assert isinstance(compact['shared'][refs[0]['ref']],list)
+    assert compact['shared'][refs[2]['ref']]['dtype'] == 'f4'
+    assert compact['data'][4]['x'] == full['data'][4]['x']
+    assert compact['data'][4]['y'] == full['data'][4]['y']
+
+    expanded = expand_figure(compact)
+    assert len(expanded['data']) == len(full['data'])
+    for before, after in zip(full['data'],expanded['data']):
+        assert after['name'] == before['name']
+        for axis in ('x','y'):
+            if isinstance(before[axis][0],str):
+                assert after[axis] == before[axis]
+                continue
+            #NaN is written as null and comes back at the same positions
+            assert [value is None for value in after[axis]] == [value is None for value in before[axis]]
+            values = np.array([np.nan if value is None else value for value in before[axis]])
+            np.testing.assert_allclose(
+                np.array(after[axis],dtype=float),values,rtol=np.finfo(np.float32).eps
+            )
+    assert expanded['data'][0]['y'][3] is None and expanded['data'][0]['y'][17] is None
+
+
+def test_single_arrays_are_not_shared():
+    fig = {'data':[
+        {'x':list(range(MIN_ARRAY_LEN)),'y':list(range(MIN_ARRAY_LEN))},
+        {'x':list(range(1,MIN_ARRAY_LEN + 1)),'y':[1,2,3]},
+    ]}
+    compact = compact_figure(fig)
+    assert 'shared' not in compact
+    assert compact['data'][0]['x']['dtype'] == 'f4'
+    assert compact['data'][1]['y'] == [1,2,3]
+    assert expand_figure(compact)['data'][1]['x'] == [float(i) for i in range(1,MIN_ARRAY_LEN + 1)]
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+
+from dcr_denominations import denominate, price_matrix
+
+
+def flow_frame(days=300):
+    rng = np.random.default_rng(3)
+    price = 20 * np.exp(np.cumsum(rng.normal(0,0.03,days)))
+    btc = 8000 * np.exp(np.cumsum(rng.normal(0,0.02,days)))
+    eth = 300 * np.exp(np.cumsum(rng.normal(0,0.04,days)))
+    df = pd.DataFrame({
+        'date':pd.date_range('2019-01-01',periods=days,tz='UTC'),
+        'PriceUSD':price,
+        'PriceBTC':price / btc,
+        'ETH_PriceUSD':eth,
+        'SplyCur':8e6 + np.arange(days) * 7000.0,
+        'PoW_income_dcr':rng.uniform(3000,4000,days),
+        'PoS_income_dcr':rng.uniform(1500,2000,days),
+        #Treasury flow only in USD, taken to DCR over PriceUSD
+        'Fund_income_usd':rng.uniform(500,700,days) * price,
+        'Total_income_dcr':rng.uniform(5000,7000,days),
+        'tic_usd_cost':rng.uniform(1e5,2e5,days),
+        'CapRealUSD':price * 6e6,
+        'CapRealBTC':price * 6e6 / btc,
+        'IssuedCapUSD':price * 7e6,
+    })
+    #Gaps in a flow, in a price and in the supply
+    df.loc[[5,6,120],'PoW_income_dcr'] = np.nan
+    df.loc[200,'PriceUSD'] = np.nan
+    df.loc[250,'ETH_PriceUSD'] = np.nan
+    df.loc[60,'SplyCur'] = np.nan
+    return df
+
+
+def expected_cap(df,daily_dcr,quote):
+    """Cumulative value of a daily DCR flow in quote, the per-chart pandas chain"""
+    price = {
+        'USD':df['PriceUSD'],
+        'BTC':df['PriceBTC'],
+        'ETH':df['PriceUSD'] / df['ETH_PriceUSD'],
+    }[quote]
+    return (daily_dcr * price).cumsum()
+
+
+def test_price_matrix_quotes():
+    quotes, prices = price_matrix(flow_frame())
+    assert quotes == ['USD','BTC','ETH']
+    assert prices.shape == (300,3)
+
+
+def test_caps_and_prices_match_series_cumsum():
+    df = flow_frame()
+    result = denominate(df)
+    flows = {
+        'SubsidyPoW':df['PoW_income_dcr'],
+        'SubsidyPoS':df['PoS_income_dcr'],
+        'SubsidyFund':df['Fund_income_usd'] / df['PriceUSD'],
+        'Subsidy':df['Total_income_dcr'],
+        'TicketsBound':df['tic_usd_cost'] / df['PriceUSD'],
+    }
+    for prefix, daily in flows.items():
+        for quote in ['USD','BTC','ETH']:
+            cap = expected_cap(df,daily,quote)
+            got = result[prefix + 'Cap' + quote]
+            assert np.array_equal(np.isnan(got.to_numpy()),np.isnan(cap.to_numpy())), prefix + quote
+            np.testing.assert_allclose(got,cap,rtol=1e-12,err_msg=prefix + quote)
+            np.testing.assert_allclose(result[prefix + 'Price' + quote],cap / df['SplyCur'],rtol=1e-12)
+
+
+def test_stocks_converted_only_when_missing():
+    df = flow_frame()
+    result = denominate(df)
+    #Upstream columns are kept as they are
+    pd.testing.assert_series_equal(result['CapRealBTC'],df['CapRealBTC'])
+    #Converted at the day's DCR cross rate, NaN on a day without a DCR price
+    rate = df['PriceUSD'] / df['ETH_PriceUSD'] / df['PriceUSD']
+    np.testing.assert_allclose(result['CapRealETH'],df['CapRealUSD'] * rate,rtol=1e-12)
+    assert np.isnan(result['CapRealETH'][200])
+    np.testing.assert_allclose(
+        result['IssuedCapBTC'],df['IssuedCapUSD'] * df['PriceBTC'] / df['PriceUSD'],rtol=1e-12
+    )
+    assert 'PriceRealETH' not in result.columns
+    assert list(result.columns[:len(df.columns)]) == list(df.columns)
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+from dcr_dtypes import compact_frame
+from dcr_synthetic import synthetic_base_frame
+
+
+def frame():
+    df = synthetic_base_frame(days=300)
+    df['tx_count'] = np.arange(len(df),dtype='int64') * 40
+    df['sats'] = np.arange(len(df),dtype='int64') + 2**40
+    df['negative'] = -np.arange(len(df),dtype='int64') - 2**31
+    df['flag'] = df['blk'] % 2 == 0
+    df['era'] = np.where(df['age_days'] < 150,'early','late')
+    df['hash'] = [str(i) for i in range(len(df))]
+    return df
+
+
+def test_compact_dtypes():
+    df = frame()
+    compact = compact_frame(df)
+    assert list(compact.columns) == list(df.columns)
+    assert compact.index.equals(df.index)
+    for column in df.columns:
+        if pd.api.types.is_float_dtype(df[column]):
+            assert compact[column].dtype == 'float32', column
+            np.testing.assert_allclose(compact[column],df[column],rtol=1e-6)
+    assert compact['blk'].dtype == 'int32'
+    assert compact['tx_count'].dtype == 'int32'
+    assert (compact['tx_count'] == df['tx_count']).all()
+    #Ranges that do not fit int32 stay int64
+    assert compact['sats'].dtype == 'int64'
+    assert compact['negative'].dtype == 'int64'
+    assert compact['flag'].dtype == bool
+    #Repetitive strings become categorical, unique ones are left alone
+    assert isinstance(compact['era'].dtype,pd.CategoricalDtype)
+    assert (compact['era'].astype(str) == df['era']).all()
+    assert not isinstance(compact['hash'].dtype,pd.CategoricalDtype)
+    #The input frame is not touched
+    assert df['blk'].dtype == 'int64'
+
+
+def test_date_is_utc():
+    df = frame()
+    compact = compact_frame(df)
+    assert str(compact['date'].dt.tz) == 'UTC'
+    assert (compact['date'].dt.tz_localize(None) == df['date']).all()
+    #A tz-aware date keeps its instants
+    df['date'] = df['date'].dt.tz_localize('UTC')
+    assert (compact_frame(df)['date'] == df['date']).all()
+    assert str(compact_frame(df)['date'].dt.tz) == 'UTC'
+
+
+def test_keep_columns():
+    df = frame()
+    compact = compact_frame(df,keep=['PriceUSD','blk'])
+    assert compact['PriceUSD'].dtype == 'float64'
+    assert compact['blk'].dtype == 'int64'
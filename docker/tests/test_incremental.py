@@ -0,0 +1,99 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dcr_incremental import committed_state
+
+
+class running_total():
+
+    def __init__(self):
+        self.total = 0.0
+
+    def add(self,values):
+        self.total += float(np.nansum(values))
+
+    def copy(self):
+        other = running_total()
+        other.total = self.total
+        return other
+
+    def to_dict(self):
+        return {'total':self.total}
+
+    def load(self,state):
+        self.total = state['total']
+
+
+def commit_series(path,worker,rounds):
+    dates = pd.date_range('2016-02-08',periods=rounds + 10)
+    for i in range(rounds):
+        #A fresh state object per update, like one chart render per job
+        committed_state(path,revise=0).update(
+            'series:' + str(worker),dates[:i + 10],np.ones((i + 10,1)),running_total
+        )
+
+
+def test_incremental_update_matches_full(tmp_path):
+    path = str(tmp_path / 'state.json')
+    dates = pd.date_range('2016-02-08',periods=100)
+    values = np.arange(100,dtype='float64').reshape(-1,1)
+    state = committed_state(path)
+    first, added, rebuilt = state.update('x',dates[:80],values[:80],running_total)
+    assert rebuilt and added == 78
+    total, added, rebuilt = committed_state(path).update('x',dates,values,running_total)
+    assert not rebuilt and added == 20
+    assert total.total == values.sum()
+
+
+def test_revised_history_rebuilds(tmp_path):
+    path = str(tmp_path / 'state.json')
+    dates = pd.date_range('2016-02-08',periods=50)
+    values = np.ones((50,1))
+    committed_state(path).update('x',dates[:40],values[:40],running_total)
+    #The last committed row (40 rows less the 2 revisable days) changed upstream
+    values[37] = 5.0
+    total, added, rebuilt = committed_state(path).update('x',dates,values,running_total)
+    assert rebuilt and total.total == values.sum()
+
+
+def test_forked_writers_keep_every_accumulator(tmp_path,fork_writers):
+    path = str(tmp_path / 'state.json')
+    fork_writers(commit_series,[(path,worker,25) for worker in range(4)],str(tmp_path))
+    with open(path) as f:
+        state = json.load(f)
+    assert sorted(state) == ['series:0','series:1','series:2','series:3']
+    assert all(entry['rows'] == 34 for entry in state.values())
+
+
+def test_full_rebuild_from_a_projected_metric_keeps_every_column(tmp_path,monkeypatch):
+    pytest.importorskip('checkonchain')
+    import checkonchain.dcronchain.dcr_add_metrics as upstream
+    import dcr_columns
+    import dcr_memo
+    from dcr_incremental import dcr_incremental_data
+    from dcr_synthetic import synthetic_base_frame
+
+    class chain_metrics():
+
+        def metric_ratio(self,df):
+            df['Ratio'] = df['PriceUSD'] / df['PriceUSD'].iloc[0]
+            return df
+
+        def metric_scaled(self,df):
+            df['Scaled'] = df['Ratio'] * df['CapRealUSD']
+            return df
+
+    monkeypatch.setattr(upstream,'dcr_add_metrics',chain_metrics)
+    monkeypatch.setattr(dcr_memo,'dcr_add_metrics',chain_metrics)
+    #metric_ratio is declared, the registry computes it from date and PriceUSD alone
+    monkeypatch.setattr(dcr_columns,'_metric_inputs',{'metric_ratio':['date','PriceUSD']})
+    base = synthetic_base_frame(days=50)
+    chain = [('metric_ratio',()),('metric_scaled',())]
+    path = str(tmp_path / 'full.csv')
+
+    shared = dcr_incremental_data(path,chain,registry=dcr_memo.metric_registry(base)).full_rebuild(base)
+    alone = dcr_incremental_data(path,chain).full_rebuild(base)
+    pd.testing.assert_frame_equal(shared,alone)
@@ -0,0 +1,54 @@
+import os
+
+import pandas as pd
+import pytest
+
+from dcr_fetch import source_store
+from dcr_manifest import manifest_state
+from dcr_synthetic import synthetic_base_frame
+
+ENTRY = {'name':'feegrowth_performance','method':'fee_growth','output':'feegrowth_performance.json'}
+
+
+def test_entry_key_covers_sources(tmp_path):
+    state = manifest_state(str(tmp_path / 'state.json'))
+    key = state.entry_key(ENTRY,'frame')
+    #Charts reading no upstream dataset keep the key they had before sources were keyed
+    assert state.entry_key(ENTRY,'frame',{}) == key
+    assert state.entry_key(ENTRY,'frame',{'cm_eth':'a'}) != key
+    assert state.entry_key(ENTRY,'frame',{'cm_eth':'a'}) != state.entry_key(ENTRY,'frame',{'cm_eth':'b'})
+
+
+def test_changed_source_renders_again(tmp_path,monkeypatch):
+    pytest.importorskip('checkonchain')
+    import generate_charts
+
+    monkeypatch.setenv('DCR_CACHE_DIR',str(tmp_path / 'cache'))
+    rendered = []
+
+    def run_chart_jobs(suite,jobs,data_dir,n_jobs=1,compact=False):
+        results = []
+        for method, args, filename in jobs:
+            rendered.append(method)
+            with open(os.path.join(data_dir,filename),'w') as f:
+                f.write('{}')
+            results.append((method + '()',0.0,None))
+        return results
+
+    monkeypatch.setattr(generate_charts,'run_chart_jobs',run_chart_jobs)
+    df = synthetic_base_frame(days=100)
+    df['date'] = df['date'].dt.tz_localize('UTC')
+    upstream = pd.DataFrame({'date':df['date'],'PriceUSD':df['BTC_PriceUSD']})
+    sources = source_store()
+    sources.data = {'cm_btc':upstream,'cm_eth':upstream.copy()}
+
+    def export():
+        generate_charts.export_charts(df,str(tmp_path),names=[ENTRY['name']],sources=sources)
+
+    export()
+    export()
+    assert rendered == ['fee_growth']
+    #Same base frame, new upstream day: the chart is stale and renders again
+    sources.data['cm_eth'] = upstream.assign(PriceUSD=upstream['PriceUSD'] * 1.01)
+    export()
+    assert rendered == ['fee_growth','fee_growth']
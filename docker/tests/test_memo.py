@@ -0,0 +1,57 @@
+import os
+
+import plotly.graph_objects as go
+import pytest
+
+from dcr_columns import chart_metric_calls, shared_metric_calls
+from dcr_synthetic import synthetic_base_frame
+
+PUELL = ('metric_puell_multiple',(),{})
+
+
+def test_chart_metric_calls_bind_manifest_args():
+    assert chart_metric_calls('ticket_funding_rate',[28,142]) == [('metric_ticket_funding_rate',(28,142),{})]
+    #Default parameter values and lookups inside helper methods
+    assert chart_metric_calls('dcr_staking') == [('metric_staking_return',(5,0),{})]
+    assert chart_metric_calls('block_subsidy_usd',[0]) == [('metric_issued_cap',(),{})]
+    assert shared_metric_calls([('puell_multiple',[]),('mining_pulse',[])]) == [PUELL]
+    assert shared_metric_calls([('puell_multiple',[]),('mayer_multiple',[])]) == []
+
+
+@pytest.mark.parametrize('n_jobs',[1,4])
+def test_shared_metric_computed_once(tmp_path,monkeypatch,n_jobs):
+    pytest.importorskip('checkonchain')
+    import dcr_memo
+    import generate_charts
+    from dcr_fetch import source_store
+
+    monkeypatch.setenv('DCR_CACHE_DIR',str(tmp_path / 'cache'))
+    log = str(tmp_path / 'computed.log')
+
+    class counting_metrics():
+
+        def metric_puell_multiple(self,df):
+            #Appends are atomic, every forked worker logs to the same file
+            with open(log,'a') as f:
+                f.write(str(os.getpid()) + '\n')
+            return df
+
+    def chart(self):
+        df = self.metric('metric_puell_multiple')
+        return go.Figure(go.Scatter(x=df['date'],y=df['PriceUSD']))
+
+    #The manifest charts reading metric_puell_multiple, rendered by a stand-in of the same name
+    monkeypatch.setattr(dcr_memo,'dcr_add_metrics',counting_metrics)
+    monkeypatch.setattr(generate_charts.dcr_chart_suite,'puell_multiple',chart)
+    monkeypatch.setattr(generate_charts.dcr_chart_suite,'mining_pulse',chart)
+    df = synthetic_base_frame(days=100)
+    df['date'] = df['date'].dt.tz_localize('UTC')
+    sources = source_store()
+    sources.data = {'mining_pulse':df[['date','PriceUSD']].copy()}
+
+    results = generate_charts.export_charts(
+        df,str(tmp_path),n_jobs,names=['puellmultiple_oscillator_usd','miningpulse_oscillator_usd'],sources=sources
+    )
+    assert [error for label, seconds, error in results] == [None,None]
+    with open(log) as f:
+        assert len(f.read().split()) == 1
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from dcr_synthetic import synthetic_base_frame
+
+OVERHEAD = 0.05
+POWER_USDKWH = 0.05
+OP_OVERHEAD = 0.05
+
+
+def hardware_loop(df,miners):
+    """Per-device columns and counts miner_hardware_estimate computed before it was broadcast"""
+    df = df[df['pow_hashrate_THs_avg']>1].copy()
+    counts = []
+    for count, i in enumerate(miners['model']):
+        name_cnt        = i +'_cnt'
+        df[name_cnt]    = df['pow_hashrate_THs_avg'] / miners.loc[count,'hashrate_THs']
+        df[name_cnt]    = df[name_cnt].apply(np.ceil)
+        df[i + '_cost'] = df[name_cnt] * miners.loc[count,'device_price_usd']
+        df[i + '_power_kWh'] = df[name_cnt] * miners.loc[count,'power_kWh'] * 24
+        df[i + '_CAPEX'] = df[i + '_cost'] * (1 + OVERHEAD)
+        df[i + '_OPEX'] = df[i + '_power_kWh'] * POWER_USDKWH + OP_OVERHEAD/365 * df[i + '_cost']
+        df[i + '_pow_prof'] = (df['PoW_income_usd'] - df[i + '_OPEX']) / df[i + '_CAPEX']
+        _df = df[df['blk']>=miners.loc[count,'blk_start']]
+        counts.append((int(_df[name_cnt].max()),int(_df[name_cnt].mean())) if len(_df) else None)
+    return df, counts
+
+
+def test_broadcast_matches_the_per_device_loop(tmp_path,monkeypatch):
+    pytest.importorskip('checkonchain')
+    from dcr_memo import metric_registry
+    from generate_charts import dcr_chart_suite
+
+    df = synthetic_base_frame(days=400)
+    df['date'] = df['date'].dt.tz_localize('UTC')
+    rng = np.random.default_rng(5)
+    df['pow_hashrate_THs_avg'] = np.exp(np.linspace(-1,9,len(df))) * rng.uniform(0.9,1.1,len(df))
+    df['PoW_income_usd'] = df['DailyIssuedUSD'] * 0.6
+    last = df['blk'].iloc[-1]
+    miners = pd.DataFrame({
+        'model':['DR3','D1','Future'],
+        'hashrate_THs':[7.8,44.0,120.0],
+        'power_kWh':[1.41,2.2,3.0],
+        'device_price_usd':[1500.0,6000.0,9000.0],
+        #The last device launches after the final day of the frame
+        'blk_start':[0.0,float(df['blk'].iloc[200]),float(last + 1000)],
+    })
+    (tmp_path / 'resources' / 'data').mkdir(parents=True)
+    miners.to_csv(tmp_path / 'resources' / 'data' / 'dcr_mining_hardware.csv',index=False)
+    (tmp_path / 'docker').mkdir()
+    monkeypatch.chdir(tmp_path / 'docker')
+
+    suite = dcr_chart_suite('light',df=df,metrics=metric_registry(df),reload=None)
+    suite.miner_hardware_estimate()
+    expected, counts = hardware_loop(df,miners)
+
+    for j, model in enumerate(miners['model']):
+        for suffix in ['_cnt','_cost','_power_kWh','_CAPEX','_OPEX','_pow_prof']:
+            np.testing.assert_allclose(
+                suite.miner_hardware[suffix][:,j],expected[model + suffix].to_numpy(),rtol=1e-12,err_msg=model + suffix
+            )
+    for j, count in enumerate(counts[:2]):
+        assert (suite.miners.loc[j,'max_cnt'],suite.miners.loc[j,'avg_cnt']) == count
+    #The old loop raised on the unlaunched device, its counts and maxima are now NaN
+    assert counts[2] is None
+    assert suite.miners.loc[2,['max_cnt','avg_cnt','max_CAPEX','max_OPEX']].isna().all()
@@ -0,0 +1,57 @@
+import pandas as pd
+import pytest
+
+from dcr_synthetic import synthetic_base_frame
+
+
+def base_frame():
+    df = synthetic_base_frame(days=400)
+    df['date'] = df['date'].dt.tz_localize('UTC')
+    #Privacy columns the synthetic schema leaves out
+    df['dcr_sply'] = df['SplyCur']
+    df['dcr_anon_part'] = df['dcr_anon_mix_vol'].cumsum() / df['SplyCur']
+    return df
+
+
+@pytest.mark.parametrize('method',['privacy','privacy_volume'])
+def test_privacy_leaves_the_base_frame_unchanged(method):
+    pytest.importorskip('checkonchain')
+    from dcr_memo import metric_registry
+    from generate_charts import dcr_chart_suite
+
+    df = base_frame()
+    suite = dcr_chart_suite('dark',df=df,metrics=metric_registry(df),reload=None)
+    before = suite.base_df.copy()
+    getattr(suite,method)()
+    pd.testing.assert_frame_equal(suite.base_df,before)
+    #A chart rendered afterwards reads the original per-day counts
+    pd.testing.assert_series_equal(suite.df['tx_mix'],before['tx_mix'])
+
+
+def test_no_chart_writes_over_a_base_column():
+    #Under pandas 1.1 a write to an existing column of self.df lands in the shared base frame
+    import ast
+    from dcr_columns import CHARTS_PATH, SUITE_CLASS
+
+    base = set(base_frame().columns)
+    with open(CHARTS_PATH) as f:
+        tree = ast.parse(f.read())
+    suite = [node for node in tree.body if isinstance(node,ast.ClassDef) and node.name == SUITE_CLASS][0]
+    writes = []
+    for method in suite.body:
+        if not isinstance(method,ast.FunctionDef):
+            continue
+        views = set(
+            target.id for node in ast.walk(method) if isinstance(node,ast.Assign)
+            and isinstance(node.value,ast.Attribute) and node.value.attr == 'df'
+            for target in node.targets if isinstance(target,ast.Name)
+        )
+        for node in ast.walk(method):
+            key = getattr(node,'slice',None)
+            if (
+                isinstance(node,ast.Subscript) and isinstance(node.ctx,ast.Store)
+                and isinstance(node.value,ast.Name) and node.value.id in views
+                and isinstance(key,ast.Constant) and key.value in base
+            ):
+                writes.append(method.name + ':' + key.value)
+    assert writes == []
@@ -0,0 +1,83 @@
+import pytest
+
+pytest.importorskip('prometheus_client')
+from prometheus_client.parser import text_string_to_metric_families
+
+import dcr_prometheus
+from dcr_prometheus import run_metrics
+from dcr_trace import run_trace
+
+
+def run_report(charts,sources,failed=()):
+    trace = run_trace()
+    with trace.span('run'):
+        with trace.span('fetch'):
+            for source in sources:
+                trace.add('fetch:' + source,wall_s=0.5,cpu_s=0.1)
+            trace.add('base_cache',hit=False)
+        with trace.span('charts'):
+            for chart in charts:
+                with trace.span('chart:' + chart) as record:
+                    if chart in failed:
+                        record['failed'] = True
+                    else:
+                        record['bytes'] = 1000
+    return trace.report()
+
+
+def series(path):
+    with open(path) as f:
+        text = f.read()
+    values = {}
+    for family in text_string_to_metric_families(text):
+        for sample in family.samples:
+            values[(sample.name,tuple(sorted(sample.labels.items())))] = sample.value
+    return values
+
+
+def labels(values,name,label):
+    return sorted(dict(pairs)[label] for metric, pairs in values if metric == name)
+
+
+def test_two_runs(tmp_path,monkeypatch):
+    path = str(tmp_path / 'dcr.prom')
+    metrics = run_metrics(str(tmp_path / 'state'))
+
+    monkeypatch.setattr(dcr_prometheus.clock,'time',lambda: 1000.0)
+    metrics.update(run_report(['mvrv(0)','privacy()'],['coinmetrics','dcrdata']),True)
+    metrics.write(path)
+    first = series(path)
+    assert labels(first,'dcr_chart_render_seconds','chart') == ['mvrv(0)','privacy()']
+    assert labels(first,'dcr_fetch_seconds','source') == ['coinmetrics','dcrdata']
+    assert first[('dcr_chart_output_bytes',(('chart','privacy()'),))] == 1000
+    assert first[('dcr_output_bytes',())] == 2000
+    assert first[('dcr_last_success_timestamp_seconds',())] == 1000.0
+
+    #The second run drops a chart and a source, and fails on a chart
+    monkeypatch.setattr(dcr_prometheus.clock,'time',lambda: 2000.0)
+    metrics.update(run_report(['mvrv(0)','s2f()'],['coinmetrics'],failed=['s2f()']),False)
+    metrics.write(path)
+    second = series(path)
+    assert labels(second,'dcr_chart_render_seconds','chart') == ['mvrv(0)','s2f()']
+    assert labels(second,'dcr_chart_output_bytes','chart') == ['mvrv(0)']
+    assert labels(second,'dcr_fetch_seconds','source') == ['coinmetrics']
+    assert labels(second,'dcr_stage_seconds','stage') == ['charts','fetch']
+    assert second[('dcr_chart_failures',())] == 1
+    assert second[('dcr_run_success',())] == 0
+    assert second[('dcr_run_timestamp_seconds',())] == 2000.0
+    #A failed run keeps the time of the last success
+    assert second[('dcr_last_success_timestamp_seconds',())] == 1000.0
+    assert second[('dcr_runs_total',(('result','success'),))] == 1
+    assert second[('dcr_runs_total',(('result','failure'),))] == 1
+
+
+def test_last_success_survives_a_restart(tmp_path,monkeypatch):
+    path = str(tmp_path / 'dcr.prom')
+    monkeypatch.setattr(dcr_prometheus.clock,'time',lambda: 1000.0)
+    run_metrics(str(tmp_path)).update(run_report(['mvrv(0)'],['coinmetrics']),True)
+
+    monkeypatch.setattr(dcr_prometheus.clock,'time',lambda: 2000.0)
+    metrics = run_metrics(str(tmp_path))
+    metrics.update(run_report(['mvrv(0)'],['coinmetrics'],failed=['mvrv(0)']),False)
+    metrics.write(path)
+    assert series(path)[('dcr_last_success_timestamp_seconds',())] == 1000.0
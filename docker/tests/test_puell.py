@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from dcr_synthetic import synthetic_base_frame
+
+
+def puell_loop(df):
+    """Per-row Puell Multiple hist_calc_multiples computed before it was vectorized"""
+    df = df.copy()
+    df['Puell'] = 0.0
+    for i in df.index:
+        _a = min(i,364)
+        _b = df['DailyIssuedUSD'].rolling(_a).mean().loc[i]
+        _c = df.loc[i,'DailyIssuedUSD']
+        df.loc[i,'Puell'] = _c / _b
+    return df['Puell'].to_numpy(dtype=float)
+
+
+def test_puell_matches_the_per_row_loop():
+    pytest.importorskip('checkonchain')
+    from dcr_memo import metric_registry
+    from generate_charts import dcr_chart_suite
+
+    df = synthetic_base_frame(days=900)
+    df['date'] = df['date'].dt.tz_localize('UTC')
+    #Single missing days, a week long gap and a gap inside the first year
+    issued = df['DailyIssuedUSD'].to_numpy(dtype=float,copy=True)
+    issued[[40,41,300,650]] = np.nan
+    issued[500:507] = np.nan
+    df['DailyIssuedUSD'] = issued
+
+    suite = dcr_chart_suite('dark',df=df,metrics=metric_registry(df),reload=None)
+    puell = suite.hist_calc_multiples('Puell')
+    expected = puell_loop(df)
+
+    assert list(puell.index) == list(pd.to_datetime(df['date']))
+    assert np.array_equal(np.isnan(puell.to_numpy()),np.isnan(expected))
+    assert np.isnan(expected).sum() > 365
+    np.testing.assert_allclose(puell.to_numpy(),expected,rtol=1e-12)
@@ -0,0 +1,59 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from dcr_quantiles import STATE_NAME, history_quantiles, kll_sketch
+
+QUANTILES = [0.02,0.05,0.5,0.95,0.98]
+
+
+def rank_error(sketch,values):
+    values = np.sort(values)
+    return max(
+        abs(np.searchsorted(values,sketch.quantile(q),side='right') / len(values) - q) for q in QUANTILES
+    )
+
+
+def test_sketch_rank_error():
+    values = np.random.default_rng(0).lognormal(0,0.6,20000)
+    chunked = kll_sketch()
+    for chunk in np.array_split(values,40):
+        chunked.add(chunk)
+    halves = [kll_sketch(),kll_sketch()]
+    halves[0].add(values[:10000])
+    halves[1].add(values[10000:])
+    merged = halves[0].merge(halves[1])
+    for sketch in [chunked,merged]:
+        assert sketch.n == len(values)
+        assert sum(len(level) * 2 ** h for h, level in enumerate(sketch.levels)) == len(values)
+        assert rank_error(sketch,values) < 0.005
+
+
+def test_small_sketch_is_exact():
+    values = np.random.default_rng(1).normal(size=150)
+    sketch = kll_sketch()
+    sketch.add(values)
+    assert sketch.quantile(0.5) == np.sort(values)[74]
+
+
+def sketch_multiple(state_dir,name,values):
+    dates = pd.date_range('2016-02-08',periods=len(values))
+    return history_quantiles(dates,values,name,QUANTILES,state_dir)
+
+
+def test_forked_charts_keep_every_sketch(tmp_path,fork_writers):
+    #mvrv(0), mvrv(1), mayer, puell and strongest_hand render at once with --jobs
+    values = np.random.default_rng(2).lognormal(0,0.5,(5,1500))
+    names = ['CapMVRVCur','CapMVRVCur','Mayer_Multiple','Puell_Multiple','stronghand_ratio_28']
+    results = fork_writers(
+        sketch_multiple,[(str(tmp_path),name,values[names.index(name)]) for name in names],str(tmp_path)
+    )
+    with open(str(tmp_path / STATE_NAME)) as f:
+        assert sorted(json.load(f)) == sorted('kll:' + name for name in set(names))
+    #A later run reuses every committed sketch and gives the same bands
+    for name, bands in zip(names,results):
+        i = names.index(name)
+        assert history_quantiles(
+            pd.date_range('2016-02-08',periods=1500),values[i],name,QUANTILES,str(tmp_path)
+        ) == bands
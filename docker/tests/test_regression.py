@@ -0,0 +1,134 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from dcr_regression import (
+    VALIDATE_ENV, batch_stats, ln_regression, metric_difficulty_model, metric_s2f_model, ols_stats,
+    regression_service,
+)
+from dcr_synthetic import synthetic_base_frame
+
+
+def frame(days=800):
+    df = synthetic_base_frame(days=days)
+    df['date'] = df['date'].dt.tz_localize('UTC')
+    return df
+
+
+def log_fit(df,x,y):
+    """Reference log-log fit, (const, slope) over the rows with finite logs"""
+    with np.errstate(divide='ignore',invalid='ignore'):
+        lx = np.log(df[x].to_numpy(dtype='float64'))
+        ly = np.log(df[y].to_numpy(dtype='float64'))
+    finite = np.isfinite(lx) & np.isfinite(ly)
+    slope, const = np.polyfit(lx[finite],ly[finite],1)
+    return const, slope
+
+
+def test_ln_regression_matches_polyfit(tmp_path):
+    df = frame()
+    analysis = ln_regression(df,'S2F','CapMrktCurUSD','dcr_s2f',regression_service(str(tmp_path)))
+    const, slope = log_fit(df,'S2F','CapMrktCurUSD')
+    params = analysis['model'].params
+    np.testing.assert_allclose([params['const'],params['S2F']],[const,slope],rtol=1e-9)
+    np.testing.assert_allclose(
+        analysis['df']['S2F_CapMr_predict'],np.exp(const + slope * np.log(df['S2F'])),rtol=1e-9
+    )
+    np.testing.assert_allclose(
+        analysis['df']['S2F_CapMr_residual'],np.log(df['CapMrktCurUSD']) - np.log(analysis['df']['S2F_CapMr_predict']),
+        atol=1e-9
+    )
+
+
+def test_ln_regression_matches_statsmodels(tmp_path):
+    sm = pytest.importorskip('statsmodels.api')
+    df = frame()
+    model = ln_regression(df,'S2F','CapMrktCurUSD','dcr_s2f',regression_service(str(tmp_path)))['model']
+    x = np.log(df['S2F'].to_numpy(dtype='float64'))
+    y = np.log(df['CapMrktCurUSD'].to_numpy(dtype='float64'))
+    reference = sm.OLS(y,sm.add_constant(x)).fit()
+    np.testing.assert_allclose([model.const,model.slope],reference.params,rtol=1e-9)
+    np.testing.assert_allclose(model.rsquared,reference.rsquared,rtol=1e-9)
+
+
+def test_incremental_fit_equals_full_fit(tmp_path):
+    df = frame()
+    service = regression_service(str(tmp_path))
+    ln_regression(df.iloc[:500].copy(),'S2F','CapMrktCurUSD','dcr_s2f',service)
+    #A later run with 300 more days folds only those into the committed statistics
+    service = regression_service(str(tmp_path))
+    incremental = ln_regression(df.copy(),'S2F','CapMrktCurUSD','dcr_s2f',service)['model']
+    assert service.state.load()['dcr_s2f']['rows'] == len(df) - service.state.revise
+    full = ln_regression(df.copy(),'S2F','CapMrktCurUSD','dcr_s2f',regression_service(str(tmp_path / 'fresh')))['model']
+    assert incremental.n == full.n == len(df)
+    np.testing.assert_allclose(
+        [incremental.const,incremental.slope,incremental.rsquared],[full.const,full.slope,full.rsquared],rtol=1e-10
+    )
+
+
+def test_merge_with_an_empty_side():
+    rng = np.random.default_rng(1)
+    x = rng.normal(size=200)
+    y = 2 * x + rng.normal(size=200)
+    stats = batch_stats(x,y)
+    assert ols_stats().merge(stats) is stats
+    assert stats.merge(ols_stats()) is stats
+    assert ols_stats().merge(ols_stats()).n == 0
+    assert np.isnan(ols_stats().slope)
+    merged = batch_stats(x[:80],y[:80]).merge(batch_stats(x[80:],y[80:]))
+    np.testing.assert_allclose(
+        [merged.n,merged.mean_x,merged.mean_y,merged.sxx,merged.sxy,merged.syy],
+        [stats.n,stats.mean_x,stats.mean_y,stats.sxx,stats.sxy,stats.syy],rtol=1e-12
+    )
+
+
+def test_metric_s2f_model(tmp_path):
+    df = frame()[['date','age_sply','S2F','PriceUSD','SplyCur','CapMrktCurUSD']]
+    df.loc[10,'PriceUSD'] = np.nan
+    result, model = metric_s2f_model(df,regression_service(str(tmp_path)))
+    #Rows with a missing input are dropped before the fit, like the upstream metric
+    assert len(result) == len(df) - 1
+    const, slope = log_fit(df.dropna(),'S2F','CapMrktCurUSD')
+    np.testing.assert_allclose([model.params['const'],model.params['S2F']],[const,slope],rtol=1e-9)
+    np.testing.assert_allclose(result['S2F_Price_predict'],result['S2F_CapMr_predict'] / result['SplyCur'])
+    np.testing.assert_allclose(result['S2F_Price_predict_PB'],np.exp(-1.84) * result['S2F'] ** 3.36)
+    np.testing.assert_allclose(result['S2F_CapMr_predict_PB'],result['S2F_Price_predict_PB'] * result['SplyCur'])
+
+
+def test_metric_difficulty_model(tmp_path):
+    df = frame()
+    df['DiffPriceUSD'] = df['PriceUSD'] * np.exp(np.sin(np.arange(len(df)) / 50))
+    result, model = metric_difficulty_model(df,regression_service(str(tmp_path)))
+    const, slope = log_fit(df,'DiffPriceUSD','PriceUSD')
+    np.testing.assert_allclose([model.params['const'],model.params['DiffPriceUSD']],[const,slope],rtol=1e-9)
+    np.testing.assert_allclose(result['Dif_Price_predict'],np.exp(const + slope * np.log(df['DiffPriceUSD'])),rtol=1e-9)
+    assert 'Dif_Price_predict' not in df.columns
+
+
+def test_validation_compares_against_the_upstream_metric(tmp_path,monkeypatch):
+    pytest.importorskip('checkonchain')
+    import checkonchain.dcronchain.dcr_add_metrics as upstream
+    import dcr_regression
+
+    df = frame()
+    df['DiffPriceUSD'] = df['PriceUSD'] * np.exp(np.sin(np.arange(len(df)) / 50))
+    service = regression_service(str(tmp_path))
+    expected = metric_difficulty_model(df,service)
+    shift = {'value':0.0}
+
+    class reference_metrics():
+
+        def metric_difficulty_model(self,df):
+            result = expected[0].copy()
+            result['Dif_Price_predict'] = result['Dif_Price_predict'] * (1 + shift['value'])
+            return result, expected[1]
+
+    monkeypatch.setattr(upstream,'dcr_add_metrics',reference_metrics)
+    #The statsmodels check of ln_regression is covered above, only the metric comparison runs here
+    monkeypatch.setattr(dcr_regression,'validate',lambda df,x,y,name,model,prefix: {'df':df,'model':model})
+    monkeypatch.setenv(VALIDATE_ENV,'1')
+    result = metric_difficulty_model(df,service)
+    pd.testing.assert_frame_equal(result[0],expected[0])
+    shift['value'] = 1e-6
+    result = metric_difficulty_model(df,service)
+    np.testing.assert_allclose(result[0]['Dif_Price_predict'],expected[0]['Dif_Price_predict'] * (1 + 1e-6))
@@ -0,0 +1,104 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+requests = pytest.importorskip('requests')
+from dcr_replay import http_fixtures
+
+
+class echo_handler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        body = json.dumps({'path':self.path}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type','application/json')
+        self.send_header('Content-Length',str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self,*args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = HTTPServer(('127.0.0.1',0),echo_handler)
+    thread = threading.Thread(target=httpd.serve_forever,daemon=True)
+    thread.start()
+    yield 'http://127.0.0.1:' + str(httpd.server_address[1])
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def record(directory,urls):
+    fixtures = http_fixtures(directory,'record').install()
+    try:
+        return [requests.get(url).json() for url in urls]
+    finally:
+        fixtures.uninstall()
+
+
+def replay(directory,url):
+    fixtures = http_fixtures(directory,'replay').install()
+    try:
+        return requests.get(url).json()
+    finally:
+        fixtures.uninstall()
+
+
+def test_record_then_replay(server,tmp_path):
+    directory = str(tmp_path / 'fixtures')
+    urls = [server + '/v4/timeseries?assets=dcr&end_time=2020-01-01',server + '/api/block/best']
+    recorded = record(directory,urls)
+    assert recorded == [{'path':'/v4/timeseries?assets=dcr&end_time=2020-01-01'},{'path':'/api/block/best'}]
+    assert len(list((tmp_path / 'fixtures').glob('*.json'))) == 2
+    for url, body in zip(urls,recorded):
+        assert replay(directory,url) == body
+
+
+def test_replay_never_touches_the_network(server,tmp_path):
+    directory = str(tmp_path / 'fixtures')
+    record(directory,[server + '/api/block/best'])
+    #The port is closed, only the fixture can answer
+    url = server + '/api/block/best'
+    server_less = url.replace(server,'http://127.0.0.1:1')
+    with pytest.raises(requests.exceptions.ConnectionError):
+        replay(directory,server_less)
+    assert replay(directory,url) == {'path':'/api/block/best'}
+
+
+def test_shape_fallback(server,tmp_path):
+    directory = str(tmp_path / 'fixtures')
+    record(directory,[server + '/v4/timeseries?assets=dcr&end_time=2020-01-01'])
+    #Same parameter names, a moved end date is answered by the recorded fixture
+    moved = replay(directory,server + '/v4/timeseries?end_time=2021-06-30&assets=dcr')
+    assert moved == {'path':'/v4/timeseries?assets=dcr&end_time=2020-01-01'}
+    #Different parameter names, path or host are not the same query
+    for url in [
+        server + '/v4/timeseries?assets=dcr',
+        server + '/v4/timeseries?assets=dcr&end_time=2020-01-01&metrics=PriceUSD',
+        server + '/v4/blocks?assets=dcr&end_time=2020-01-01',
+        'http://localhost:1/v4/timeseries?assets=dcr&end_time=2020-01-01',
+    ]:
+        with pytest.raises(requests.exceptions.ConnectionError):
+            replay(directory,url)
+
+
+def test_ambiguous_shape_is_not_served(server,tmp_path):
+    directory = str(tmp_path / 'fixtures')
+    record(directory,[server + '/v4/timeseries?assets=dcr',server + '/v4/timeseries?assets=btc'])
+    assert replay(directory,server + '/v4/timeseries?assets=btc') == {'path':'/v4/timeseries?assets=btc'}
+    #Two recorded queries share the shape, neither may answer a third
+    with pytest.raises(requests.exceptions.ConnectionError):
+        replay(directory,server + '/v4/timeseries?assets=eth')
+
+
+def test_unknown_url(tmp_path):
+    directory = tmp_path / 'fixtures'
+    directory.mkdir()
+    with pytest.raises(requests.exceptions.ConnectionError):
+        replay(str(directory),'http://127.0.0.1:1/api/block/best')
+    with pytest.raises(FileNotFoundError):
+        http_fixtures(str(tmp_path / 'missing'),'replay')
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from dcr_rolling import rolling_mean, rolling_std, rolling_sum, window_mean
+
+WINDOWS = [1,2,9,14,25,30,142,200]
+
+
+def series(case):
+    rng = np.random.default_rng(0)
+    values = np.exp(np.cumsum(rng.normal(0,0.03,1500))) * 10
+    if case == 'gaps':
+        values[rng.choice(1500,60,replace=False)] = np.nan
+        values[:40] = np.nan
+    elif case == 'inf':
+        #Price/issuance ratios over a zero day
+        values[[300,301,900]] = [np.inf,-np.inf,np.inf]
+        values[500] = np.nan
+    return pd.Series(values)
+
+
+def assert_parity(result,expected,rtol,atol=0):
+    result = np.asarray(result)
+    expected = np.asarray(expected)
+    assert np.array_equal(np.isnan(result),np.isnan(expected))
+    finite = ~np.isnan(expected)
+    np.testing.assert_allclose(result[finite],expected[finite],rtol=rtol,atol=atol)
+
+
+@pytest.mark.parametrize('case',['clean','gaps','inf'])
+def test_rolling_parity(case):
+    values = series(case)
+    sums, means, stds = rolling_sum(values,WINDOWS), rolling_mean(values,WINDOWS), rolling_std(values,WINDOWS)
+    for j, window in enumerate(WINDOWS):
+        assert_parity(sums[:,j],values.rolling(window).sum(),1e-10)
+        assert_parity(means[:,j],values.rolling(window).mean(),1e-10)
+        #Running sums of squares lose digits on near flat windows, ~1e-8 absolute at this level
+        assert_parity(stds[:,j],values.rolling(window).std(),1e-6,1e-7)
+
+
+def test_single_window_is_flat():
+    values = series('clean')
+    assert rolling_mean(values,200).shape == (len(values),)
+    assert_parity(rolling_mean(values,200),values.rolling(200).mean(),1e-10)
+
+
+def test_inf_only_blanks_its_windows():
+    values = pd.Series([1,2,np.inf,3,4,5,6,7.])
+    assert_parity(rolling_mean(values,2),[np.nan,1.5,np.nan,np.nan,3.5,4.5,5.5,6.5],1e-12)
+
+
+@pytest.mark.parametrize('case',['clean','gaps','inf'])
+def test_window_mean_matches_loop(case):
+    values = series(case)
+    #Puell style windows, min(i,364) rows ending at row i
+    end = np.arange(1,len(values) + 1)
+    start = end - np.minimum(np.arange(len(values)),364)
+    expected = [
+        values.iloc[a:b].mean() if b > a and np.isfinite(values.iloc[a:b]).all() else np.nan
+        for a, b in zip(start,end)
+    ]
+    with np.errstate(invalid='ignore'):
+        assert_parity(window_mean(values,start,end),expected,1e-10)
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from dcr_synthetic import BLOCKS_PER_DAY, MIN_DATE, synthetic_base_frame
+
+
+def check_dates(df,rows):
+    assert len(df) == rows
+    assert df['date'].is_monotonic_increasing and df['date'].is_unique
+    assert df['date'].iloc[0].tz_localize(None) >= MIN_DATE
+
+
+@pytest.mark.parametrize('scale',[1,10,100])
+def test_model_frame_scales(scale):
+    real = synthetic_base_frame()
+    df = synthetic_base_frame(scale)
+    check_dates(df,len(real) * scale)
+    assert list(df.columns) == list(real.columns)
+    assert (df.dtypes == real.dtypes).all()
+    #Only the calendar is compressed, block heights and ages keep their daily steps
+    assert (np.diff(df['blk'].to_numpy()) == BLOCKS_PER_DAY).all()
+    assert (np.diff(df['age_days'].to_numpy()) == 1).all()
+
+
+@pytest.mark.parametrize('scale',[1,10,100])
+def test_template_frame_scales(scale):
+    template = synthetic_base_frame()
+    template['date'] = template['date'].dt.tz_localize('UTC')
+    df = synthetic_base_frame(scale,template=template)
+    check_dates(df,len(template) * scale)
+    assert list(df.columns) == list(template.columns)
+    assert (df.dtypes == template.dtypes).all()
+    assert df['date'].iloc[-1] == template['date'].iloc[-1]
+
+
+def test_history_too_long_for_pandas():
+    with pytest.raises(ValueError):
+        synthetic_base_frame(days=10**11)